@@ -5,11 +5,25 @@ import json
 import sys
 import time
 import os
-from struct import pack
+from struct import pack, pack_into, unpack_from, calcsize
 import getpass
-from dataclasses import dataclass
+import cProfile
+import contextlib
+import tracemalloc
+import hashlib
+import threading
+import tempfile
+import shutil
+import subprocess
+import multiprocessing
+import numpy
+import concurrent.futures
+from array import array
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass, field
 from timeit import default_timer as timer
-from bpy_extras.io_utils import ExportHelper
+from bpy_extras.io_utils import ExportHelper, axis_conversion
 from bpy.props import (
     StringProperty,
     BoolProperty,
@@ -20,6 +34,14 @@ from bpy.props import (
     CollectionProperty,   
 )
 from bpy.types import Operator
+from mathutils import Matrix, Vector
+
+# Geometry that runs on the process pool is imported as a top level module from the add-on 
+# directory, so processes spawned by the pool can import it without importing Blender
+if os.path.dirname(os.path.abspath(__file__)) not in sys.path:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import gxport_geometry
 
 bl_info = {
     "name": "gxport",
@@ -32,1391 +54,4683 @@ bl_info = {
     "category": "Import-Export",
 }
 
-materials: dict = {}
-entities:  dict = {}
-parts:     dict = {}
-
-
-class Light:
+class Serializer:
 
     '''
-        gxport.Light
+        gxport.Serializer
     '''
 
-    # Uninitialized data
-    name      : str  = None
-    location  : list = None
-    color     : list = None
-    light_type: str  = None
-
-    json_data : dict = None
+    # Encodings
+    PRETTY  : str = 'PRETTY'
+    COMPACT : str = 'COMPACT'
+    BINARY  : str = 'BINARY'
+
+    # Binary encoding
+    #
+    # A binary document is the magic "GXB\0", a little endian uint32 version, and one value.
+    # Each value starts with a one byte tag. Strings are a uint32 byte length followed by 
+    # UTF-8 text. Arrays and objects are a uint32 byte length of everything after it, then 
+    # a uint32 element count, then the elements. Object keys are strings without a tag. 
+    # Every variable sized value is length prefixed, so a reader can skip any subtree.
+    BINARY_MAGIC  : bytes = b"GXB\0"
+    BINARY_VERSION: int   = 1
+
+    TAG_NULL      : int   = 0
+    TAG_FALSE     : int   = 1
+    TAG_TRUE      : int   = 2
+    TAG_INT       : int   = 3
+    TAG_FLOAT     : int   = 4
+    TAG_STRING    : int   = 5
+    TAG_ARRAY     : int   = 6
+    TAG_OBJECT    : int   = 7
+
+    encoding      : str   = None
 
     # Constructor
-    def __init__(self, object: bpy.types.Object):
+    def __init__(self, encoding: str = 'PRETTY'):
 
         '''
-            Constructs a gxport.Light from a bpy.types.Object 
+            Constructs a gxport.Serializer for one of PRETTY, COMPACT or BINARY
         '''
 
         # Type check
-        if isinstance(object.data, bpy.types.Light) == False:
-            return
-
-        # Set class data
-
-        # Name
-        self.name                  = object.name
+        if encoding not in ( Serializer.PRETTY, Serializer.COMPACT, Serializer.BINARY ):
+            raise ValueError("[gxport] [Serializer] Unknown encoding \"" + str(encoding) + "\"")
 
-        # Location
-        self.location = [ None, None, None ]
-        self.location[0]           = object.location[0]
-        self.location[1]           = object.location[1]
-        self.location[2]           = object.location[2]
-        
-        # Color
-        self.color    = [ None, None, None ]
-        self.color[0]              = object.data.color[0] * object.data.energy
-        self.color[1]              = object.data.color[1] * object.data.energy
-        self.color[2]              = object.data.color[2] * object.data.energy
-        
-        # Set up the dictionary
-        self.json_data             = { }
-        self.json_data["$schema"]  = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/light-schema.json"
-        self.json_data["name"]     = self.name
-        self.json_data["location"] = self.location.copy()
-        self.json_data["color"]    = self.color.copy()
+        self.encoding = encoding
 
         return
 
-    # Returns file JSON
-    def json(self):
+    # Returns the file extension for documents
+    def extension(self) -> str:
 
-        '''           
-            Returns a G10 readable JSON object as a string
+        '''
+            Returns the file extension of documents written with this encoding
         '''
 
-        # Dump the dictionary as a JSON object string
-        return json.dumps(self.json_data, indent=4)
+        return ".gxb" if self.encoding == Serializer.BINARY else ".json"
 
-    # Writes JSON to a specified file
-    def write_to_file(self, path: str):
-        
-        ''' 
-            Write a G10 readable JSON object text to a file path
+    # Encodes a document
+    def dumps(self, document) -> bytes:
+
+        '''
+            Returns a document encoded as bytes
         '''
 
-        # Write the JSON data to the specified path
-        with open(path, "w+") as f:
-            try: f.write(self.json())
-            except FileExistsError: pass
+        # Indented JSON
+        if   self.encoding == Serializer.PRETTY:
+            return json.dumps(document, indent=4).encode('utf-8')
 
-        return
+        # JSON without whitespace
+        elif self.encoding == Serializer.COMPACT:
+            return json.dumps(document, separators=(',', ':')).encode('utf-8')
 
-    @staticmethod
-    def import_from_file(path: str):
-        
-        # Uninitialized data
-        light_json    : dict = None
+        # Length prefixed binary
+        buffer = bytearray(Serializer.BINARY_MAGIC)
+        buffer += pack("<I", Serializer.BINARY_VERSION)
 
-        light_name    : str  = None
-        light_location: list = None
-        light_color   : list = None
-        light_comment : str  = None
-        
-        # Open the light file from the path
-        with open(path, "r") as f:
+        Serializer._encode_value(buffer, document)
 
-            # Make a dictionary from the JSON
-            light_json = json.load(f)
+        return bytes(buffer)
 
-        # Copy out important properties
-        light_name     = light_json['name']
-        light_location = light_json['location']
-        light_color    = light_json['color']
+    # Decodes a document
+    def loads(self, data: bytes):
 
-        # Create a new light
-        light_data = bpy.data.lights.new(name=light_name+" data", type='POINT')
+        '''
+            Returns the document encoded in bytes. The encoding is detected from the data
+        '''
 
-        # Create a new object
-        light_object = bpy.data.objects.new(name=light_name, object_data=light_data)
-        
-        # Add the new object to the current scene
-        bpy.context.collection.objects.link(light_object)
+        # JSON
+        if data[:4] != Serializer.BINARY_MAGIC:
+            return json.loads(data.decode('utf-8'))
 
-        # Set the light properties
-        light_object.location = light_location
+        # Binary
+        return Serializer._decode_value(data, 8)[0]
 
-class Camera:
+    # Writes a document to a file
+    def write(self, document, path: str):
 
-    '''
-        - Camera
-    '''
+        '''
+            Write a document to a file path
+        '''
 
-    name     : str   = None
-    fov      : float = None
-    near     : float = None
-    far      : float = None
-    target   : list  = None
-    up       : list  = None
-    where    : list  = None
+        session = ExportSession.get()
+        start   = timer()
 
-    json_data: dict  = None
+        session.record(path)
 
-    def __init__(self, object: bpy.types.Camera):
+        data    = self.dumps(document)
 
-        # Type check
-        if isinstance(object.data, bpy.types.Camera) == False:
-            return
+        with open(path, "wb") as f:
+            f.write(data)
 
-        # Set the name
-        self.name                = object.name
+        name    = Profiler.document_name(path)
 
-        # Set the FOV
+        session.profiler.add_time("document write", timer() - start, name)
+        session.profiler.add_bytes("document write", len(data), name)
 
-        # Make a temporary variable for the unit type
-        tmp                       = object.data.lens_unit
+        return
 
-        object.data.lens_unit     = 'FOV'
-        self.fov                  = object.data.lens
+    # Reads a document from a file
+    def load(self, path: str):
 
-        # Restore the correct unit from the temp
-        object.data.lens_unit     = tmp
+        '''
+            Read a document from a file path
+        '''
 
-        # Set the near clip
-        self.near                 = object.data.clip_start
+        with open(path, "rb") as f:
+            return self.loads(f.read())
 
-        # Set the far clip
-        self.far                  = object.data.clip_end
+    @staticmethod
+    def _encode_string(buffer: bytearray, value: str):
 
-        # Set the target
-        self.target               = [ None, None, None ]
-        self.target[0]            = object.matrix_world[0][2] * -1
-        self.target[1]            = object.matrix_world[1][2] * -1
-        self.target[2]            = object.matrix_world[2][2] * -1
+        encoded = value.encode('utf-8')
 
-        # Set the up 
-        self.up                   = [ None, None, None ]
-        self.up[0]                = object.matrix_world[0][1]
-        self.up[1]                = object.matrix_world[1][1]
-        self.up[2]                = object.matrix_world[2][1]
+        buffer += pack("<I", len(encoded))
+        buffer += encoded
 
-        # Set the location
-        self.where                = [ None, None, None ]
-        self.where[0]             = object.matrix_world[0][3]
-        self.where[1]             = object.matrix_world[1][3]
-        self.where[2]             = object.matrix_world[2][3]
+        return
 
-        # Set up the dictionary
-        self.json_data            = { }
-        self.json_data["$schema"] = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/camera-schema.json"
-        self.json_data["name"]    = self.name
-        self.json_data["fov"]     = self.fov
-        self.json_data["near"]    = self.near
-        self.json_data["far"]     = self.far
-        self.json_data["target"]  = (self.target.copy())
-        self.json_data["up"]      = (self.up.copy())
-        self.json_data["where"]   = (self.where.copy())
+    @staticmethod
+    def _encode_value(buffer: bytearray, value):
+
+        # Null
+        if value is None:
+            buffer.append(Serializer.TAG_NULL)
+
+        # Booleans. Checked before integers, since bool is a subclass of int
+        elif value is True:
+            buffer.append(Serializer.TAG_TRUE)
+        elif value is False:
+            buffer.append(Serializer.TAG_FALSE)
+
+        # Integers
+        elif isinstance(value, int):
+            buffer.append(Serializer.TAG_INT)
+            buffer += pack("<q", value)
+
+        # Floats
+        elif isinstance(value, float):
+            buffer.append(Serializer.TAG_FLOAT)
+            buffer += pack("<d", value)
+
+        # Strings
+        elif isinstance(value, str):
+            buffer.append(Serializer.TAG_STRING)
+            Serializer._encode_string(buffer, value)
+
+        # Arrays and objects
+        elif isinstance(value, (list, tuple, dict)):
+            
+            buffer.append(Serializer.TAG_OBJECT if isinstance(value, dict) else Serializer.TAG_ARRAY)
+
+            # Reserve the byte length, and patch it after the elements are written
+            length_offset = len(buffer)
+            buffer += pack("<II", 0, len(value))
+
+            if isinstance(value, dict):
+                for k, v in value.items():
+                    Serializer._encode_string(buffer, str(k))
+                    Serializer._encode_value(buffer, v)
+            else:
+                for v in value:
+                    Serializer._encode_value(buffer, v)
+
+            pack_into("<I", buffer, length_offset, len(buffer) - length_offset - 4)
+
+        # Anything else that behaves like a sequence of numbers (mathutils.Vector, bpy_prop_array)
+        else:
+            Serializer._encode_value(buffer, list(value))
 
         return
 
-    def json(self):
+    @staticmethod
+    def _decode_string(data: bytes, offset: int):
 
-        return json.dumps(self.json_data, indent=4)
+        length = unpack_from("<I", data, offset)[0]
+        offset = offset + 4
 
-    # Writes JSON to a specified file
-    def write_to_file(self, path: str):
-        
-        ''' 
-            Write a G10 readable JSON object text to a file path
-        '''
+        return (data[offset:offset + length].decode('utf-8'), offset + length)
 
-        with open(path, "w+") as f:
-            try: f.write(self.json())
-            except FileExistsError: pass
+    @staticmethod
+    def _decode_value(data: bytes, offset: int):
+
+        tag    = data[offset]
+        offset = offset + 1
+
+        if   tag == Serializer.TAG_NULL:
+            return (None, offset)
+        elif tag == Serializer.TAG_FALSE:
+            return (False, offset)
+        elif tag == Serializer.TAG_TRUE:
+            return (True, offset)
+        elif tag == Serializer.TAG_INT:
+            return (unpack_from("<q", data, offset)[0], offset + 8)
+        elif tag == Serializer.TAG_FLOAT:
+            return (unpack_from("<d", data, offset)[0], offset + 8)
+        elif tag == Serializer.TAG_STRING:
+            return Serializer._decode_string(data, offset)
+        elif tag == Serializer.TAG_ARRAY or tag == Serializer.TAG_OBJECT:
+            
+            count  = unpack_from("<I", data, offset + 4)[0]
+            offset = offset + 8
+
+            if tag == Serializer.TAG_ARRAY:
+                ret = []
+                for i in range(count):
+                    v, offset = Serializer._decode_value(data, offset)
+                    ret.append(v)
+            else:
+                ret = { }
+                for i in range(count):
+                    k, offset = Serializer._decode_string(data, offset)
+                    v, offset = Serializer._decode_value(data, offset)
+                    ret[k] = v
 
-        return
+            return (ret, offset)
 
-class Part:
+        raise ValueError("[gxport] [Serializer] Unknown tag " + str(tag) + " at offset " + str(offset - 1))
+
+# Serializer used for every document in the export
+serializer: Serializer = Serializer()
+
+class Bundle:
 
     '''
-        Part
+        gxport.Bundle
     '''
 
-    name       : str            = None
- 
-    json_data  : dict           = None
-    mesh       : bpy.types.Mesh = None
-    path       : str            = None
-    ply_path   : str            = None
-    shader_name: str            = "G10/shaders/G10 PBR.json"
+    # Bundle layout. Every integer is little endian
+    #
+    # Header, 64 bytes
+    #     char[4]  magic             "GXPK"
+    #     uint32   version
+    #     uint32   entry count
+    #     uint32   alignment
+    #     uint64   table of contents offset
+    #     uint64   string table offset
+    #     uint64   string table size
+    #     padding  to 64 bytes
+    #
+    # Payloads, each starting on a multiple of the alignment
+    #
+    # Table of contents, entry count * 48 bytes, sorted by path
+    #     uint32   path offset       into the string table
+    #     uint32   path length
+    #     uint64   payload offset    from the start of the file
+    #     uint64   payload size
+    #     uint32   asset type
+    #     uint32   reserved
+    #     char[16] BLAKE2b-128 hash of the payload
+    #
+    # String table, UTF-8 paths relative to the export directory, separated by '/'
+    #
+    # Documents refer to other bundled files by these paths, so every reference resolves
+    # through the table of contents
+    MAGIC        : bytes = b"GXPK"
+    VERSION      : int   = 1
+    HEADER_SIZE  : int   = 64
+    ENTRY_SIZE   : int   = 48
+    HASH_SIZE    : int   = 16
+    CHUNK_SIZE   : int   = 1 << 20
+
+    # Asset types
+    TYPE_OTHER    : int   = 0
+    TYPE_SCENE    : int   = 1
+    TYPE_ENTITY   : int   = 2
+    TYPE_PART     : int   = 3
+    TYPE_MESH     : int   = 4
+    TYPE_MATERIAL : int   = 5
+    TYPE_TEXTURE  : int   = 6
+    TYPE_SKYBOX   : int   = 7
+    TYPE_COLLIDER : int   = 8
+    TYPE_CELL     : int   = 9
+    TYPE_BVH      : int   = 10
+    TYPE_INSTANCE : int   = 11
+    TYPE_TRANSFORM: int   = 12
+
+    # Directories written by gxport.Scene, and the type of the documents in them
+    DIRECTORY_TYPES: dict = {
+        "entities" : TYPE_ENTITY,
+        "parts"    : TYPE_PART,
+        "materials": TYPE_MATERIAL,
+        "textures" : TYPE_TEXTURE,
+        "skybox"   : TYPE_SKYBOX,
+        "colliders": TYPE_COLLIDER,
+        "cells"    : TYPE_CELL,
+        "instances": TYPE_INSTANCE,
+    }
 
-    bone_data  : dict           = None 
+    alignment: int  = None
+    assets   : dict = None
 
     # Constructor
-    def __init__(self, object: bpy.types.Object):
+    def __init__(self, alignment: int = 64):
+
+        '''
+            Constructs an empty gxport.Bundle. Payloads are aligned to a power of two
+        '''
 
         # Type check
-        if isinstance(object.data, bpy.types.Mesh) == False:
-            return
+        if alignment <= 0 or alignment & (alignment - 1) != 0:
+            raise ValueError("[gxport] [Bundle] Alignment must be a power of two")
 
-        # Set class data
-        self.material_name = object.material_slots[0].name
-        
-        # Name
-        self.name                  = object.name
+        self.alignment = alignment
+        self.assets    = { }
 
-        # Blender mesh
-        self.mesh = object
+        return
 
-        # Set up the dictionary
-        self.json_data             = { }
-        self.json_data["$schema"]  = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/part-schema.json"
-        self.json_data["name"]     = self.name
-        self.json_data["shader"]   = self.shader_name
-        self.json_data["material"] = self.material_name
+    # Adds a file to the bundle
+    def add_file(self, name: str, path: str, asset_type: int = 0):
 
-        # Add the part to the cache
-        parts[self.name] = self
+        '''
+            Add the file at path to the bundle, as name
+        '''
+
+        self.assets[name] = (path, asset_type)
 
         return
 
-    # Returns file JSON
-    def json(self):
+    # Adds the files of an export to the bundle
+    def add_export(self, directory: str, scene_path: str, written = ()):
 
-        self.json_data['path'] = self.ply_path
+        '''
+            Adds the scene, every file written into the directory by the export, and every file
+            in the directory the documents refer to, followed from the scene. Files left over 
+            from earlier exports are only added if a document refers to them, so a patched scene
+            still gets the entities it did not rewrite
+        '''
 
-        return json.dumps(self.json_data, indent=4)
+        root    = os.path.normpath(os.path.abspath(directory))
+        scene   = os.path.normpath(os.path.abspath(scene_path))
+        pending = [ scene ] + sorted(written)
 
-    # Writes JSON to a specified file
-    def write_to_file(self, path: str):
+        while pending:
+            path = os.path.normpath(os.path.abspath(pending.pop()))
+            name = os.path.relpath(path, root).replace(os.sep, "/")
 
-        self.json_data["path"] = self.ply_path
+            # Skip what is added, outside the directory, missing or moved aside by an export in progress
+            if name in self.assets or name.startswith("../") or os.path.isfile(path) is False or path.endswith(ExportSession.BACKUP_SUFFIX):
+                continue
 
-        # Write the JSON data to the specified path
-        with open(path, "w+") as f:
-            try: f.write(self.json())
-            except FileExistsError: pass
+            self.add_file(name, path, Bundle.TYPE_SCENE if path == scene else Bundle.asset_type(name))
 
-    # PLY exporter 
-    def export_ply ( self, file_path, comment="Written from gxport" ):
+            # Follow the references of documents
+            if Bundle.is_document(path):
+                pending += Bundle.references(serializer.load(path))
 
-        # Convinience 
-        active_uv_layer         = self.mesh.data.uv_layers.active.data
-        active_col_layer        = None
-        bone_groups_and_weights = None
-        bone_groups             = None
-        bone_weights            = None
+        return
 
-        use_geometry    : bool  = True
-        use_uv_coords   : bool  = True
-        use_normals     : bool  = True
-        use_tangents    : bool  = False 
-        use_bitangents  : bool  = False
-        use_colors      : bool  = False
-        use_bone_groups : bool  = False
-        use_bone_weights: bool  = False
+    # Returns the type of an asset from its name in the bundle
+    @staticmethod
+    def asset_type(name: str) -> int:
 
-        if use_colors is True:
-            active_col_layer = self.mesh.vertex_colors.active.data
+        directory, separator, rest = name.partition("/")
 
-        # Make a new bmesh from the parameter
-        bm = bmesh.new()
-        bm.from_mesh(self.mesh.data)
-        bmesh.ops.triangulate(bm, faces=bm.faces[:])
+        # Meshes live next to their part documents
+        if directory == "parts" and name.endswith(".ply"):
+            return Bundle.TYPE_MESH
 
-        # Buffer lookup tables
-        bm.faces.ensure_lookup_table()
-        bm.edges.ensure_lookup_table()
-        bm.verts.ensure_lookup_table()
+        if separator != "":
+            return Bundle.DIRECTORY_TYPES.get(directory, Bundle.TYPE_OTHER)
 
-        # Dict for vertices and faces
-        vertices = { }
+        return { ".bvh": Bundle.TYPE_BVH, ".transforms": Bundle.TYPE_TRANSFORM }.get(os.path.splitext(name)[1], Bundle.TYPE_OTHER)
 
-        vertex_counter = 0
+    # Returns True if a file is a document
+    @staticmethod
+    def is_document(path: str) -> bool:
 
-        faces   = { }
+        return path.endswith(".json") or path.endswith(".gxb")
 
-        if use_bone_groups is True or use_bone_weights is True:
-            bone_groups_and_weights = self.get_bone_groups_and_weights(self.mesh)
-            bone_groups  = bone_groups_and_weights[0]
-            bone_weights = bone_groups_and_weights[1]
+    # Returns every string in a document that could be a path
+    @staticmethod
+    def references(document) -> list:
 
+        ret     = [ ]
+        pending = [ document ]
 
-        # Iterate over all faces (faces are triangulated)
-        for i, f in enumerate(bm.faces):
+        while pending:
+            value = pending.pop()
 
-            # Face vertex attributes
-            t             = [ None, None, None ]
-            b             = [ None, None, None ]
+            if isinstance(value, dict):
+                pending += value.values()
+            elif isinstance(value, list):
+                pending += value
+            elif isinstance(value, str) and ( "/" in value or os.sep in value ):
+                ret.append(value)
 
-            # Face indicies
-            face_indicies = [ 0, 0, 0 ]
+        return ret
 
-            # Compute the tangent and bitangent of the face        
-            if use_tangents is True or use_bitangents is True:
+    # Returns a document with paths to bundled files replaced by their names in the bundle
+    @staticmethod
+    def relocate(document, names: dict):
 
-                # < x, y, z > coordinates for each vertex in the face
-                pos1                = (f.verts[0].co)
-                pos2                = (f.verts[1].co)
-                pos3                = (f.verts[2].co)    
+        if isinstance(document, dict):
+            return { k: Bundle.relocate(v, names) for k, v in document.items() }
 
-                # < s, t > coordinates for each vertex
-                uv1                 = active_uv_layer[f.loops[0].index].uv
-                uv2                 = active_uv_layer[f.loops[1].index].uv
-                uv3                 = active_uv_layer[f.loops[2].index].uv
+        if isinstance(document, list):
+            return [ Bundle.relocate(v, names) for v in document ]
 
-                # Compute the edges 
-                edge1               = pos2 - pos1
-                edge2               = pos3 - pos1
+        if isinstance(document, str) and ( "/" in document or os.sep in document ):
+            return names.get(os.path.normpath(os.path.abspath(document)), document)
 
-                # Compute the difference in UVs
-                delta1              = uv2 - uv1
-                delta2              = uv3 - uv1
+        return document
 
-                # Compute the inverse determinant
-                inverse_determinant = float(1) / float(delta1[0] * delta2[1] - delta2[0] * delta1[1])
+    @staticmethod
+    def pack(directory: str, scene_path: str, path: str):
 
-                # Finally, construct the < tx, ty, tz > and < bx, by, bz > vectors
-                t = [
-                    inverse_determinant * float( delta2[1] * edge1[0] - delta1[1] * edge2[0] ),
-                    inverse_determinant * float( delta2[1] * edge1[1] - delta1[1] * edge2[1] ),
-                    inverse_determinant * float( delta2[1] * edge1[2] - delta1[1] * edge2[2] )
-                ]
+        '''
+            Pack an exported scene into a bundle at path, from the files the current session 
+            wrote and the files its documents refer to
+        '''
 
-                b = [
-                    inverse_determinant * float( -delta2[0] * edge1[0] + delta1[0] * edge2[0] ),
-                    inverse_determinant * float( -delta2[0] * edge1[1] + delta1[0] * edge2[1] ),
-                    inverse_determinant * float( -delta2[0] * edge1[2] + delta1[0] * edge2[2] )
-                ]
+        session  = ExportSession.get()
+        profiler = session.profiler
 
-            # Iterate over each vertex in the face
-            for j, v in enumerate(f.verts):
+        with profiler.phase("bundle", "bundle"):
+            bundle = Bundle()
+            bundle.add_export(directory, scene_path, session.written_files())
+            bundle.write(path)
 
-                # Vertex attributes
-                g  = [ None, None, None ]       # < x, y, z >
-                uv = [ None, None ]             # < s, t >
-                n  = [ None, None, None ]       # < nx, ny, nz >
-                c  = [ None, None, None, None ] # < r, g, b, a >
-                bg = [ None, None, None, None ] # < g0, g1, g2, g3 > 
-                bw = [ None, None, None, None ] # < w0, w1, w2, w3 >
+        profiler.add_bytes("bundle", os.path.getsize(path), "bundle")
 
-                # < x, y, z > of current vert
-                if use_geometry is True:
-                    g  = f.verts[j].co
+        return
 
-                # < s, t > of current vert
-                if use_uv_coords is True:
-                    uv = active_uv_layer[f.loops[j].index].uv
+    # Writes the bundle to a file
+    def write(self, path: str):
 
-                # < nx, ny, nz > of current vert
-                if use_normals is True:
-                    n  = f.verts[j].normal
+        '''
+            Write every asset into a bundle at path in one pass. Paths in documents that point 
+            at bundled files are rewritten to their names in the bundle, so every reference can
+            be looked up in the table of contents
+        '''
 
-                # < r, g, b, a >
-                if use_colors is True:
-                    c  = active_col_layer[f.loops[j].index].color
+        # Sort by the encoded path, so the engine can binary search the table of contents
+        names   = sorted(self.assets.keys(), key=lambda n: n.encode('utf-8'))
+        entries = [ ]
+        strings = bytearray()
+        bundled = { os.path.normpath(os.path.abspath(p)): n for n, ( p, t ) in self.assets.items() }
 
-                # TODO: Bone groups and weights
-                if use_bone_groups is True:
-                    bg = bone_groups[f.verts[j].index]
+        ExportSession.get().record(path)
 
-                if use_bone_weights is True:
-                    bw = bone_weights[f.verts[j].index]              
+        with open(path, "wb") as f:
+            fw = f.write
 
-                # Combine < x, y, z >
-                #         < s, t >
-                #         < nx, ny, nz >
-                #         < tx, ty, tz >
-                #         < bx, by, bz >
-                #         < r, g, b, a >
-                #         < g0, g1, g2, g3 >
-                #         < w0, w1, w2, w3 >
+            # Reserve the header. It is written last, once the offsets are known
+            fw(bytes(Bundle.HEADER_SIZE))
+            offset = Bundle.HEADER_SIZE
 
-                combined_vertex = (
-                                    g[0] , g[1] , g[2],         # 0  : < x, y, z >
-                                    uv[0], uv[1],               # 3  : < s, t >
-                                    n[0] , n[1] , n[2],         # 5  : < nx, ny, nz >
-                                    t[0] , t[1] , t[2],         # 8  : < tx, ty, tz >
-                                    b[0] , b[1] , b[2],         # 11 : < bx, by, bz >
-                                    c[0] , c[1] , c[2] , c[3],  # 14 : < r, g, b, a >
-                                    bg[0], bg[1], bg[2], bg[3], # 18 : < g0, g1, g2, g3 >
-                                    bw[0], bw[1], bw[2], bw[3], # 22 : < w0, w1, w2, w3 >
-                                  )
+            # Stream each payload into the bundle
+            for name in names:
+                asset_path, asset_type = self.assets[name]
 
-                index = vertices.get(combined_vertex)
+                # Pad to the alignment
+                padding = -offset % self.alignment
+                fw(bytes(padding))
+                offset  = offset + padding
 
-                if index is not None:
-                    face_indicies[j] = index
-                else:            
-                    face_indicies[j] = vertex_counter
-                    vertices[combined_vertex] = vertex_counter
+                payload_offset = offset
+                payload_hash   = hashlib.blake2b(digest_size=Bundle.HASH_SIZE)
 
-                    vertex_counter = vertex_counter + 1
+                # Documents are rewritten in the encoding they were written in
+                if Bundle.is_document(asset_path):
+                    with open(asset_path, "rb") as a:
+                        data = a.read()
 
-            faces[i] = face_indicies
+                    if data[:4] == Serializer.BINARY_MAGIC:
+                        encoding = Serializer.BINARY
+                    else:
+                        encoding = Serializer.PRETTY if b"\n" in data else Serializer.COMPACT
 
-        with open(file_path, "wb") as file:
-            fw = file.write
+                    data   = Serializer(encoding).dumps(Bundle.relocate(serializer.loads(data), bundled))
 
-            fw(b"ply\n")
-            fw(b"format binary_little_endian 1.0\n")
+                    payload_hash.update(data)
+                    fw(data)
+                    offset = offset + len(data)
 
-            if comment is not None:
-                fw(b"comment " + bytes(comment, 'ascii') + b"\n")
+                else:
+                    with open(asset_path, "rb") as a:
+                        while True:
+                            chunk = a.read(Bundle.CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            payload_hash.update(chunk)
+                            fw(chunk)
+                            offset = offset + len(chunk)
 
-            fw(b"element vertex %d\n" % vertex_counter)
+                encoded_name = name.encode('utf-8')
 
-            if use_geometry is True:
-                fw(
-                    b"property float x\n"
-                    b"property float y\n"
-                    b"property float z\n"
-                )
-                
-            if use_uv_coords is True:
-                fw(
-                    b"property float s\n"
-                    b"property float t\n"
-                )
-            if use_normals is True:
-                fw(
-                    b"property float nx\n"
-                    b"property float ny\n"
-                    b"property float nz\n"
-                )
-            if use_tangents is True:
-                fw(
-                    b"property float tx\n"
-                    b"property float ty\n"
-                    b"property float tz\n"
-                )
-            if use_bitangents is True:
-                fw(
-                    b"property float bx\n"
-                    b"property float by\n"
-                    b"property float bz\n"
-                )
-            if use_colors is True:
-                fw(
-                    b"property uchar red\n"
-                    b"property uchar green\n"
-                    b"property uchar blue\n"
-                    b"property uchar alpha\n"
-                )
-            if use_bone_groups is True:
-                fw(
-                    b"property uchar b0\n"
-                    b"property uchar b1\n"
-                    b"property uchar b2\n"
-                    b"property uchar b3\n"
-                )
-            if use_bone_weights is True:
-                fw(
-                    b"property uchar w0\n"
-                    b"property uchar w1\n"
-                    b"property uchar w2\n"
-                    b"property uchar w3\n"
-                )
+                entries.append((len(strings), len(encoded_name), payload_offset, offset - payload_offset, asset_type, payload_hash.digest()))
+                strings += encoded_name
 
-            fw(b"element face %d\n" % len(faces))
-            fw(b"property list uchar uint vertex_indices\n")
-            fw(b"end_header\n")
+            # Write the table of contents
+            padding    = -offset % 8
+            fw(bytes(padding))
+            toc_offset = offset + padding
 
-            # Iterate over vertices
-            for v in vertices:
+            for e in entries:
+                fw(pack("<IIQQII16s", e[0], e[1], e[2], e[3], e[4], 0, e[5]))
 
-                # Write < x, y, z >
-                if use_geometry is True:
-                    fw(pack("<3f", v[0] , v[1], v[2] ))
+            # Write the string table
+            string_offset = toc_offset + len(entries) * Bundle.ENTRY_SIZE
+            fw(strings)
 
-                # Write < s, t >
-                if use_uv_coords is True:
-                    fw(pack("<2f", v[3] , v[4] ))
+            # Write the header
+            f.seek(0)
+            fw(pack("<4sIIIQQQ", Bundle.MAGIC, Bundle.VERSION, len(entries), self.alignment, toc_offset, string_offset, len(strings)))
 
-                # Write < nx, ny, nz >
-                if use_normals is True:
-                    fw(pack("<3f", v[5] , v[6] , v[7] ))
+        return
 
-                # Write < tx, ty, tz >
-                if use_tangents is True:
-                    fw(pack("<3f", v[8] , v[9] , v[10]))
 
-                # Write < bx, by, bz >
-                if use_bitangents is True:
-                    fw(pack("<3f", v[11], v[12], v[13]))
+class Profiler:
 
-                # Write < r, g, b, a >
-                if use_colors is True:
-                    fw(pack("<4B", v[14], v[15], v[16], v[17]))
+    '''
+        gxport.Profiler
+    '''
 
-                if use_bone_groups is True:
-                    fw(pack("<4i", v[18], v[19], v[20], v[21]))
+    # Phases, in the order they are reported
+    PHASES       : tuple = ( 
+        "scene walk", 
+        "mesh extraction", 
+        "dedup", 
+        "ply write", 
+        "texture encode", 
+        "document write", 
+        "skybox", 
+        "rig", 
+        "bounds", 
+        "cache optimization", 
+        "lod generation", 
+        "bvh", 
+        "instances", 
+        "transforms", 
+        "colliders", 
+        "bundle" 
+    )
 
+    # File names, in the export directory
+    REPORT_NAME  : str   = "gxport-report.json"
+    PROFILE_NAME : str   = "gxport-profile.prof"
+
+    # Seconds between memory samples
+    SAMPLE_INTERVAL: float = 0.01
+
+    start        : float            = None
+    phases       : dict             = None
+    assets       : dict             = None
+    critical_path: tuple            = None
+    node_count   : int              = 0
+    throttled    : int              = 0
+    cprofile     : cProfile.Profile = None
+    lock         : threading.Lock   = None
+
+    # Memory samples, as parallel lists of times, RSS, and Python memory traced by tracemalloc
+    sample_times : list             = None
+    sample_rss   : list             = None
+    sample_traced: list             = None
+    sampler      : threading.Thread = None
+    sampling     : bool             = False
+    tracing      : bool             = False
 
-                if use_bone_weights is True:
-                    fw(pack("<4f", v[22], v[23], v[24], v[25]))
+    # Constructor
+    def __init__(self, cprofile: bool = False, memory: bool = False, trace: bool = False):
 
-            # Iterate over faces
-            for i, f in enumerate(faces):
-                w = "<3I"
-                fw(pack("<b", 3))
-                lf = faces[f] 
-                fw(pack(w, lf[0], lf[1], lf[2]))
+        '''
+            Constructs a gxport.Profiler. If cprofile is True, the main thread is also profiled
+            with cProfile, wherever the profiler is enabled. If memory is True, the RSS of the 
+            process is sampled on a thread, and each phase records the peak RSS while it ran.
+            If trace is True, Python allocations are traced with tracemalloc too
+        '''
 
-        return     
+        self.start         = timer()
+        self.phases        = { phase: { "seconds": 0.0, "calls": 0, "bytes written": 0 } for phase in Profiler.PHASES }
+        self.assets        = { }
+        self.lock          = threading.Lock()
+        self.sample_times  = [ ]
+        self.sample_rss    = [ ]
+        self.sample_traced = [ ]
+
+        if cprofile is True:
+            self.cprofile = cProfile.Profile()
+
+        # Trace Python allocations, unless something else already is
+        if trace is True and tracemalloc.is_tracing() is False:
+            tracemalloc.start()
+            self.tracing = True
+
+        # Sample memory until the profiler is stopped
+        if memory is True or trace is True:
+            self.sampling = True
+            self.sampler  = threading.Thread(target=self.sample_memory, name="gxport memory sampler", daemon=True)
+            self.sample()
+            self.sampler.start()
 
-    # This function gives me anxiety 
-    def get_bone_groups_and_weights(self, object):
+        return
 
-        bone_vertex_indices_and_weights = { }
-        bone_group_array  = []
-        bone_weight_array = []
+    # Takes one memory sample
+    def sample(self):
 
-        if len(object.vertex_groups) == 0:
-            return None
+        traced = tracemalloc.get_traced_memory()[0] if self.tracing is True else 0
+        rss    = resident_set_size()
 
-        # Find vertex indices and bone weights for each bone    
-        for g in object.vertex_groups:
+        with self.lock:
+            self.sample_times.append(timer())
+            self.sample_rss.append(rss)
+            self.sample_traced.append(traced)
 
-            # Make a dictionary key for each bone
-            bone_vertex_indices_and_weights[g.name] = []
+        return
 
-            # And a convenience variable
-            working_bone = bone_vertex_indices_and_weights[g.name]
+    # Samples memory until the profiler is stopped. Runs on its own thread
+    def sample_memory(self):
 
-            for v in object.data.vertices:
-                for vg in v.groups:
-                    if vg.group == g.index:
-                        working_bone.append((v.index, vg.weight))
+        while self.sampling is True:
+            self.sample()
+            time.sleep(Profiler.SAMPLE_INTERVAL)
 
-        for z in bone_vertex_indices_and_weights:
-            print(z)
+        return
+
+    # Stops sampling memory and tracing allocations
+    def stop(self):
+
+        if self.sampler is not None:
+            self.sampling = False
+            self.sampler.join()
+            self.sampler  = None
+
+        if self.tracing is True:
+            tracemalloc.stop()
+            self.tracing = False
+
+        return
+
+    # Adds time spent in a phase
+    def add_time(self, phase: str, seconds: float, asset: str = None):
 
         '''
-            bone_vertex_indices_and_weights now looks like
-            {
-                "bone name" : [ (1, 0.6), (2, 0.4), (3, 0.2), ... ],
-                "spine"     : [ (9, 0.2), ... ],
-                ...
-                "head"      : [ ... , (3302, 0.23), (3303, 0.34), (3304, 0.6) ]
-            }
+            Add seconds to a phase, and to the asset it was spent on. Safe to call from any thread
         '''
-        # This exporter only writes the 4 most heavily weighted bones to each vertex
 
-        # Iterate over every vert
-        for v in object.data.vertices:
+        # Sample the end of the phase, so phases shorter than the sample interval are seen too
+        if self.sampler is not None:
+            self.sample()
 
-            # Keep track of the 4 most heavy weights and their vertex groups
-            heaviest_groups  = [ -1, -1, -1, -1 ] 
-            heaviest_weights = [ 0, 0, 0, 0 ]
+        with self.lock:
+            totals            = self.phases.setdefault(phase, { "seconds": 0.0, "calls": 0, "bytes written": 0 })
+            totals["seconds"] = totals["seconds"] + seconds
+            totals["calls"]   = totals["calls"] + 1
 
-            # Iterate through bones
-            for c in bone_vertex_indices_and_weights.keys():
-                d = bone_vertex_indices_and_weights[c]
+            # The peak of the samples taken while the phase ran. Phases on other threads overlap,
+            # so this is the peak of the process while the phase ran, not what the phase allocated
+            if self.sampler is not None:
+                first                 = bisect_left(self.sample_times, self.sample_times[-1] - seconds)
+                totals["peak rss"]    = max(totals.get("peak rss", 0), max(self.sample_rss[first:]))
 
-                for i in d:
-                    if v.index == i[0]:
-                        if i[1] > heaviest_weights[0]:
-                            heaviest_groups[0]  = object.vertex_groups[c].index
-                            heaviest_weights[0] = i[1]
-                        elif i[1] > heaviest_weights[1]:
-                            heaviest_groups[1]  = object.vertex_groups[c].index
-                            heaviest_weights[1] = i[1]
-                        elif i[1] > heaviest_weights[2]:
-                            heaviest_groups[2]  = object.vertex_groups[c].index
-                            heaviest_weights[2] = i[1]
-                        elif i[1] > heaviest_weights[3]:
-                            heaviest_groups[3]  = object.vertex_groups[c].index
-                            heaviest_weights[3] = i[1]
-                        else:
-                            None
-            bone_group_array.append(heaviest_groups)
-            bone_weight_array.append(heaviest_weights)
+                if self.tracing is True:
+                    totals["peak python"] = max(totals.get("peak python", 0), max(self.sample_traced[first:]))
 
-        return (bone_group_array, bone_weight_array)
+            if asset is not None:
+                times        = self.assets.setdefault(asset, { }).setdefault("seconds", { })
+                times[phase] = times.get(phase, 0.0) + seconds
 
-    # Get bone names and vertex group indicies
-    def get_bone_names_and_indexes(self, object):
+        return
 
-        ret: dict = { }
+    # Times a block of code
+    @contextlib.contextmanager
+    def phase(self, phase: str, asset: str = None):
 
-        for vg in object.vertex_groups:
-            ret[vg.name] = vg.index
+        start = timer()
 
-        return ret
+        try:
+            yield
+        finally:
+            self.add_time(phase, timer() - start, asset)
 
-    # Writes JSON and ply to a directory 
-    def write_to_directory(self, directory: str):
+    # Records a statistic of an asset
+    def record(self, asset: str, key: str, value):
 
-        parts_directory = directory + "/parts/"
+        with self.lock:
+            self.assets.setdefault(asset, { })[key] = value
 
-        self.ply_path   = (parts_directory + self.name + ".ply")
-        self.path       = (parts_directory + self.name + ".json")
+        return
 
-        self.export_ply(self.ply_path, "")
+    # Records the size of a file written for an asset, in a phase
+    def add_bytes(self, phase: str, size: int, asset: str = None):
+
+        with self.lock:
+            totals                  = self.phases.setdefault(phase, { "seconds": 0.0, "calls": 0, "bytes written": 0 })
+            totals["bytes written"] = totals["bytes written"] + size
+
+            if asset is not None:
+                stats                  = self.assets.setdefault(asset, { })
+                stats["bytes written"] = stats.get("bytes written", 0) + size
 
-        self.write_to_file(self.path)
-        
         return
 
-class Texture:
-    '''
-        - Texture
-    '''
+    # Records the schedule of the export
+    def add_schedule(self, scheduler):
 
-    json_data  : dict            = None
+        self.critical_path = scheduler.critical_path()
+        self.node_count    = self.node_count + len(scheduler.nodes)
+        self.throttled     = self.throttled + scheduler.throttled
 
-    image      : bpy.types.Image = None
-    name       : str             = None
-    path       : str             = None
-    addressing : str             = 'repeat'
-    filter_mode: str             = 'linear'
-    generated  : bool            = None
+        return
 
-    def __init__(self, *args):
+    # Starts profiling the calling thread with cProfile
+    def enable(self):
 
-        if len(args) > 1 or len(args) < 1:
-            pass
-        
-        self.json_data = { }
+        if self.cprofile is not None:
+            self.cprofile.enable()
 
-        # Texture Image node
-        if isinstance(args[0], bpy.types.ShaderNodeTexImage):
-            
-            if args[0].image is None:
-                # TODO: Set missing texture
-                print("Missing Texture")
-                return
-            image = args[0]
+        return
 
-            # Set the image name
-            self.name  = image.image.name
+    # Stops profiling the calling thread with cProfile
+    def disable(self):
 
-            # Set the image object
-            self.image = image.image
+        if self.cprofile is not None:
+            self.cprofile.disable()
 
-            # Get the filter mode
-            if   image.interpolation == 'Linear':
-                self.filter_mode = 'linear'
-            elif image.interpolation == 'Closest':
-                self.filter_mode = 'nearest'
+        return
 
-            # Get the addressing mode
-            if   image.extension == 'REPEAT':
-                self.addressing = 'repeat'
-            elif image.extension == 'EXTEND':
-                self.addressing = 'clamp edge'
-            elif image.extension == 'CLIP':
-                self.addressing = 'clamp border'
+    # Returns the report as a dictionary
+    def to_dict(self):
 
-            self.generated = False
+        with self.lock:
+            assets = { name: dict(stats) for name, stats in sorted(self.assets.items()) }
+            phases = { name: dict(totals) for name, totals in self.phases.items() }
+            rss    = list(self.sample_rss)
 
-        # Image
-        elif isinstance(args[0], bpy.types.Image):
-            
-            image = args[0]
+        totals = {
+            "bytes written" : sum(a.get("bytes written", 0) for a in assets.values()),
+            "vertex count"  : sum(a.get("vertex count", 0) for a in assets.values()),
+            "triangle count": sum(a.get("triangle count", 0) for a in assets.values())
+        }
 
-            # Set the image name
-            self.name = image.name
-         
-            # Set the image object
-            self.image = image
+        if rss:
+            totals["peak rss"]    = max(rss)
 
-            # Default to repeat addressing with linear filtering
+        if self.tracing is True:
+            totals["peak python"] = tracemalloc.get_traced_memory()[1]
 
-            self.generated = True
+        # Phases that run on workers overlap, so phase seconds can add up to more than the wall time
+        ret = {
+            "seconds"      : timer() - self.start,
+            "phases"       : phases,
+            "totals"       : totals,
+            "nodes"        : self.node_count,
+            "throttled"    : self.throttled,
+            "critical path": None,
+            "assets"       : assets
+        }
 
-        self.json_data['$schema']    = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/texture-schema.json"
-        self.json_data['name']       = self.name
-        
-        self.json_data['addressing'] = self.addressing
-        self.json_data['filter']     = self.filter_mode
-        print("CONSTRUCTING " + self.name)
+        if self.critical_path is not None:
+            ret["critical path"] = { "seconds": self.critical_path[0], "nodes": self.critical_path[1] }
 
-        return
+        return ret
 
-    # Save texture
-    def save_texture(self,  path: str):
-        self.path              = path
-        self.json_data['path'] = self.path
+    # Writes the report, and the cProfile dump, to a directory
+    def write(self, directory: str):
 
-        if self.image is not None:
-            print("SAVING " + self.name)
-            self.image.save_render(self.path)
+        '''
+            Write the report to "[directory]/gxport-report.json". If cProfile is on, the stats
+            are written to "[directory]/gxport-profile.prof", for pstats or snakeviz
+        '''
 
-        return
-        
-    # Returns JSON text of object
-    def json(self):
-        
-        return json.dumps(self.json_data, indent=4)
+        with open(os.path.join(directory, Profiler.REPORT_NAME), "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
 
-    # Destructor
-    def __del__(self):
-        if self.image is not None:
-            if self.generated is True:
-                print("DELETING " + self.name)
-                bpy.data.images.remove(self.image)
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(os.path.join(directory, Profiler.PROFILE_NAME))
 
         return
 
-class Material:
+    # Returns the asset name of a document, from its path
+    @staticmethod
+    def document_name(path: str) -> str:
+
+        return os.path.basename(os.path.dirname(path)) + "/" + os.path.basename(path)
+
+class ExportSession:
 
     '''
-        - Material
+        gxport.ExportSession
     '''
 
-    json_data: dict = None
+    # The session of the export in progress
+    current   : object = None
 
-    name:      str  = None
+    # Asset caches
+    materials : dict   = None
+    parts     : dict   = None
 
-    path:      str  = None
+    # Generated image datablocks, removed when the session is closed
+    images    : list   = None
 
-    principled_node: bpy.types.ShaderNodeBsdfPrincipled = None
-    node_tree: bpy.types.ShaderNodeTree = None
+    # Memory cap in bytes. 0 is unlimited
+    memory_cap: int    = 0
 
-    albedo_node = None
-    rough_node  = None
-    metal_node  = None
-    normal_node = None
+    # Memory budget of the process in bytes. In bounded memory mode, everything written is freed. 0 is off
+    memory_budget: int = 0
+
+    # Export settings, as { setting: value }. They are applied while the session is entered
+    settings  : dict   = None
+
+    # Values the settings replaced, as [ ( owner, attribute, value ) ]. Put back when the session is exited
+    replaced  : list   = None
+
+    # Timings and statistics of the export
+    profiler  : Profiler = None
+
+    # Every file written in the session, journaling or not
+    files      : set            = None
+
+    # Journal of written files, so a cancelled export can be rolled back
+    journaling : bool           = False
+    written    : list           = None
+    backups    : dict           = None
+    directories: list           = None
+    lock       : threading.Lock = None
+
+    # Processes for CPU heavy work that does not touch Blender. None or False runs it on threads
+    pool       : object         = None
+    pool_lock  : threading.Lock = None
+
+    previous  : object = None
+
+    # True for the session get() makes outside of a with block
+    implicit  : bool   = False
+
+    # File name suffix of files backed up by the journal
+    BACKUP_SUFFIX: str = ".gxport-backup"
+
+    # Constructor
+    def __init__(self, memory_cap: int = 0, journaling: bool = False, profiler: Profiler = None, memory_budget: int = 0, settings: dict = None):
+
+        '''
+            Constructs an empty gxport.ExportSession. Written assets are evicted when the
+            estimated memory held by the caches exceeds memory_cap bytes. If journaling is
+            True, every file written in the session can be rolled back. Timings are recorded 
+            in profiler, or in a new gxport.Profiler. If memory_budget is set, every written 
+            asset is evicted, whatever the cap. Settings missing from settings keep their 
+            defaults
+        '''
+
+        self.materials     = { }
+        self.parts         = { }
+        self.images        = [ ]
+        self.memory_cap    = memory_cap
+        self.memory_budget = memory_budget
+        self.profiler      = profiler if profiler is not None else Profiler()
+        self.settings      = dict(settings) if settings is not None else { }
+        self.replaced      = [ ]
+
+        self.files         = set()
+        self.journaling    = journaling
+        self.written       = [ ]
+        self.backups       = { }
+        self.directories   = [ ]
+        self.lock          = threading.Lock()
+        self.pool_lock     = threading.Lock()
+
+        return
+
+    @staticmethod
+    def get():
+
+        '''
+            Returns the current session. Outside of a with block, a session is made on first use
+        '''
+
+        if ExportSession.current is None:
+            ExportSession.current          = ExportSession()
+            ExportSession.current.implicit = True
+
+        return ExportSession.current
+
+    # Ends the session get() made, if it is the current one
+    @staticmethod
+    def end_implicit():
+
+        '''
+            Writes outside of a with block share the session get() makes. Scene and entity 
+            writes end it when they finish, so the next write starts with empty caches instead
+            of reusing assets from this one
+        '''
+
+        session = ExportSession.current
+
+        if session is not None and session.implicit is True:
+            session.close()
+            ExportSession.current = None
+
+        return
+
+    def __enter__(self):
+
+        # Apply the settings, and make this the current session
+        self.apply_settings()
+
+        self.previous         = ExportSession.current
+        ExportSession.current = self
+
+        self.start_pool()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        # Tear down the caches, and restore the previous session and settings
+        self.close()
+        self.restore_settings()
+
+        ExportSession.current = self.previous
+        self.previous         = None
+
+        return False
+
+    # Returns the name of each export setting, and the attribute it sets
+    @staticmethod
+    def setting_attributes() -> dict:
+
+        return {
+            'document encoding'    : ( serializer, "encoding" ),
+            'position encoding'    : ( Part, "position_encoding" ),
+            'uv encoding'          : ( Part, "uv_encoding" ),
+            'normal encoding'      : ( Part, "normal_encoding" ),
+            'bone groups'          : ( Part, "use_bone_groups" ),
+            'bone weights'         : ( Part, "use_bone_weights" ),
+            'weight encoding'      : ( Part, "weight_encoding" ),
+            'index encoding'       : ( Part, "index_encoding" ),
+            'optimize vertex cache': ( Part, "optimize_vertex_cache" ),
+            'optimize overdraw'    : ( Part, "optimize_overdraw" ),
+            'lod ratios'           : ( Part, "lod_ratios" ),
+            'lod pixel error'      : ( Part, "lod_pixel_error" ),
+            'hull vertex limit'    : ( Collider, "hull_vertex_limit" )
+        }
+
+    # Applies the settings, and remembers the values they replace
+    def apply_settings(self):
+
+        '''
+            The classes that read a setting keep it as a class attribute, so settings are set
+            there while the session is entered, and put back when it is exited. An export that 
+            does not set them, like a gxport.Scene made by a script, gets the defaults and not
+            whatever the last export used. The axes are 'forward axis' and 'up axis'. Raises 
+            ValueError, before anything is applied, if they are on the same axis
+        '''
+
+        attributes = ExportSession.setting_attributes()
+        axes       = 'forward axis' in self.settings or 'up axis' in self.settings
+        forward    = self.settings.get('forward axis', 'Y+')
+        up         = self.settings.get('up axis', 'Z+')
+
+        if axes:
+            Orientation.check(forward, up)
+
+        for setting, value in self.settings.items():
+            if setting not in attributes:
+                continue
+
+            owner, attribute = attributes[setting]
+
+            self.replaced.append(( owner, attribute, getattr(owner, attribute) ))
+            setattr(owner, attribute, value)
+
+        if axes:
+            self.replaced.append(( Orientation, "matrix", Orientation.matrix ))
+            self.replaced.append(( Orientation, "array", Orientation.array ))
+
+            Orientation.set(forward, up)
+
+        return
+
+    # Puts back the values the settings replaced
+    def restore_settings(self):
+
+        for owner, attribute, value in reversed(self.replaced):
+            setattr(owner, attribute, value)
+
+        self.replaced.clear()
+
+        return
+
+    # Tracks a generated image datablock
+    def track_image(self, image: bpy.types.Image):
+
+        self.images.append(image)
+
+        return
+
+    # Records a file that is about to be written
+    def record(self, path: str):
+
+        '''
+            Call before writing a file. When journaling, a file that is already there is moved
+            aside, so it can be restored by rollback. Safe to call from any thread
+        '''
+
+        with self.lock:
+
+            # Only the first write of a path needs a backup
+            if path in self.files:
+                return
+
+            self.files.add(path)
+
+            if self.journaling is False:
+                return
+
+            if os.path.exists(path):
+                self.backups[path] = path + ExportSession.BACKUP_SUFFIX
+                os.replace(path, self.backups[path])
+
+            self.written.append(path)
+
+        return
+
+    # Returns every file written in the session so far
+    def written_files(self) -> list:
+
+        with self.lock:
+            return list(self.files)
+
+    # Records a directory that was made
+    def record_directory(self, path: str):
+
+        if self.journaling is False:
+            return
+
+        with self.lock:
+            self.directories.append(path)
+
+        return
+
+    # Keeps everything written in the session
+    def commit(self):
+
+        '''
+            Delete the backups of overwritten files
+        '''
+
+        with self.lock:
+            for backup in self.backups.values():
+                try   : os.remove(backup)
+                except: pass
+
+            self.written.clear()
+            self.backups.clear()
+            self.directories.clear()
+
+        return
+
+    # Undoes everything written in the session
+    def rollback(self):
+
+        '''
+            Delete every file written in the session, restore overwritten files, and remove 
+            directories the session made
+        '''
+
+        with self.lock:
+            for path in reversed(self.written):
+                try   : os.remove(path)
+                except: pass
+
+            for path, backup in self.backups.items():
+                try   : os.replace(backup, path)
+                except: pass
+
+            for path in reversed(self.directories):
+                try   : os.rmdir(path)
+                except: pass
+
+            self.files.clear()
+            self.written.clear()
+            self.backups.clear()
+            self.directories.clear()
+
+        return
+
+    # Makes the process pool
+    def start_pool(self):
+
+        '''
+            Makes a pool of spawned processes, one per core. Blender runs threads of its own,
+            so forking it is not safe, and spawned processes start clean. The pool is only 
+            made on the main thread, otherwise work for the pool runs on the calling thread.
+            Spawned processes import the main script again, without Blender, so a script that
+            exports, like cli.py, must only import bpy under its __name__ == "__main__" guard
+        '''
+
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        with self.pool_lock:
+            if self.pool is None:
+                try:
+                    self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn"))
+
+                    print("[gxport] [ExportSession] Made a pool of up to " + str(os.cpu_count() or 1) + " processes, spawned as work arrives")
+                except (ValueError, OSError):
+                    print("[gxport] [ExportSession] Processes can not be spawned, running on threads")
+                    self.pool = False
+
+        return
+
+    # Runs a function in another process
+    def run_in_process(self, function, *args):
+
+        '''
+            Runs function(*args) on the process pool, and returns the result. Waits, but 
+            releases the GIL, so callers on different threads run in parallel. The function
+            must be in gxport_geometry, so spawned processes can import it without Blender.
+            Without a pool, or if the pool breaks, the function runs on the calling thread
+        '''
+
+        with self.pool_lock:
+            pool = self.pool
+
+        if not pool:
+            return function(*args)
+
+        try:
+            return pool.submit(function, *args).result()
+        except concurrent.futures.process.BrokenProcessPool:
+            print("[gxport] [ExportSession] Process pool broke, running on threads")
+
+            with self.pool_lock:
+                self.pool = False
+
+            return function(*args)
+
+    # Returns the estimated memory held by the caches, in bytes
+    def memory_usage(self) -> int:
+
+        ret: int = 0
+
+        for material in self.materials.values():
+            ret = ret + material.memory_usage()
+
+        for part in self.parts.values():
+            ret = ret + part.memory_usage()
+
+        return ret
+
+    # Frees written assets until the caches fit in the memory cap
+    def evict(self):
+
+        '''
+            Release assets that have already been written, oldest first, until the estimated 
+            memory usage is under the memory cap
+        '''
+
+        # In bounded memory mode, nothing written is kept
+        cap   = 0 if self.memory_budget > 0 else self.memory_cap
+
+        # Unlimited
+        if self.memory_budget <= 0 and self.memory_cap <= 0:
+            return
+
+        usage = self.memory_usage()
+
+        # Parts are not needed once they are written
+        for name in list(self.parts.keys()):
+            if usage <= cap:
+                return
+
+            part = self.parts[name]
+
+            if part.written is True:
+                usage = usage - part.memory_usage()
+                part.release()
+                del self.parts[name]
+
+        # Materials stay in the cache, so entities can still reference them, but their images are freed
+        for material in self.materials.values():
+            if usage <= cap:
+                return
+
+            if material.written is True:
+                usage = usage - material.memory_usage()
+                material.release()
+
+        return
+
+    # Tears down the session
+    def close(self):
+
+        '''
+            Release every cached asset and remove every generated image datablock
+        '''
+
+        for material in self.materials.values():
+            material.release()
+
+        for part in self.parts.values():
+            part.release()
+
+        for image in self.images:
+            remove_image(image)
+
+        self.profiler.stop()
+
+        if self.pool:
+            self.pool.shutdown(wait=True)
+
+        self.pool = None
+
+        self.materials.clear()
+        self.parts.clear()
+        self.images.clear()
+        self.files.clear()
+
+        return
+
+# Makes a directory, and records it in the session journal. Raises if the directory exists
+def make_directory(path: str):
+
+    os.mkdir(path)
+
+    ExportSession.get().record_directory(path)
+
+    return
+
+# Returns the resident set size of the process, in bytes
+def resident_set_size() -> int:
+
+    # Linux
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    # Elsewhere, the peak is the best there is. macOS reports bytes, everything else kilobytes
+    try:
+        import resource
+    except ImportError:
+        return 0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak if sys.platform == "darwin" else peak * 1024
+
+# Removes an image datablock, if it has not been removed already
+def remove_image(image: bpy.types.Image):
+
+    try:
+        bpy.data.images.remove(image)
+    except ReferenceError:
+        pass
+
+    return
+
+@dataclass
+class Node:
+
+    '''
+        gxport.Node
+    '''
+
+    name        : str
+    function    : object
+    dependencies: list
+    main_thread : bool
+    dependents  : list  = field(default_factory=list)
+    waiting     : int   = 0
+    start       : float = None
+    end         : float = None
+    done        : bool  = False
+
+class Scheduler:
+
+    '''
+        gxport.Scheduler
+    '''
+
+    nodes   : dict  = None
+    order   : list  = None
+    finished: int   = 0
+
+    # Progress file, for exports running in another process
+    progress_path: str   = None
+    progress_time: float = 0.0
+
+    # Memory budget in bytes. Over budget, nodes run one at a time. 0 is unlimited
+    memory_budget: int   = 0
+    throttled    : int   = 0
+
+    # Is there a main thread node that can run now?
+    main_ready   : bool  = False
+
+    ready   : deque = None
+    running : dict  = None
+    workers : int   = None
+    executor: concurrent.futures.ThreadPoolExecutor = None
+
+    # Constructor
+    def __init__(self, workers: int = 0):
+
+        '''
+            Constructs a gxport.Scheduler, running worker nodes on a pool of workers threads. 
+            0 workers uses one thread per core. Threads only overlap I/O and the waits on the 
+            session process pool, where the CPU bound geometry work runs; JSON encoding still 
+            holds the GIL
+        '''
+
+        self.nodes   = { }
+        self.order   = [ ]
+        self.ready   = deque()
+        self.running = { }
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+
+        return
+
+    # Adds a node to the graph
+    def add(self, name: str, function, dependencies: list = (), main_thread: bool = False) -> str:
+
+        '''
+            Adds a node that runs function once every dependency has finished. Dependencies must
+            already be in the graph, so the graph is always acyclic. Nodes that touch Blender data
+            must run on the main thread. Returns the name of the node
+        '''
+
+        # Check for duplicates
+        if name in self.nodes:
+            raise ValueError("[gxport] [Scheduler] Node \"" + name + "\" is already scheduled")
+
+        node = Node(name, function, list(dependencies), main_thread)
+
+        # Count unfinished dependencies
+        for d in node.dependencies:
+            dependency = self.nodes.get(d)
+
+            if dependency is None:
+                raise ValueError("[gxport] [Scheduler] Node \"" + name + "\" depends on unknown node \"" + d + "\"")
+
+            if dependency.done is False:
+                node.waiting = node.waiting + 1
+                dependency.dependents.append(node)
+
+        self.nodes[name] = node
+        self.order.append(node)
+
+        if node.waiting == 0:
+            self.ready.append(node)
+
+        return name
+
+    # Adds a dependency to a node that has not started
+    def add_dependency(self, name: str, dependency: str):
+
+        '''
+            Makes a node wait for another node. Used by running nodes to extend the graph
+        '''
+
+        node       = self.nodes[name]
+        dependency = self.nodes[dependency]
+
+        if node.waiting == 0:
+            raise ValueError("[gxport] [Scheduler] Node \"" + name + "\" is no longer waiting")
+
+        node.dependencies.append(dependency.name)
+
+        if dependency.done is False:
+            node.waiting = node.waiting + 1
+            dependency.dependents.append(node)
+
+        return
+
+    # Checks if a node is in the graph
+    def has(self, name: str) -> bool:
+
+        return name in self.nodes
+
+    # Runs the graph until every node has finished
+    def run(self):
+
+        '''
+            Run every scheduled node. Main thread nodes run here, between polls of the pool
+        '''
+
+        while self.step() == False:
+            pass
+
+        self.write_progress(True)
+
+        return
+
+    # Runs at most one main thread node, and collects finished worker nodes
+    def step(self, timeout: float = None) -> bool:
+
+        '''
+            Does one bounded unit of work. Returns True when every node has finished
+        '''
+
+        main_node = None
+        waiting   = False
+        pressure  = self.over_budget()
+
+        # Over the memory budget, free written assets before starting anything
+        if pressure is True:
+            ExportSession.get().evict()
+            pressure = self.over_budget()
+
+        # Still over, so nothing starts until running nodes finish, and then only one at a time
+        if pressure is True:
+            self.throttled = self.throttled + 1
+            slots          = 0 if self.running else 1
+        else:
+            slots          = len(self.ready)
+
+        # Hand ready worker nodes to the pool, and pick a ready main thread node
+        for i in range(len(self.ready)):
+            node = self.ready.popleft()
+
+            if slots == 0:
+                self.ready.append(node)
+                waiting = waiting or node.main_thread
+            elif node.main_thread is True and main_node is None:
+                main_node = node
+                slots     = slots - 1
+            elif node.main_thread is True:
+                self.ready.append(node)
+                waiting   = True
+            elif len(self.running) >= self.workers:
+                self.ready.append(node)
+            else:
+                if self.executor is None:
+                    self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+
+                node.start = timer()
+                self.running[self.executor.submit(node.function)] = node
+                slots      = slots - 1
+
+        self.main_ready = waiting and pressure is False
+
+        # Run the main thread node
+        if main_node is not None:
+            main_node.start = timer()
+            main_node.function()
+            main_node.end   = timer()
+
+            self.finish(main_node)
+
+        # Wait for the pool, unless there is more main thread work
+        if self.running:
+            finished, pending = concurrent.futures.wait(
+                self.running.keys(),
+                timeout     = 0 if self.main_ready or main_node is not None else timeout,
+                return_when = concurrent.futures.FIRST_COMPLETED
+            )
+
+            for future in finished:
+                node     = self.running.pop(future)
+                node.end = timer()
+
+                # Raises the exception of a failed node
+                future.result()
+
+                self.finish(node)
+
+        self.write_progress()
+
+        return not self.ready and not self.running
+
+    # Checks if the process is over the memory budget
+    def over_budget(self) -> bool:
+
+        return self.memory_budget > 0 and resident_set_size() > self.memory_budget
+
+    # Writes the number of finished nodes to the progress file
+    def write_progress(self, force: bool = False):
+
+        '''
+            Replaces the progress file with { "finished": ..., "total": ... }, at most 4 times a second
+        '''
+
+        if self.progress_path is None:
+            return
+
+        if force is False and timer() - self.progress_time < 0.25:
+            return
+
+        self.progress_time = timer()
+
+        # Write, then replace, so a reader never sees half a file
+        with open(self.progress_path + ".tmp", "w") as f:
+            json.dump({ "finished": self.finished, "total": len(self.nodes) }, f)
+
+        os.replace(self.progress_path + ".tmp", self.progress_path)
+
+        return
+
+    # Marks a node as finished, and readies its dependents
+    def finish(self, node: Node):
+
+        node.done     = True
+        self.finished = self.finished + 1
+
+        # Drop the function, so anything it references can be freed
+        node.function = None
+
+        for dependent in node.dependents:
+            dependent.waiting = dependent.waiting - 1
+
+            if dependent.waiting == 0:
+                self.ready.append(dependent)
+
+        node.dependents = [ ]
+
+        return
+
+    # Returns the longest chain of dependent nodes
+    def critical_path(self) -> tuple:
+
+        '''
+            Returns ( seconds, [ node names ] ) for the most expensive chain of finished nodes
+        '''
+
+        # A node finishes after all of its dependencies, so finish order is a topological order
+        cost    : dict = { }
+        previous: dict = { }
+
+        for node in sorted(( n for n in self.order if n.done is True ), key=lambda n: (n.end, n.start)):
+
+            best = None
+
+            for d in node.dependencies:
+                if best is None or cost.get(d, 0.0) > cost.get(best, 0.0):
+                    best = d
+
+            cost[node.name]     = (node.end - node.start) + (cost.get(best, 0.0) if best is not None else 0.0)
+            previous[node.name] = best
+
+        if not cost:
+            return (0.0, [ ])
+
+        name = max(cost, key=cost.get)
+        ret  = (cost[name], [ ])
+
+        while name is not None:
+            ret[1].append(name)
+            name = previous.get(name)
+
+        ret[1].reverse()
+
+        return ret
+
+    # Prints the critical path
+    def report(self):
+
+        seconds, path = self.critical_path()
+
+        print("[gxport] [Scheduler] Critical path " + "%.3f" % seconds + "s: " + " -> ".join(path))
+
+        ExportSession.get().profiler.add_schedule(self)
+
+        return
+
+    # Shuts down the pool
+    def close(self):
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+        return
+
+class Light:
+
+    '''
+        gxport.Light
+    '''
+
+    # Uninitialized data
+    name      : str  = None
+    location  : list = None
+    color     : list = None
+    light_type: str  = None
+
+    json_data : dict = None
+
+    # Constructor
+    def __init__(self, object: bpy.types.Object):
+
+        '''
+            Constructs a gxport.Light from a bpy.types.Object 
+        '''
+
+        # Type check
+        if isinstance(object.data, bpy.types.Light) == False:
+            return
+
+        # Set class data
+
+        # Name
+        self.name                  = object.name
+
+        # Location, on the exported axes
+        self.location              = Orientation.vector(object.location)
+        
+        # Color
+        self.color    = [ None, None, None ]
+        self.color[0]              = object.data.color[0] * object.data.energy
+        self.color[1]              = object.data.color[1] * object.data.energy
+        self.color[2]              = object.data.color[2] * object.data.energy
+        
+        # Set up the dictionary
+        self.json_data             = { }
+        self.json_data["$schema"]  = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/light-schema.json"
+        self.json_data["name"]     = self.name
+        self.json_data["location"] = self.location.copy()
+        self.json_data["color"]    = self.color.copy()
+
+        return
+
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        '''
+            Returns a G10 readable JSON object as a dictionary
+        '''
+
+        return self.json_data
+
+    # Returns file JSON
+    def json(self):
+
+        '''           
+            Returns a G10 readable JSON object as a string
+        '''
+
+        # Dump the dictionary as a JSON object string
+        return json.dumps(self.to_dict(), indent=4)
+
+    # Writes JSON to a specified file
+    def write_to_file(self, path: str):
+        
+        ''' 
+            Write a G10 readable JSON object text to a file path
+        '''
+
+        # Write the JSON data to the specified path
+        serializer.write(self.to_dict(), path)
+
+        return
+
+    @staticmethod
+    def import_from_file(path: str):
+        
+        # Uninitialized data
+        light_json    : dict = None
+
+        light_name    : str  = None
+        light_location: list = None
+        light_color   : list = None
+        light_comment : str  = None
+        
+        # Open the light file from the path
+        with open(path, "r") as f:
+
+            # Make a dictionary from the JSON
+            light_json = json.load(f)
+
+        # Copy out important properties
+        light_name     = light_json['name']
+        light_location = light_json['location']
+        light_color    = light_json['color']
+
+        # Create a new light
+        light_data = bpy.data.lights.new(name=light_name+" data", type='POINT')
+
+        # Create a new object
+        light_object = bpy.data.objects.new(name=light_name, object_data=light_data)
+        
+        # Add the new object to the current scene
+        bpy.context.collection.objects.link(light_object)
+
+        # Set the light properties
+        light_object.location = light_location
+
+class Camera:
+
+    '''
+        - Camera
+    '''
+
+    name     : str   = None
+    fov      : float = None
+    near     : float = None
+    far      : float = None
+    target   : list  = None
+    up       : list  = None
+    where    : list  = None
+
+    json_data: dict  = None
+
+    def __init__(self, object: bpy.types.Camera):
+
+        # Type check
+        if isinstance(object.data, bpy.types.Camera) == False:
+            return
+
+        # Set the name
+        self.name                = object.name
+
+        # Set the FOV
+
+        # Make a temporary variable for the unit type
+        tmp                       = object.data.lens_unit
+
+        object.data.lens_unit     = 'FOV'
+        self.fov                  = object.data.lens
+
+        # Restore the correct unit from the temp
+        object.data.lens_unit     = tmp
+
+        # Set the near clip
+        self.near                 = object.data.clip_start
+
+        # Set the far clip
+        self.far                  = object.data.clip_end
+
+        # Set the target
+        self.target               = [ None, None, None ]
+        self.target[0]            = object.matrix_world[0][2] * -1
+        self.target[1]            = object.matrix_world[1][2] * -1
+        self.target[2]            = object.matrix_world[2][2] * -1
+
+        # Set the up 
+        self.up                   = [ None, None, None ]
+        self.up[0]                = object.matrix_world[0][1]
+        self.up[1]                = object.matrix_world[1][1]
+        self.up[2]                = object.matrix_world[2][1]
+
+        # Set the location
+        self.where                = [ None, None, None ]
+        self.where[0]             = object.matrix_world[0][3]
+        self.where[1]             = object.matrix_world[1][3]
+        self.where[2]             = object.matrix_world[2][3]
+
+        # Turn the vectors to the exported axes
+        self.target, self.up, self.where = Orientation.points(( self.target, self.up, self.where )).tolist()
+
+        # Set up the dictionary
+        self.json_data            = { }
+        self.json_data["$schema"] = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/camera-schema.json"
+        self.json_data["name"]    = self.name
+        self.json_data["fov"]     = self.fov
+        self.json_data["near"]    = self.near
+        self.json_data["far"]     = self.far
+        self.json_data["target"]  = (self.target.copy())
+        self.json_data["up"]      = (self.up.copy())
+        self.json_data["where"]   = (self.where.copy())
+
+        return
+
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        return self.json_data
+
+    def json(self):
+
+        return json.dumps(self.to_dict(), indent=4)
+
+    # Writes JSON to a specified file
+    def write_to_file(self, path: str):
+        
+        ''' 
+            Write a G10 readable JSON object text to a file path
+        '''
+
+        serializer.write(self.to_dict(), path)
+
+        return
+
+class Part:
+
+    '''
+        Part
+    '''
+
+    name       : str            = None
+ 
+    json_data  : dict           = None
+    mesh       : bpy.types.Mesh = None
+    path       : str            = None
+    ply_path   : str            = None
+    shader_name: str            = "G10/shaders/G10 PBR.json"
+
+    bone_data  : dict           = None 
+
+    # Vertex attributes
+    use_geometry    : bool      = True
+    use_uv_coords   : bool      = True
+    use_normals     : bool      = True
+    use_tangents    : bool      = False 
+    use_bitangents  : bool      = False
+    use_colors      : bool      = False
+    use_bone_groups : bool      = False
+    use_bone_weights: bool      = False
+
+    # Vertex attribute encodings. Positions are FLOAT or UNORM16, UVs are FLOAT, HALF or UNORM16,
+    # directions are FLOAT or OCTAHEDRAL and bone weights are FLOAT or UNORM8
+    position_encoding: str      = "FLOAT"
+    uv_encoding      : str      = "FLOAT"
+    normal_encoding  : str      = "FLOAT"
+    weight_encoding  : str      = "FLOAT"
+
+    # Faces are a LIST with a count per face, or TRIANGLES, a contiguous block of 16 or 32 bit indices
+    index_encoding   : str      = "LIST"
+
+    # Index buffer optimization
+    optimize_vertex_cache: bool = False
+    optimize_overdraw    : bool = False
+
+    # Triangle ratio of each level of detail, and the error in pixels at which each is switched to
+    lod_ratios      : tuple     = ( )
+    lod_pixel_error : float     = 1.0
+    lod_paths       : list      = None
+
+    # Radians per pixel of a 1080 pixel tall, 60 degree field of view
+    PIXEL_ANGLE     : float     = math.radians(60) / 1080
+
+    # Has the part been written?
+    written         : bool      = False
+
+    # Extracted data, kept from extract until write_ply
+    vertices        : dict      = None
+    vertex_count    : int       = None
+    faces           : dict      = None
+
+    # Local bounds, as ( [ min x, y, z ], [ max x, y, z ] ), and bounding sphere, as ( [ x, y, z ], radius )
+    bounds          : tuple     = None
+    sphere          : tuple     = None
+
+    # Materials the faces use, in slot order, and the extracted faces of each material, 
+    # as ( material name, first triangle, triangle count )
+    materials       : list      = None
+    submeshes       : list      = None
+
+    # Objects of a static batch, which are merged in world space
+    batch           : list      = None
+
+    # Constructor
+    def __init__(self, object: bpy.types.Object, batch = None):
+
+        # Type check
+        if isinstance(object.data, bpy.types.Mesh) == False:
+            return
+
+        # Set class data
+        self.materials     = used_materials(object)
+        self.material_name = self.materials[0].name if self.materials else None
+        
+        # Name
+        self.name                  = object.name
+
+        # Blender mesh
+        self.mesh = object
+
+        # A static batch has the materials of all of its objects
+        if batch is not None:
+            self.name      = batch.name
+            self.batch     = batch.objects
+            self.materials = list(dict.fromkeys(m for o in batch.objects for m in used_materials(o)))
+
+        # Set up the dictionary
+        self.json_data             = { }
+        self.json_data["$schema"]  = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/part-schema.json"
+        self.json_data["name"]     = self.name
+        self.json_data["shader"]   = self.shader_name
+        self.json_data["material"] = self.material_name
+
+        # Add the part to the cache
+        ExportSession.get().parts[self.name] = self
+
+        return
+
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        self.json_data['path'] = self.ply_path
+
+        return self.json_data
+
+    # Returns file JSON
+    def json(self):
+
+        return json.dumps(self.to_dict(), indent=4)
+
+    # Writes JSON to a specified file
+    def write_to_file(self, path: str):
+
+        # Write the JSON data to the specified path
+        serializer.write(self.to_dict(), path)
+
+    # PLY exporter 
+    def export_ply ( self, file_path, comment="Written from gxport" ):
+
+        # Read the vertices and faces out of the mesh
+        self.extract()
+
+        # Write them to the file
+        self.write_ply(file_path, comment)
+
+        return
+
+    # Reads vertices and faces out of the Blender mesh. Must run on the main thread
+    def extract ( self ):
+
+        # Dict for vertices, and the faces of each material
+        vertices   = { }
+        groups     = { }
+        extraction = 0.0
+        dedup      = 0.0
+
+        # A static batch reads each of its objects into the same vertices, with their transforms baked in
+        for object in self.batch or [ self.mesh ]:
+            matrix = object.matrix_world if self.batch else None
+
+            # Turn the vertices to the exported axes
+            if Orientation.matrix is not None:
+                matrix = Orientation.matrix @ matrix if matrix is not None else Orientation.matrix
+
+            seconds     = self.extract_object(object, matrix, vertices, groups)
+            extraction += seconds[0]
+            dedup      += seconds[1]
+
+        start = timer()
+
+        # Put the faces of each material together, in material order
+        faces          = { }
+        order          = [ m.name for m in self.materials ]
+        self.submeshes = [ ]
+
+        for name in sorted(groups, key=lambda n: order.index(n) if n in order else len(order)):
+            self.submeshes.append(( name, len(faces), len(groups[name]) ))
+
+            for face_indicies in groups.pop(name):
+                faces[len(faces)] = face_indicies
+
+        extraction += timer() - start
+
+        # Keep the vertices and faces until they are written
+        self.vertices     = vertices
+        self.vertex_count = len(vertices)
+        self.faces        = faces
+
+        # Record the timings, and how many of the face corners were unique
+        profiler = ExportSession.get().profiler
+        asset    = "part:" + self.name
+
+        profiler.add_time("mesh extraction", extraction, asset)
+        profiler.add_time("dedup", dedup, asset)
+        profiler.record(asset, "vertex count", len(vertices))
+        profiler.record(asset, "triangle count", len(faces))
+        profiler.record(asset, "dedup ratio", len(vertices) / max(3 * len(faces), 1))
+
+        return
+
+    # Reads the faces of an object into vertices and the faces of each material. Returns the
+    # seconds spent extracting and deduplicating. Must run on the main thread
+    def extract_object ( self, object: bpy.types.Object, matrix, vertices: dict, groups: dict ) -> tuple:
+
+        # Convinience 
+        active_uv_layer         = object.data.uv_layers.active.data
+        active_col_layer        = None
+        bone_groups_and_weights = None
+        bone_groups             = None
+        bone_weights            = None
+
+        if self.use_colors is True:
+            active_col_layer = object.data.vertex_colors.active.data
+
+        start = timer()
+
+        # Make a new bmesh from the parameter
+        bm = bmesh.new()
+        bm.from_mesh(object.data)
+        bmesh.ops.triangulate(bm, faces=bm.faces[:])
+
+        # Bake the transform into the vertices. A mirroring transform turns the faces inside out,
+        # so they are reversed before their normals are computed
+        if matrix is not None:
+            bm.transform(matrix)
+
+            if matrix.determinant() < 0:
+                bmesh.ops.reverse_faces(bm, faces=bm.faces[:])
+
+            bm.normal_update()
+
+        # Buffer lookup tables
+        bm.faces.ensure_lookup_table()
+        bm.edges.ensure_lookup_table()
+        bm.verts.ensure_lookup_table()
+
+        vertex_counter = len(vertices)
+
+        # Material name of each slot
+        slot_names     = [ m.name if m is not None else None for m in slot_materials(object) ]
+        last           = len(slot_names) - 1
+
+        if self.use_bone_groups is True or self.use_bone_weights is True:
+            bone_groups_and_weights = self.get_bone_groups_and_weights(object)
+            bone_groups  = bone_groups_and_weights[0]
+            bone_weights = bone_groups_and_weights[1]
+
+        extracted = timer()
+
+        # Iterate over all faces (faces are triangulated). Attributes are read in the same pass
+        # as they are deduplicated, so dedup time includes reading them
+        for i, f in enumerate(bm.faces):
+
+            # Face vertex attributes
+            t             = [ None, None, None ]
+            b             = [ None, None, None ]
+
+            # Face indicies
+            face_indicies = [ 0, 0, 0 ]
+
+            # Compute the tangent and bitangent of the face        
+            if self.use_tangents is True or self.use_bitangents is True:
+
+                # < x, y, z > coordinates for each vertex in the face
+                pos1                = (f.verts[0].co)
+                pos2                = (f.verts[1].co)
+                pos3                = (f.verts[2].co)    
+
+                # < s, t > coordinates for each vertex
+                uv1                 = active_uv_layer[f.loops[0].index].uv
+                uv2                 = active_uv_layer[f.loops[1].index].uv
+                uv3                 = active_uv_layer[f.loops[2].index].uv
+
+                # Compute the edges 
+                edge1               = pos2 - pos1
+                edge2               = pos3 - pos1
+
+                # Compute the difference in UVs
+                delta1              = uv2 - uv1
+                delta2              = uv3 - uv1
+
+                # Compute the inverse determinant
+                inverse_determinant = float(1) / float(delta1[0] * delta2[1] - delta2[0] * delta1[1])
+
+                # Finally, construct the < tx, ty, tz > and < bx, by, bz > vectors
+                t = [
+                    inverse_determinant * float( delta2[1] * edge1[0] - delta1[1] * edge2[0] ),
+                    inverse_determinant * float( delta2[1] * edge1[1] - delta1[1] * edge2[1] ),
+                    inverse_determinant * float( delta2[1] * edge1[2] - delta1[1] * edge2[2] )
+                ]
+
+                b = [
+                    inverse_determinant * float( -delta2[0] * edge1[0] + delta1[0] * edge2[0] ),
+                    inverse_determinant * float( -delta2[0] * edge1[1] + delta1[0] * edge2[1] ),
+                    inverse_determinant * float( -delta2[0] * edge1[2] + delta1[0] * edge2[2] )
+                ]
+
+            # Iterate over each vertex in the face
+            for j, v in enumerate(f.verts):
+
+                # Vertex attributes
+                g  = [ None, None, None ]       # < x, y, z >
+                uv = [ None, None ]             # < s, t >
+                n  = [ None, None, None ]       # < nx, ny, nz >
+                c  = [ None, None, None, None ] # < r, g, b, a >
+                bg = [ None, None, None, None ] # < g0, g1, g2, g3 > 
+                bw = [ None, None, None, None ] # < w0, w1, w2, w3 >
+
+                # < x, y, z > of current vert
+                if self.use_geometry is True:
+                    g  = f.verts[j].co
+
+                # < s, t > of current vert
+                if self.use_uv_coords is True:
+                    uv = active_uv_layer[f.loops[j].index].uv
+
+                # < nx, ny, nz > of current vert
+                if self.use_normals is True:
+                    n  = f.verts[j].normal
+
+                # < r, g, b, a >
+                if self.use_colors is True:
+                    c  = active_col_layer[f.loops[j].index].color
+
+                # TODO: Bone groups and weights
+                if self.use_bone_groups is True:
+                    bg = bone_groups[f.verts[j].index]
+
+                if self.use_bone_weights is True:
+                    bw = bone_weights[f.verts[j].index]              
+
+                # Combine < x, y, z >
+                #         < s, t >
+                #         < nx, ny, nz >
+                #         < tx, ty, tz >
+                #         < bx, by, bz >
+                #         < r, g, b, a >
+                #         < g0, g1, g2, g3 >
+                #         < w0, w1, w2, w3 >
+
+                combined_vertex = (
+                                    g[0] , g[1] , g[2],         # 0  : < x, y, z >
+                                    uv[0], uv[1],               # 3  : < s, t >
+                                    n[0] , n[1] , n[2],         # 5  : < nx, ny, nz >
+                                    t[0] , t[1] , t[2],         # 8  : < tx, ty, tz >
+                                    b[0] , b[1] , b[2],         # 11 : < bx, by, bz >
+                                    c[0] , c[1] , c[2] , c[3],  # 14 : < r, g, b, a >
+                                    bg[0], bg[1], bg[2], bg[3], # 18 : < g0, g1, g2, g3 >
+                                    bw[0], bw[1], bw[2], bw[3], # 22 : < w0, w1, w2, w3 >
+                                  )
+
+                index = vertices.get(combined_vertex)
+
+                if index is not None:
+                    face_indicies[j] = index
+                else:            
+                    face_indicies[j] = vertex_counter
+                    vertices[combined_vertex] = vertex_counter
+
+                    vertex_counter = vertex_counter + 1
+
+            groups.setdefault(slot_names[min(f.material_index, last)], [ ]).append(face_indicies)
+
+        deduplicated = timer()
+
+        # Free the bmesh
+        bm.free()
+
+        return ( (extracted - start) + (timer() - deduplicated), deduplicated - extracted )
+
+    # Computes the bounds of the extracted vertices. Does not touch Blender data
+    def compute_bounds ( self ):
+
+        '''
+            Sets the axis aligned bounds and a bounding sphere of the extracted vertices, in the
+            part document. The sphere is Ritter's, which is a few percent bigger than the smallest
+        '''
+
+        if self.use_geometry is False or not self.vertices:
+            return
+
+        start  = timer()
+        points = [ v[0:3] for v in self.vertices ]
+
+        lo     = [ min(p[i] for p in points) for i in range(3) ]
+        hi     = [ max(p[i] for p in points) for i in range(3) ]
+
+        # Start with the sphere through a point far from any point, and the point far from that
+        far    = lambda q: max(points, key=lambda p: (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2)
+        a      = far(points[0])
+        b      = far(a)
+        center = [ (a[i] + b[i]) / 2 for i in range(3) ]
+        radius = math.dist(a, b) / 2
+
+        # Grow the sphere over every point outside of it
+        for p in points:
+            d = math.dist(p, center)
+
+            if d > radius:
+                shift  = (d - radius) / 2 / d
+                center = [ center[i] + (p[i] - center[i]) * shift for i in range(3) ]
+                radius = (radius + d) / 2
+
+        self.bounds = ( lo, hi )
+        self.sphere = ( center, radius )
+
+        self.json_data["bounds"]          = { "min": lo, "max": hi }
+        self.json_data["bounding sphere"] = { "center": center, "radius": radius }
+
+        ExportSession.get().profiler.add_time("bounds", timer() - start, "part:" + self.name)
+
+        return
+
+    # Records how each vertex attribute is encoded, and the ranges quantized ones map to
+    def compute_encoding ( self ):
+
+        '''
+            Sets the vertex encoding of the part document. A 16 bit normalized value q decodes
+            to min + q / 65535 * (max - min). Octahedral directions are two 16 bit signed
+            normalized values, and 8 bit normalized weights add up to 255
+        '''
+
+        encoding = { }
+
+        if self.use_geometry is True:
+            encoding["position"] = { "encoding": self.position_encoding.lower() }
+
+            if self.position_encoding == "UNORM16":
+                lo, hi = self.bounds if self.bounds is not None else ( [ 0.0, 0.0, 0.0 ], [ 0.0, 0.0, 0.0 ] )
+                encoding["position"].update({ "min": lo, "max": hi })
+
+        if self.use_uv_coords is True:
+            encoding["uv"] = { "encoding": self.uv_encoding.lower() }
+
+            if self.uv_encoding == "UNORM16":
+                uvs = [ v[3:5] for v in self.vertices ] or [ ( 0.0, 0.0 ) ]
+                encoding["uv"].update({
+                    "min": [ min(uv[i] for uv in uvs) for i in range(2) ],
+                    "max": [ max(uv[i] for uv in uvs) for i in range(2) ]
+                })
+
+        for use, name in ( ( self.use_normals, "normal" ), ( self.use_tangents, "tangent" ), ( self.use_bitangents, "bitangent" ) ):
+            if use is True:
+                encoding[name] = { "encoding": self.normal_encoding.lower() }
+
+        if self.use_colors is True:
+            encoding["color"] = { "encoding": "unorm8" }
+
+        if self.use_bone_groups is True:
+            encoding["bone group"] = { "encoding": "int" }
+
+        if self.use_bone_weights is True:
+            encoding["bone weight"] = { "encoding": self.weight_encoding.lower() }
+
+        self.json_data["vertex encoding"] = encoding
+
+        return
+
+    # Returns the attributes of the vertices of the part, and how they are encoded
+    def vertex_layout ( self ) -> dict:
+
+        return { name: getattr(self, name) for name in gxport_geometry.VERTEX_LAYOUT }
+
+    # Reorders the extracted faces and vertices for the GPU. Does not touch Blender data
+    def optimize ( self ):
+
+        '''
+            Orders triangles for the post transform vertex cache, then optionally sorts clusters 
+            of them to reduce overdraw, then renumbers vertices in the order they are fetched.
+            Records the ACMR before and after in the export report
+        '''
+
+        if self.optimize_vertex_cache is False or not self.faces:
+            return
+
+        start        = timer()
+        indices      = [ v for f in self.faces.values() for v in f ]
+        keys         = list(self.vertices)
+        positions    = [ k[0:3] for k in keys ] if self.use_geometry is True and self.optimize_overdraw is True else None
+        submeshes    = [ ( first, count ) for name, first, count in self.submeshes ]
+
+        # Triangle order, then vertex order, in the session process pool. Triangles stay with the other triangles of their material
+        indices, remap, acmr, optimized_acmr = ExportSession.get().run_in_process(gxport_geometry.reorder, indices, len(keys), submeshes, gxport_geometry.VertexCache.CACHE_SIZE, positions)
+
+        ordered      = [ None ] * len(keys)
+
+        for old, new in enumerate(remap):
+            ordered[new] = keys[old]
+
+        self.vertices = { k: i for i, k in enumerate(ordered) }
+        self.faces    = { t: indices[3 * t:3 * t + 3] for t in range(len(indices) // 3) }
+
+        profiler = ExportSession.get().profiler
+        asset    = "part:" + self.name
+
+        profiler.add_time("cache optimization", timer() - start, asset)
+        profiler.record(asset, "acmr before", acmr)
+        profiler.record(asset, "acmr after", optimized_acmr)
+
+        return
+
+    # Simplifies the extracted faces into levels of detail, and writes them. Does not touch Blender data
+    def generate_lods ( self, comment="Written from gxport" ):
+
+        '''
+            Writes a PLY for each ratio in lod_ratios, and lists every level of detail in the 
+            part document, with the distance it should be switched to at. Parts are simplified
+            in the session process pool, so parts on different workers simplify in parallel.
+            A submesh that cannot be reduced any further keeps its last level, and levels stop
+            once no submesh can, so lod_paths only lists the levels that are written
+        '''
+
+        if not self.lod_ratios or not self.faces or self.use_geometry is False:
+            self.lod_paths = [ ]
+            return
+
+        start     = timer()
+        keys      = list(self.vertices)
+        positions = [ k[0:3] for k in keys ]
+        indices   = [ v for f in self.faces.values() for v in f ]
+
+        # Simplify each submesh on its own, so the edges between materials are kept
+        submeshes = [
+            ExportSession.get().run_in_process(gxport_geometry.Simplifier.simplify, positions, indices[3 * first:3 * (first + count)], tuple(self.lod_ratios))
+            for name, first, count in self.submeshes
+        ]
+
+        self.json_data["lods"] = [ { "path": self.ply_path, "ratio": 1.0, "triangle count": len(self.faces), "error": 0.0, "distance": 0.0 } ]
+
+        ExportSession.get().profiler.add_time("lod generation", timer() - start, "part:" + self.name)
+
+        # Levels stop once every submesh has stopped
+        level_count    = max(( len(levels) for levels in submeshes ), default=0)
+        self.lod_paths = self.lod_paths[:level_count]
+
+        for i, ratio in enumerate(self.lod_ratios[:level_count]):
+
+            lod_indices = [ ]
+            ranges      = [ ]
+            error       = 0.0
+
+            for ( name, first, count ), levels in zip(self.submeshes, submeshes):
+
+                # A submesh that stopped early keeps its last level, or all of its triangles
+                submesh, submesh_error = levels[min(i, len(levels) - 1)] if levels else ( indices[3 * first:3 * (first + count)], 0.0 )
+
+                ranges.append(( name, len(lod_indices) // 3, len(submesh) // 3 ))
+
+                lod_indices += submesh
+                error        = max(error, submesh_error)
+
+            # Reorder for the GPU, and drop vertices that are no longer used
+            lod_indices, remap, acmr, optimized_acmr = ExportSession.get().run_in_process(
+                gxport_geometry.reorder, lod_indices, len(keys), [ ( first, count ) for name, first, count in ranges ],
+                gxport_geometry.VertexCache.CACHE_SIZE, None, self.optimize_vertex_cache
+            )
+
+            used     = len(set(lod_indices))
+            vertices = [ None ] * used
+
+            for old, new in enumerate(remap):
+                if new < used:
+                    vertices[new] = keys[old]
+
+            index_size, index_offset = self.write_mesh(self.lod_paths[i], vertices, [ lod_indices[j:j + 3] for j in range(0, len(lod_indices), 3) ], comment, ranges)
+
+            # Switch when the error is smaller than the pixel error
+            self.json_data["lods"].append({
+                "path"          : self.lod_paths[i],
+                "ratio"         : ratio,
+                "triangle count": len(lod_indices) // 3,
+                "error"         : error,
+                "distance"      : error / (self.lod_pixel_error * Part.PIXEL_ANGLE),
+                "index size"    : index_size,
+                "index offset"  : index_offset,
+                "submeshes"     : Part.submesh_list(ranges)
+            })
+
+        return
+
+    # Writes the extracted vertices and faces to a PLY file. Does not touch Blender data
+    def write_ply ( self, file_path, comment="Written from gxport" ):
+
+        # Bound the vertices before they are freed
+        self.compute_bounds()
+
+        # Quantize every level of detail to the same ranges
+        self.compute_encoding()
+
+        # Reorder for the GPU
+        self.optimize()
+
+        # Simplify
+        self.generate_lods(comment)
+
+        index_size, index_offset = self.write_mesh(file_path, list(self.vertices), list(self.faces.values()), comment, self.submeshes)
+
+        self.json_data["submeshes"] = Part.submesh_list(self.submeshes)
+
+        self.json_data["indices"] = {
+            "encoding"    : self.index_encoding.lower(),
+            "index size"  : index_size,
+            "index count" : 3 * len(self.faces),
+            "index offset": index_offset
+        }
+
+        # Free the vertices and faces
+        self.vertices = None
+        self.faces    = None
+
+        return
+
+    # Returns the submeshes of the part document, from ( material name, first triangle, triangle count )
+    @staticmethod
+    def submesh_list ( submeshes: list ) -> list:
+
+        return [ { "material": name, "first index": 3 * first, "index count": 3 * count } for name, first, count in submeshes ]
+
+    # Writes vertices and triangles to a PLY file. Does not touch Blender data
+    def write_mesh ( self, file_path, vertices: list, faces: list, comment="Written from gxport", submeshes: list = ( ) ) -> tuple:
+
+        '''
+            Returns ( index size, index offset ), where index offset is the byte offset of the 
+            faces in the file. A triangle list is aligned to its index size. Vertices and 
+            indices are encoded in the session process pool, and only the header and the write
+            are left to the calling thread
+        '''
+
+        # Convinience
+        vertex_counter = len(vertices)
+        start          = timer()
+        layout         = self.vertex_layout()
+        encoding       = self.json_data["vertex encoding"]
+        properties     = gxport_geometry.vertex_format(layout, encoding)
+        index_format   = None
+
+        ExportSession.get().record(file_path)
+
+        with open(file_path, "wb") as file:
+            fw = file.write
+
+            fw(b"ply\n")
+            fw(b"format binary_little_endian 1.0\n")
+
+            if comment is not None:
+                fw(b"comment " + bytes(comment, 'ascii') + b"\n")
+
+            # Index range of each material, as "comment submesh [first index] [index count] [material]"
+            for name, first, count in submeshes:
+                fw(b"comment submesh %d %d " % (3 * first, 3 * count) + bytes(str(name), 'utf-8') + b"\n")
+
+            fw(b"element vertex %d\n" % vertex_counter)
+            fw(properties[0])
+
+            # Three 16 bit indices per triangle, if every vertex can be indexed with 16 bits. 0xFFFF is left for primitive restart
+            if self.index_encoding == "TRIANGLES":
+                index_type, index_format = ( b"ushort", "H" ) if vertex_counter < 65536 else ( b"uint", "I" )
+
+                fw(b"element triangle %d\n" % len(faces))
+                fw(b"".join(b"property " + index_type + b" " + n + b"\n" for n in ( b"v0", b"v1", b"v2" )))
+
+                # Pad the header with spaces, so the index buffer starts on a multiple of the index size
+                line = b"comment indices aligned to %d bytes" % calcsize(index_format)
+                end  = file.tell() + len(line) + 1 + len(b"end_header\n") + vertex_counter * properties[1].size
+
+                fw(line + b" " * (-end % calcsize(index_format)) + b"\n")
+            else:
+                fw(b"element face %d\n" % len(faces))
+                fw(b"property list uchar uint vertex_indices\n")
+
+            fw(b"end_header\n")
+
+            vertex_data, index_data = ExportSession.get().run_in_process(gxport_geometry.encode_mesh, vertices, faces, layout, encoding, index_format)
+
+            fw(vertex_data)
+
+            # The index buffer in one block, or a list per face
+            index_offset = file.tell()
+            index_size   = calcsize(index_format) if index_format is not None else 4
+
+            fw(index_data)
+
+            size = file.tell()
+
+        ExportSession.get().profiler.add_time("ply write", timer() - start, "part:" + self.name)
+        ExportSession.get().profiler.add_bytes("ply write", size, "part:" + self.name)
+
+        return ( index_size, index_offset )
+
+    # This function gives me anxiety 
+    def get_bone_groups_and_weights(self, object):
+
+        bone_vertex_indices_and_weights = { }
+        bone_group_array  = []
+        bone_weight_array = []
+
+        # Meshes that are not skinned have no groups and no weights
+        if len(object.vertex_groups) == 0:
+            return ( [ [ -1, -1, -1, -1 ] ] * len(object.data.vertices), [ [ 0, 0, 0, 0 ] ] * len(object.data.vertices) )
+
+        # Find vertex indices and bone weights for each bone    
+        for g in object.vertex_groups:
+
+            # Make a dictionary key for each bone
+            bone_vertex_indices_and_weights[g.name] = []
+
+            # And a convenience variable
+            working_bone = bone_vertex_indices_and_weights[g.name]
+
+            for v in object.data.vertices:
+                for vg in v.groups:
+                    if vg.group == g.index:
+                        working_bone.append((v.index, vg.weight))
+
+        for z in bone_vertex_indices_and_weights:
+            print(z)
+
+        '''
+            bone_vertex_indices_and_weights now looks like
+            {
+                "bone name" : [ (1, 0.6), (2, 0.4), (3, 0.2), ... ],
+                "spine"     : [ (9, 0.2), ... ],
+                ...
+                "head"      : [ ... , (3302, 0.23), (3303, 0.34), (3304, 0.6) ]
+            }
+        '''
+        # This exporter only writes the 4 most heavily weighted bones to each vertex
+
+        # Iterate over every vert
+        for v in object.data.vertices:
+
+            # Keep track of the 4 most heavy weights and their vertex groups
+            heaviest_groups  = [ -1, -1, -1, -1 ] 
+            heaviest_weights = [ 0, 0, 0, 0 ]
+
+            # Iterate through bones
+            for c in bone_vertex_indices_and_weights.keys():
+                d = bone_vertex_indices_and_weights[c]
+
+                for i in d:
+                    if v.index == i[0]:
+                        if i[1] > heaviest_weights[0]:
+                            heaviest_groups[0]  = object.vertex_groups[c].index
+                            heaviest_weights[0] = i[1]
+                        elif i[1] > heaviest_weights[1]:
+                            heaviest_groups[1]  = object.vertex_groups[c].index
+                            heaviest_weights[1] = i[1]
+                        elif i[1] > heaviest_weights[2]:
+                            heaviest_groups[2]  = object.vertex_groups[c].index
+                            heaviest_weights[2] = i[1]
+                        elif i[1] > heaviest_weights[3]:
+                            heaviest_groups[3]  = object.vertex_groups[c].index
+                            heaviest_weights[3] = i[1]
+                        else:
+                            None
+            bone_group_array.append(heaviest_groups)
+            bone_weight_array.append(heaviest_weights)
+
+        return (bone_group_array, bone_weight_array)
+
+    # Get bone names and vertex group indicies
+    def get_bone_names_and_indexes(self, object):
+
+        ret: dict = { }
+
+        for vg in object.vertex_groups:
+            ret[vg.name] = vg.index
+
+        return ret
+
+    # Returns the estimated memory held by the part, in bytes
+    def memory_usage(self) -> int:
+
+        ret: int = 0
+
+        # Each vertex is a tuple of 26 attributes, and each face a list of 3 indices
+        if self.vertices is not None:
+            ret = ret + len(self.vertices) * 900
+
+        if self.faces is not None:
+            ret = ret + len(self.faces) * 200
+
+        return ret
+
+    # Releases data that is not needed after the part is written
+    def release(self):
+
+        self.mesh     = None
+        self.batch    = None
+        self.vertices = None
+        self.faces    = None
+
+        return
+
+    # Sets the paths of the part files
+    def set_paths(self, directory: str):
+
+        parts_directory = directory + "/parts/"
+
+        self.ply_path   = (parts_directory + self.name + ".ply")
+        self.path       = (parts_directory + self.name + serializer.extension())
+        self.lod_paths  = [ parts_directory + self.name + ".lod" + str(i + 1) + ".ply" for i in range(len(self.lod_ratios)) ]
+
+        return
+
+    # Writes JSON and ply to a directory 
+    def write_to_directory(self, directory: str):
+
+        self.set_paths(directory)
+
+        self.export_ply(self.ply_path, "")
+
+        self.write_to_file(self.path)
+
+        self.written = True
+        
+        return
+
+    # Schedules extracting and writing the part
+    def schedule(self, scheduler, directory: str) -> str:
+
+        '''
+            Adds nodes that extract the mesh on the main thread, then write the PLY and the 
+            part document on a worker. Returns the name of the last node
+        '''
+
+        self.set_paths(directory)
+
+        # Already scheduled by an entity or an instance array of the same object
+        if scheduler.has("part write:" + self.name):
+            return "part write:" + self.name
+
+        scheduler.add("part extract:" + self.name, self.extract, main_thread=True)
+
+        return scheduler.add("part write:" + self.name, self.write_files, [ "part extract:" + self.name ])
+
+    # Writes the extracted part to its paths
+    def write_files(self):
+
+        self.write_ply(self.ply_path, "")
+
+        self.write_to_file(self.path)
+
+        self.written = True
+
+        return
+
+class Texture:
+    '''
+        - Texture
+    '''
+
+    json_data  : dict            = None
+
+    image      : bpy.types.Image = None
+    name       : str             = None
+    path       : str             = None
+    addressing : str             = 'repeat'
+    filter_mode: str             = 'linear'
+    generated  : bool            = None
+    loaded     : bool            = None
+
+    def __init__(self, *args):
+
+        if len(args) > 1 or len(args) < 1:
+            pass
+        
+        self.json_data = { }
+
+        # Texture Image node
+        if isinstance(args[0], bpy.types.ShaderNodeTexImage):
+            
+            if args[0].image is None:
+                # TODO: Set missing texture
+                print("Missing Texture")
+                return
+            image = args[0]
+
+            # Set the image name
+            self.name  = image.image.name
+
+            # Set the image object
+            self.image = image.image
+
+            # Get the filter mode
+            if   image.interpolation == 'Linear':
+                self.filter_mode = 'linear'
+            elif image.interpolation == 'Closest':
+                self.filter_mode = 'nearest'
+
+            # Get the addressing mode
+            if   image.extension == 'REPEAT':
+                self.addressing = 'repeat'
+            elif image.extension == 'EXTEND':
+                self.addressing = 'clamp edge'
+            elif image.extension == 'CLIP':
+                self.addressing = 'clamp border'
+
+            self.generated = False
+
+            # Was the image loaded before the export?
+            self.loaded    = self.image.has_data
+
+        # Image
+        elif isinstance(args[0], bpy.types.Image):
+            
+            image = args[0]
+
+            # Set the image name
+            self.name = image.name
+         
+            # Set the image object
+            self.image = image
+
+            # Default to repeat addressing with linear filtering
+
+            self.generated = True
+            self.loaded    = True
+
+            # The session removes the image, even if the texture outlives it
+            ExportSession.get().track_image(self.image)
+
+        self.json_data['$schema']    = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/texture-schema.json"
+        self.json_data['name']       = self.name
+        
+        self.json_data['addressing'] = self.addressing
+        self.json_data['filter']     = self.filter_mode
+        print("CONSTRUCTING " + self.name)
+
+        return
+
+    # Save texture
+    def save_texture(self,  path: str):
+        self.path              = path
+        self.json_data['path'] = self.path
+
+        if self.image is not None:
+            print("SAVING " + self.name)
+
+            profiler = ExportSession.get().profiler
+
+            with profiler.phase("texture encode", "texture:" + self.name):
+                ExportSession.get().record(self.path)
+                self.image.save_render(self.path)
+
+            profiler.add_bytes("texture encode", os.path.getsize(self.path), "texture:" + self.name)
+
+        return
+        
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        return self.json_data
+
+    # Returns JSON text of object
+    def json(self):
+        
+        return json.dumps(self.to_dict(), indent=4)
+
+    # Returns the estimated memory held by the image, in bytes
+    def memory_usage(self) -> int:
+
+        if self.image is None:
+            return 0
+
+        try:
+            if self.image.has_data == False:
+                return 0
+
+            return self.image.size[0] * self.image.size[1] * self.image.channels * (4 if self.image.is_float else 1)
+        except ReferenceError:
+            return 0
+
+    # Frees the image
+    def release(self):
+
+        if self.image is not None:
+
+            # Remove generated images
+            if self.generated is True:
+                print("DELETING " + self.name)
+                remove_image(self.image)
+
+            # Free the pixels of images that were only loaded to be saved
+            elif self.loaded is False and self.path is not None:
+                try:
+                    self.image.buffers_free()
+                except ReferenceError:
+                    pass
+
+            self.image = None
+
+        return
+
+    # Destructor
+    def __del__(self):
+
+        self.release()
+
+        return
+
+class Material:
+
+    '''
+        - Material
+    '''
+
+    json_data: dict = None
+
+    name:      str  = None
+
+    path:      str  = None
+
+    written:   bool = False
+
+    principled_node: bpy.types.ShaderNodeBsdfPrincipled = None
+    node_tree: bpy.types.ShaderNodeTree = None
+
+    albedo_node = None
+    rough_node  = None
+    metal_node  = None
+    normal_node = None
+    
+    albedo: Texture = None
+    rough : Texture = None
+    metal : Texture = None
+    normal: Texture = None
+    ao    : Texture = None
+    height: Texture = None
+
+    def __init__(self, material: bpy.types.Material):
+
+         # Set the node tree
+        self.node_tree = material.node_tree
+
+        self.name      = material.name
+
+        self.json_data = { }
+
+        # Right now, only principled BSDF is supported
+        if self.node_tree.nodes.find('Principled BSDF') != -1:    
+            
+            self.principled_node = self.node_tree.nodes["Principled BSDF"]
+            
+            if isinstance(self.principled_node, bpy.types.ShaderNodeBsdfPrincipled) == False:
+                print("ERROR NO PRINCIPLED NODE")
+                return
+        else:
+            print("ERROR ONLY SUPPORTS PRINCIPLED BSDF" + material.name)
+            return
+        
+        #################
+        # Export albedo #
+        #################
+
+        # Set the albedo node
+        self.albedo_node = self.principled_node.inputs["Base Color"]
+
+        # Are there links on the node?
+        if bool(self.albedo_node.links):
+
+            # This branch is for exporting images
+            if isinstance(self.albedo_node.links[0].from_node, bpy.types.ShaderNodeTexImage):
+                self.albedo = Texture(self.albedo_node.links[0].from_node)
+
+            # This branch is for baking images
+            else:
+                print("LINKED TO NODE SETUP")
+        
+        # If there are no links, make a new 1x1 image with the color in "Base Color"
+        else:
+            c = self.albedo_node.default_value
+            bpy.ops.image.new(name=self.name + " albedo", width=1, height=1, color=(c[0], c[1], c[2], 1.0), alpha=False, generated_type='BLANK', float=True)
+            self.albedo = Texture(bpy.data.images[self.name + " albedo"])
+        
+        ################
+        # Export rough #
+        ################
+        
+        # Set the rough node
+        self.rough_node = self.principled_node.inputs["Roughness"]
+
+        # Are there any links on the roughness input?
+        if bool(self.rough_node.links):
+
+            # Export an image
+            if isinstance(self.rough_node.links[0].from_node, bpy.types.ShaderNodeTexImage):
+                self.rough = Texture(self.rough_node.links[0].from_node)
+
+            # Bake an image
+            else:
+                print("LINKED TO NODE SETUP")
+        
+        # If there are no links, make a new 1x1 image with the color in "Roughness"
+        else:
+            c = self.rough_node.default_value
+            bpy.ops.image.new(name=self.name+" rough", width=1, height=1, color=(c,c,c,1.0), alpha=False, generated_type='BLANK', float=True)
+            self.rough = Texture(bpy.data.images[self.name+' rough'])
+        
+        ################
+        # Export metal #
+        ################
+
+        # Set the metal node
+        self.metal_node = self.principled_node.inputs["Metallic"]
+
+        # Are there any links on the metalness input?
+        if bool(self.metal_node.links):
+
+            # Export an image
+            if isinstance(self.metal_node.links[0].from_node, bpy.types.ShaderNodeTexImage):
+                self.metal = Texture(self.metal_node.links[0].from_node)
+
+            # Bake an image
+            else:
+                print("LINKED TO NODE SETUP")
+        
+        # If there are no links, make a new 1x1 image with the color in "Metalness"
+        else:
+            c = self.metal_node.default_value
+            print(self.name+" metal")
+            bpy.ops.image.new(name=self.name+" metal", width=1, height=1, color=(c,c,c,1.0), alpha=False, generated_type='BLANK', float=True)
+            self.metal = Texture(bpy.data.images[self.name+' metal'])
+        
+        #################
+        # Export normal #
+        #################
+
+        # Set the normal node
+        self.normal_node = self.principled_node.inputs["Normal"]
+
+        # Are there any links on the normal input?
+        if bool(self.normal_node.links):
+
+            # Export an image
+            if isinstance(self.normal_node.links[0].from_node, bpy.types.ShaderNodeTexImage):
+                self.normal = Texture(self.normal_node.links[0].from_node)
+
+            # Bake an image
+            else:
+                print("LINKED TO NODE SETUP")
+        
+        #############
+        # Export AO #
+        #############
+        
+        #################
+        # Export Height #
+        #################
+        
+
+
+        self.json_data['$schema']  = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/material-schema.json"
+        self.json_data['name']     = material.name
+        self.json_data['textures'] = []
+
+        ExportSession.get().materials[material.name] = self
+
+        return
+
+    # Bake images
+    def bake(self, path: str):
+
+        return
+
+    def bake_albedo(self):
+        pass
+    def bake_rough(self):
+        pass
+    def bake_metal(self):
+        pass
+    def bake_normal(self):
+        pass
+    def bake_ao(self):
+        pass
+    def bake_height(self):
+        pass
+
+    # Save all textures
+    def save_textures(self, directory: str):
+
+        # Construct a texture
+        texture_directory: str = directory + "/textures/" + self.name 
+
+        # Make a directory for the textures
+        try:    make_directory(texture_directory)
+        except: pass
+
+        # Save the albedo texture
+        if self.albedo is not None:
+            self.albedo.save_texture(texture_directory + "/albedo." + "png")
+
+        # Save the roughness texture
+        if self.rough is not None:
+            self.rough.save_texture(texture_directory + "/rough." + "png")
+
+        # Save the metal texture
+        if self.metal is not None:
+            self.metal.save_texture(texture_directory + "/metal." + "png")
+
+        # Save the normal texture
+        if self.normal is not None:
+            self.normal.save_texture(texture_directory + "/normal." + "png")
+
+        # Save the ambient occlusion texture
+        if self.ao is not None:
+            self.ao.save_texture(texture_directory + "/ao." + "png")
+
+        # Save the height texture
+        if self.height is not None:
+            self.height.save_texture(texture_directory + "/height." + "png")
+
+        return
+
+    # Returns ( slot name, texture ) for each texture of the material
+    def textures(self) -> list:
+
+        ret: list = [ ]
+
+        for slot in ( "albedo", "rough", "metal", "normal", "ao", "height" ):
+            if getattr(self, slot) is not None:
+                ret.append(( slot, getattr(self, slot) ))
+
+        return ret
+
+    # Returns the path of one texture
+    def texture_path(self, directory: str, slot: str) -> str:
+
+        return directory + "/textures/" + self.name + "/" + slot + "." + "png"
+
+    # Save one texture
+    def save_texture(self, directory: str, slot: str):
+
+        # Construct a texture
+        texture_directory: str = directory + "/textures/" + self.name 
+
+        # Make a directory for the textures
+        try:    make_directory(texture_directory)
+        except: pass
+
+        # Save the texture
+        getattr(self, slot).save_texture(self.texture_path(directory, slot))
+
+        return
+
+    # Save each material texture to a directory
+    def save_material(self,  path: str):
+        
+        self.path              = path
+        self.json_data['path'] = self.path
+
+        self.write_to_file(self.path)
+
+        self.written           = True
+
+        return
+
+    # Schedules saving the textures and the material
+    def schedule(self, scheduler, directory: str) -> str:
+
+        '''
+            Adds a node for each texture, which save on the main thread, then a node that writes 
+            the material document on a worker. Returns the name of the last node
+        '''
+
+        name = "material write:" + self.name
+
+        # Already scheduled by another entity
+        if scheduler.has(name):
+            return name
+
+        self.path    = directory + "/materials/" + self.name + serializer.extension()
+
+        dependencies = [ ]
+
+        for slot, texture in self.textures():
+            texture.path = self.texture_path(directory, slot)
+            dependencies.append(scheduler.add("texture:" + self.name + ":" + slot, lambda slot=slot: self.save_texture(directory, slot), main_thread=True))
+
+        return scheduler.add(name, lambda: self.save_material(self.path), dependencies)
+
+    def write_to_file(self, path: str):
+        
+        # Write the JSON data to the specified path
+        serializer.write(self.to_dict(), path)
+
+        return
+
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        # Nest each texture document by reference
+        self.json_data['textures'] = []
+
+        if self.albedo:
+            self.json_data['textures'].append(self.albedo.to_dict())
+        if self.rough:
+            self.json_data['textures'].append(self.rough.to_dict())
+        if self.metal:
+            self.json_data['textures'].append(self.metal.to_dict())
+        if self.normal:
+            self.json_data['textures'].append(self.normal.to_dict())
+        if self.ao:
+            self.json_data['textures'].append(self.ao.to_dict())
+        if self.height:
+            self.json_data['textures'].append(self.height.to_dict())
+
+        return self.json_data
+
+    # Returns JSON text of object
+    def json(self):
+
+        return json.dumps(self.to_dict(), indent=4)
+
+    # Returns the estimated memory held by the textures, in bytes
+    def memory_usage(self) -> int:
+
+        ret: int = 0
+
+        for texture in ( self.albedo, self.rough, self.metal, self.normal, self.ao, self.height ):
+            if texture is not None:
+                ret = ret + texture.memory_usage()
+
+        return ret
+
+    # Frees texture images. The material document is kept
+    def release(self):
+
+        for texture in ( self.albedo, self.rough, self.metal, self.normal, self.ao, self.height ):
+            if texture is not None:
+                texture.release()
+
+        return
+
+    # Destructor
+    def __del__(self):
+
+        # Delete all the textures
+        if self.albedo is not None:
+            del(self.albedo)
+
+        if self.rough is not None:
+            del(self.rough)
+
+        if self.metal is not None:
+            del(self.metal)
+
+        if self.normal is not None:
+            del(self.normal)
+
+        if self.ao is not None:
+            del(self.ao)
+
+        if self.height is not None:
+            del(self.height)
+        
+        return
+
+class LightProbe:
+
+    '''
+        - Light Probes
+    '''
+
+    json_data: dict = None
+
+    def __init__(self, object: bpy.types.Object):
+        self.json_data = { }
+
+        # Spawn a very small sphere at the location of the light probe
+        bpy.ops.mesh.primitive_uv_sphere_add(segments=64, ring_count=32, radius=0.001, calc_uvs=True, enter_editmode=False, align='WORLD', location=(object.location[0], object.location[1], object.location[2]), rotation=(0, 0, 0), scale=(1, 1, 1))
+
+        # TODO: Add a principled BSDF, Base Color = #FFFFFF, Metal=0, Rough=0, 
+
+        # TODO: Investigate: Set smooth shading?
+
+        # Commentary: Maybe set roughness such that it will blur an amount proportional to the resolution
+
+        # TODO: Use equirectangular uv for bake
+
+        # TODO: Bake the GLOSSY with all influences into a generated 32 bit float image
+
+        pass
+
+    # Bake a scaled down sphere with an equirectangular UV? Maybe use a cubemap?
+    pass
+
+class Transform:
+    
+    '''
+        - Transform
+    '''
+
+    # Class data
+    location : list = None
+    rotation : list = None
+    scale    : list = None
+
+    # Row of the transform in the scene transform table, if it is in one
+    index    : int  = None
+
+    json_data: dict = None
+    # Class methods
+
+    # Constructor
+    def __init__(self, object: bpy.types.Object, table = None):
+
+        '''
+            Reads the transform of an object, or of a gxport.Batch, out of a gxport.TransformTable.
+            Objects that are not in the table are decomposed on their own. The object is never 
+            written to
+        '''
+
+        self.json_data = { }
+
+        if table is not None and object.name in table.index:
+            self.index    = table.index[object.name]
+            self.location, self.rotation, self.scale = table.row(object.name)
+
+        else:
+            self.location, self.rotation, self.scale = TransformTable([ object ]).row(object.name)
+
+        # Set up the dictionary
+        self.json_data["$schema"]    = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/transform-schema.json"
+        self.json_data["location"]   = self.location.copy()
+        self.json_data["quaternion"] = self.rotation.copy()
+        self.json_data["scale"]      = self.scale.copy()
+
+        return 
+
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        return self.json_data
+
+    # Returns class as JSON text
+    def json(self):
+        
+        return json.dumps(self.to_dict(), indent=4)
+
+class Rigidbody:
     
-    albedo: Texture = None
-    rough : Texture = None
-    metal : Texture = None
-    normal: Texture = None
-    ao    : Texture = None
-    height: Texture = None
+    '''
+        - Rigidbody
+    '''
+
+    # Class data
+    mass     : float = None
+    active   : bool  = None
+
+    json_data: dict  = None
+
+    # Class methods
+
+    @staticmethod
+    def has_rigidbody(object: bpy.types.Object) -> bool:
+        return True if isinstance(object.rigid_body, bpy.types.RigidBodyObject) else False
+
+    def __init__(self, object: bpy.types.Object):
+        
+        # Exit if there is no rigidbody
+        if Rigidbody.has_rigidbody(object) == False:
+            return
+        
+        self.json_data = { }
+
+        # Set class data
+        self.mass   = object.rigid_body.mass 
+        self.active = object.rigid_body.type 
+
+        # Set up the dictionary
+        self.json_data["$schema"] = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/rigidbody-schema.json"
+        self.json_data["active"]  = self.active
+
+        return 
+
+    # Returns the document as a dictionary
+    def to_dict(self):
+        if self.active:
+            self.json_data["mass"]    = self.mass
+
+        return self.json_data
+
+    # Writes the center of mass and the inertia tensor of an active rigidbody
+    def set_mass_properties(self, collider, scale: list):
+
+        '''
+            The collider is fitted in the local space of the entity, before its scale, so the
+            shape is scaled here. Both are written in the frame of the entity location and
+            rotation, on the exported axes, and the inertia tensor is about the center of mass
+        '''
+
+        if self.json_data is None or self.active != 'ACTIVE' or collider.json_data is None:
+            return
+
+        properties = collider.mass_properties()
+
+        if properties is None:
+            return
+
+        center, covariance = properties
+
+        # Scaling moves every point, so the covariance is scaled on both sides
+        s          = numpy.diag(numpy.array(scale, dtype=numpy.float64))
+        center     = s @ center
+        covariance = s @ covariance @ s
+        inertia    = self.mass * (numpy.trace(covariance) * numpy.identity(3) - covariance)
+
+        self.json_data["center of mass"] = center.tolist()
+        self.json_data["inertia tensor"] = inertia.tolist()
+
+        return
+
+    # Returns class as JSON text
+    def json(self):
+
+        return json.dumps(self.to_dict(), indent=4)
+
+    def write_to_file(self, path: str):
+        
+        # Write the JSON data to the specified path
+        serializer.write(self.to_dict(), path)
+
+        return
+
+class Collider:
+    '''
+        - Collider
+    '''
+
+    # Shapes that are fitted around Blender's local Z axis
+    ROUND      : tuple = ( 'CAPSULE', 'CYLINDER', 'CONE' )
+
+    # Most vertices a convex hull is simplified to
+    hull_vertex_limit: int = 64
+
+    # Class data
+    dimensions : list = None
+    shape      : str  = None
+    convex_hull: str  = None
+
+    # Fitted shape, in the local space of the entity on the exported axes. The axis is the 
+    # index of the axis round shapes are around, and the sign is 1 if Blender's local Z 
+    # points along it, or -1 if it points against it
+    center     : list  = None
+    radius     : float = None
+    height     : float = None
+    axis       : int   = None
+    axis_sign  : int   = 1
+
+    # Vertices, until the hull is built, and the hull, as ( vertices, triangles )
+    points     : numpy.ndarray = None
+    hull       : tuple = None
+
+    name       : str  = None
+    json_data  : dict = None
+
+    # Class methods
+
+    # Constructor
+    def __init__ (self, object: bpy.types.Object, batch = None):
+
+        '''
+            Fits the collision shape of an object to its vertices. The collider of a gxport.Batch
+            is fitted to every object in it. Convex hulls are built later, by build()
+        '''
+        
+        # Check for a rigidbody
+        if Rigidbody.has_rigidbody(object) == False:
+            return
+
+        # Set the shape
+        self.name  = object.name if batch is None else batch.name
+        self.shape = object.rigid_body.collision_shape
+
+        # Set the dimensions
+        self.dimensions = [ None, None, None ]
+        self.points     = Collider.vertices(object if batch is None else batch)
+
+        if len(self.points) > 0:
+            self.fit()
+
+        # Only hulls, and the mass properties of active mesh shapes, need the vertices again
+        if self.shape != 'CONVEX_HULL' and ( self.shape != 'MESH' or object.rigid_body.type != 'ACTIVE' ):
+            self.points = None
+
+        # Set the JSON
+        self.json_data               = { }
+        self.json_data["$schema"]    = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/collider-schema.json"
+        self.json_data["type"]       = self.shape
+        self.json_data["dimensions"] = self.dimensions
+
+        if self.center is not None:
+            self.json_data["center"] = self.center
+
+        if self.shape in Collider.ROUND or self.shape == 'SPHERE':
+            self.json_data["radius"] = self.radius
+
+        if self.shape in Collider.ROUND:
+            self.json_data["height"]    = self.height
+            self.json_data["axis"]      = self.axis
+            self.json_data["axis sign"] = self.axis_sign
+
+        # Write the convex hull
+        if self.convex_hull is not None:
+            self.json_data["convex hull path"] = self.convex_hull
+        
+        return
+
+    # Returns the vertices of a mesh object, in its local space on the exported axes
+    @staticmethod
+    def vertices(object) -> numpy.ndarray:
+
+        '''
+            The vertices of a gxport.Batch are in world space, like its part
+        '''
+
+        batch   = isinstance(object, Batch)
+        objects = object.objects if batch else [ object ]
+        arrays  = [ ]
+
+        for o in objects:
+            co = numpy.empty(3 * len(o.data.vertices), dtype=numpy.float32)
+
+            o.data.vertices.foreach_get("co", co)
+
+            co = co.reshape(-1, 3).astype(numpy.float64)
+
+            if batch:
+                m  = numpy.array(o.matrix_world, dtype=numpy.float64)
+                co = co @ m[:3, :3].T + m[:3, 3]
+
+            arrays.append(co)
+
+        ret = numpy.concatenate(arrays) if arrays else numpy.empty(( 0, 3 ))
+
+        if Orientation.array is None:
+            return ret
+
+        return ret @ Orientation.array[:3, :3].T
+
+    # Fits the dimensions of the shape to the vertices
+    def fit(self):
+
+        '''
+            Boxes, hulls and meshes get the extents of the vertices, and spheres the smallest 
+            radius around the center of the extents. Round shapes are around the axis Blender's 
+            local Z is exported to, like they are in Blender. Cylinders and cones get the radius 
+            across that axis and the extent along it, and the apex of a cone points the way 
+            local Z does, so against the axis if the sign is -1. Capsules are only as long as 
+            their caps need to be to hold every vertex
+        '''
+
+        lo, hi    = self.points.min(axis=0), self.points.max(axis=0)
+        center    = (lo + hi) / 2
+        extent    = hi - lo
+        offsets   = self.points - center
+
+        # Exported axis of Blender's local Z, and which way along it local Z points
+        self.axis      = 2 if Orientation.array is None else int(numpy.argmax(numpy.abs(Orientation.array[:3, 2])))
+        self.axis_sign = 1 if Orientation.array is None or Orientation.array[self.axis, 2] > 0 else -1
+
+        if self.shape == 'SPHERE':
+            self.radius = float(numpy.sqrt((offsets ** 2).sum(axis=1).max()))
+            extent      = numpy.full(3, 2 * self.radius)
+
+        elif self.shape in Collider.ROUND:
+            radial      = numpy.sqrt((numpy.delete(offsets, self.axis, axis=1) ** 2).sum(axis=1))
+            self.radius = float(radial.max())
+            self.height = float(extent[self.axis])
+
+            # Half the length of the segment between the caps each vertex needs
+            if self.shape == 'CAPSULE':
+                along       = numpy.abs(offsets[:, self.axis]) - numpy.sqrt(numpy.maximum(self.radius ** 2 - radial ** 2, 0.0))
+                self.height = 2 * (self.radius + max(float(along.max()), 0.0))
+
+            extent            = numpy.full(3, 2 * self.radius)
+            extent[self.axis] = self.height
+
+        self.center     = center.tolist()
+        self.dimensions = extent.tolist()
+
+        return
+
+    # Builds the convex hull, and writes it if the shape is a convex hull
+    def build(self, path: str):
+
+        '''
+            Hulls are built on the process pool. The hull of a mesh shape is only used for its 
+            mass properties, so it is not written
+        '''
+
+        if self.points is None:
+            return
+
+        session     = ExportSession.get()
+        start       = timer()
+        self.hull   = session.run_in_process(gxport_geometry.quickhull, self.points, self.hull_vertex_limit)
+        self.points = None
+
+        if self.hull is None:
+            print("[gxport] [Collider] Can not build a convex hull for \"" + self.name + "\", its vertices are flat")
+        elif self.shape == 'CONVEX_HULL':
+            self.write_hull(path)
+
+        session.profiler.add_time("colliders", timer() - start, "collider:" + self.name)
+
+        return
+
+    # Writes the convex hull to a PLY file
+    def write_hull(self, path: str):
+
+        session             = ExportSession.get()
+        vertices, triangles = self.hull
+
+        # < 3, v0, v1, v2 >
+        faces               = numpy.zeros(len(triangles), dtype=numpy.dtype([ ( "count", "u1" ), ( "indices", "<u4", 3 ) ]))
+        faces["count"]      = 3
+        faces["indices"]    = triangles
+
+        data                = b"".join((
+            b"ply\n",
+            b"format binary_little_endian 1.0\n",
+            b"comment convex hull of " + bytes(self.name, 'utf-8') + b"\n",
+            b"element vertex %d\n" % len(vertices),
+            b"property float x\n",
+            b"property float y\n",
+            b"property float z\n",
+            b"element face %d\n" % len(triangles),
+            b"property list uchar uint vertex_indices\n",
+            b"end_header\n",
+            vertices.astype("<f4").tobytes(),
+            faces.tobytes()
+        ))
+
+        session.record(path)
+
+        with open(path, "wb") as f:
+            f.write(data)
+
+        session.profiler.add_bytes("colliders", len(data), "collider:" + self.name)
+
+        self.convex_hull                   = path
+        self.json_data["convex hull path"] = path
+
+        return
+
+    # Returns the center of mass of the shape, and its covariance per unit mass about it
+    def mass_properties(self) -> tuple:
+
+        '''
+            Returns ( center, covariance ), with a uniform density, or None if the shape has no
+            volume. The covariance is the second moment about the center, so the inertia tensor
+            is mass * (trace(covariance) * identity - covariance). Mesh shapes use their hull
+        '''
+
+        if self.center is None:
+            return None
+
+        center  = numpy.array(self.center, dtype=numpy.float64)
+        inertia = None
+
+        if self.shape == 'BOX':
+            x, y, z = ( d * d for d in self.dimensions )
+            inertia = numpy.diag(( y + z, x + z, x + y )) / 12
+
+        elif self.shape == 'SPHERE':
+            inertia = numpy.identity(3) * 2 / 5 * self.radius ** 2
+
+        elif self.shape in Collider.ROUND:
+            r, h    = self.radius, self.height
+
+            if self.shape == 'CYLINDER':
+                axial, across = r * r / 2, (3 * r * r + h * h) / 12
+
+            # The center of mass is a quarter of the way from the base to the apex
+            elif self.shape == 'CONE':
+                axial, across = 3 / 10 * r * r, 3 / 20 * r * r + 3 / 80 * h * h
+                center[self.axis] -= self.axis_sign * h / 4
+
+            # A cylinder between two half spheres, weighted by their volumes
+            else:
+                l             = h - 2 * r
+                cylinder      = math.pi * r * r * l
+                sphere        = 4 / 3 * math.pi * r ** 3
+                total         = cylinder + sphere or 1.0
+                c, s          = cylinder / total, sphere / total
+                axial         = c * r * r / 2 + s * 2 / 5 * r * r
+                across        = c * (l * l / 12 + r * r / 4) + s * (2 / 5 * r * r + l * l / 4 + 3 / 8 * l * r)
+
+            inertia                       = numpy.identity(3) * across
+            inertia[self.axis, self.axis] = axial
+
+        elif self.shape in ( 'CONVEX_HULL', 'MESH' ) and self.hull is not None:
+            return gxport_geometry.polyhedron(*self.hull)
+
+        if inertia is None:
+            return None
+
+        return ( center, numpy.trace(inertia) / 2 * numpy.identity(3) - inertia )
+
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        return self.json_data
+    
+    def json(self):
+
+        return json.dumps(self.to_dict(), indent=4)
+
+    def write_to_file(self, path: str):
+        
+        # Write the JSON data to the specified path
+        serializer.write(self.to_dict(), path)
+
+        return
+
+class Entity:
+    '''
+        - Entity
+    '''
+
+    name     : str       = None
+    part     : Part      = None
+    materials: list      = None
+    transform: Transform = None
+    rigidbody: Rigidbody = None
+    collider : Collider  = None
+
+    json_data: dict      = None
+
+    path     : str       = None
+
+    # World space bounds, as ( [ min x, y, z ], [ max x, y, z ] )
+    bounds   : tuple     = None
+
+    # Names of the objects merged into a static batch
+    batched  : list      = None
+
+    # Convex hull of the collider, once it is written
+    hull_path: str       = None
+
+    def __init__(self, object: bpy.types.Object, table = None):
+
+        # A static batch is written like its first object, with the others merged into its part
+        batch = object if isinstance(object, Batch) else None
+
+        if batch is not None:
+            object = batch.objects[0]
+
+        if isinstance(object.data, bpy.types.Mesh) == False:
+            return
+        
+        self.name      = object.name
+        self.bounds    = world_bounds(object)
+        self.part      = Part(object, batch)
+        self.materials = [ ExportSession.get().materials.get(m.name) or Material(m) for m in self.part.materials ]
+        self.transform = Transform(object if batch is None else batch, table)
+
+        if batch is not None:
+            self.name    = batch.name
+            self.bounds  = Partition.union([ world_bounds(o) for o in batch.objects ])
+            self.batched = [ o.name for o in batch.objects ]
+        self.rigidbody = Rigidbody(object)
+        self.collider  = Collider(object, batch)
+        self.rig       = Rig(object)
+
+        self.json_data = { }
+
+        self.json_data['$schema']   = 'https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/entity-schema.json'
+        self.json_data['name']      = self.name
+
+        if bool(self.part.json_data):
+            self.json_data['parts'] = []
+            self.json_data['parts'].append(self.part.to_dict())
+
+        if any(bool(m.json_data) for m in self.materials):
+            self.json_data['materials'] = [ m.to_dict() for m in self.materials if bool(m.json_data) ]
+
+        self.json_data['shader'] = 'G10/shaders/G10 PBR.json'
+
+        if bool(self.transform.json_data):
+            self.json_data['transform'] = self.transform.to_dict()
+
+        if self.transform.index is not None:
+            self.json_data['transform index'] = self.transform.index
+
+        if bool(self.rigidbody.json_data):
+            self.json_data['rigidbody'] = self.rigidbody.to_dict()
+
+        if bool(self.collider.json_data):
+            self.json_data['collider'] = self.collider.to_dict()
+
+        # TODO: Rig
+        # Check parent objects for an armature type
+        # Construct a rig from the armature
+        # Add rig json
+
+        return
+
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        return self.json_data
+    
+    def json (self):
+        
+        return (json.dumps(self.to_dict(), indent=4))
 
-    def __init__(self, material: bpy.types.Material):
+    def write_to_file(self, path: str):
+        
+        # Write the JSON data to the specified path
+        serializer.write(self.to_dict(), path)
 
-         # Set the node tree
-        self.node_tree = material.node_tree
+        return
 
-        self.name      = material.name
+    def write_to_directory(self, directory: str):
 
-        self.json_data = { }
+        # Write the entity, its part and its material
+        scheduler = Scheduler()
 
-        # Right now, only principled BSDF is supported
-        if self.node_tree.nodes.find('Principled BSDF') != -1:    
-            
-            self.principled_node = self.node_tree.nodes["Principled BSDF"]
-            
-            if isinstance(self.principled_node, bpy.types.ShaderNodeBsdfPrincipled) == False:
-                print("ERROR NO PRINCIPLED NODE")
-                return
-        else:
-            print("ERROR ONLY SUPPORTS PRINCIPLED BSDF" + material.name)
-            return
-        
-        #################
-        # Export albedo #
-        #################
+        try:
+            self.schedule(scheduler, directory)
+            scheduler.run()
+        finally:
+            scheduler.close()
+            ExportSession.end_implicit()
 
-        # Set the albedo node
-        self.albedo_node = self.principled_node.inputs["Base Color"]
+        # Clean up
+        del self.part
+        del self.materials
 
-        # Are there links on the node?
-        if bool(self.albedo_node.links):
+        return
 
-            # This branch is for exporting images
-            if isinstance(self.albedo_node.links[0].from_node, bpy.types.ShaderNodeTexImage):
-                self.albedo = Texture(self.albedo_node.links[0].from_node)
+    # Schedules writing the entity and all its data
+    def schedule(self, scheduler: Scheduler, directory: str) -> str:
 
-            # This branch is for baking images
-            else:
-                print("LINKED TO NODE SETUP")
+        '''
+            Adds nodes for the material, the part, the collider and the entity document. The 
+            entity document is written once the rest are. Returns the name of the entity node
+        '''
+
+        # Set the path to the entity json
+        self.path = directory + "/entities/" + self.name + serializer.extension()
+
+        # Schedule the materials. Materials are cached, so this only happens the first time they are used
+        material_nodes = [ m.schedule(scheduler, directory) for m in self.materials ]
+        self.json_data["materials"] = [ m.path for m in self.materials ]
         
-        # If there are no links, make a new 1x1 image with the color in "Base Color"
-        else:
-            c = self.albedo_node.default_value
-            bpy.ops.image.new(name=self.name + " albedo", width=1, height=1, color=(c[0], c[1], c[2], 1.0), alpha=False, generated_type='BLANK', float=True)
-            self.albedo = Texture(bpy.data.images[self.name + " albedo"])
+        # Schedule the part
+        part_node      = self.part.schedule(scheduler, directory)
+        self.json_data["parts"]     = [ self.part.path ]
         
-        ################
-        # Export rough #
-        ################
+        nodes          = material_nodes + [ part_node ]
+
+        # Fit the collider, and the mass properties that depend on it
+        if bool(self.collider.json_data):
+            hull_path = directory + "/colliders/" + self.name + ".ply"
+
+            nodes.append(scheduler.add("collider:" + self.name, lambda: self.build_collider(hull_path)))
+
+        # Write the entity to a directory
+        return scheduler.add("entity:" + self.name, lambda: self.write_to_file(self.path), nodes)
+
+    # Builds the convex hull of the collider, and the mass properties of the rigidbody
+    def build_collider(self, hull_path: str):
+
+        self.collider.build(hull_path)
+        self.rigidbody.set_mass_properties(self.collider, self.transform.scale)
+
+        # Only a hull that was written is a dependency
+        self.hull_path = self.collider.convex_hull
+
+        return
+
+    # Returns the path of every file the entity needs. Paths are set when the entity is scheduled,
+    # and the convex hull path once the hull is written
+    def dependencies(self) -> list:
+
+        ret = [ ]
+
+        for material in self.materials:
+            ret += [ material.path ] + [ texture.path for slot, texture in material.textures() ]
+
+        if self.hull_path is not None:
+            ret.append(self.hull_path)
+
+        return ret + [ self.part.path, self.part.ply_path ] + self.part.lod_paths
+
+class Skybox:
+
+    '''
+        - Skybox
+    '''
+
+    json_data: dict            = None
+    image:     bpy.types.Image = None
+    name :     str             = None
+
+    def __init__ (self, world: bpy.types.World):
         
-        # Set the rough node
-        self.rough_node = self.principled_node.inputs["Roughness"]
+        # Check if there is a node to grab the equirectangular image from
+        if bool(world.node_tree.nodes.find('Environment Texture')) == False:
 
-        # Are there any links on the roughness input?
-        if bool(self.rough_node.links):
+            # If not, bail
+            return
 
-            # Export an image
-            if isinstance(self.rough_node.links[0].from_node, bpy.types.ShaderNodeTexImage):
-                self.rough = Texture(self.rough_node.links[0].from_node)
+        self.name = world.name
 
-            # Bake an image
-            else:
-                print("LINKED TO NODE SETUP")
+        # Make a copy of the image
+        self.json_data                = {}
+        self.json_data['$schema']     = 'https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/skybox-schema.json'
+        self.json_data['name']        = self.name
+        self.json_data['environment'] = ""
+
+        self.image = world.node_tree.nodes['Environment Texture'].image.copy()
+
+        # The session removes the copy, even if the skybox outlives it
+        ExportSession.get().track_image(self.image)
+
+        return
+
+    def save_image (self, path: str):
         
-        # If there are no links, make a new 1x1 image with the color in "Roughness"
+        if self.image is not None:
+
+            start = timer()
+
+            # Preserve the image rendering type
+            tmp = bpy.context.scene.render.image_settings.file_format
+
+            # Set the image type to Radiance HDR
+            bpy.context.scene.render.image_settings.file_format = 'HDR'
+            
+            # Save the image to the specified path
+            ExportSession.get().record(path)
+            self.image.save_render(path)
+
+            # Restore the image type
+            bpy.context.scene.render.image_settings.file_format = tmp
+
+            self.json_data['environment'] = path
+
+            # The copy is not needed once it is saved
+            remove_image(self.image)
+            self.image = None
+
+            ExportSession.get().profiler.add_time("skybox", timer() - start, "skybox:" + self.name)
+            ExportSession.get().profiler.add_bytes("skybox", os.path.getsize(path), "skybox:" + self.name)
         else:
-            c = self.rough_node.default_value
-            bpy.ops.image.new(name=self.name+" rough", width=1, height=1, color=(c,c,c,1.0), alpha=False, generated_type='BLANK', float=True)
-            self.rough = Texture(bpy.data.images[self.name+' rough'])
-        
-        ################
-        # Export metal #
-        ################
+            print("[GXPort] [Skybox] Failed to export skybox")
 
-        # Set the metal node
-        self.metal_node = self.principled_node.inputs["Metallic"]
+        return
 
-        # Are there any links on the metalness input?
-        if bool(self.metal_node.links):
+    # Returns the document as a dictionary
+    def to_dict(self):
 
-            # Export an image
-            if isinstance(self.metal_node.links[0].from_node, bpy.types.ShaderNodeTexImage):
-                self.metal = Texture(self.metal_node.links[0].from_node)
+        return self.json_data
+    
+    def json (self):
 
-            # Bake an image
-            else:
-                print("LINKED TO NODE SETUP")
+        return (json.dumps(self.to_dict(), indent=4))
+
+    def write_to_file(self, path: str):
         
-        # If there are no links, make a new 1x1 image with the color in "Metalness"
-        else:
-            c = self.metal_node.default_value
-            print(self.name+" metal")
-            bpy.ops.image.new(name=self.name+" metal", width=1, height=1, color=(c,c,c,1.0), alpha=False, generated_type='BLANK', float=True)
-            self.metal = Texture(bpy.data.images[self.name+' metal'])
+        # Write the JSON data to the specified path
+        serializer.write(self.to_dict(), path)
+
+        return
+
+    def __del__ (self):
+
+        # Check if there is an image to remove
+        if self.image is not None:
+
+            # Remove the copy made in the constructor
+            remove_image(self.image)
         
-        #################
-        # Export normal #
-        #################
+        return
+
+class Orientation:
+
+    '''
+        gxport.Orientation
+    '''
+
+    # Rotation from Blender's axes to the exported axes, or None if they are the same
+    matrix: Matrix        = None
+    array : numpy.ndarray = None
+
+    # Sets the exported axes, as 'X+', 'Y-' and so on
+    @staticmethod
+    def set(forward: str = 'Y+', up: str = 'Z+'):
+
+        '''
+            Blender is forward Y+ and up Z+. Raises ValueError if forward and up are on the same axis
+        '''
+
+        Orientation.check(forward, up)
+
+        if ( forward, up ) == ( 'Y+', 'Z+' ):
+            Orientation.matrix = None
+            Orientation.array  = None
+            return
+
+        # 'Z-' is '-Z' to axis_conversion
+        axis = lambda a: ( "-" if a[1] == "-" else "" ) + a[0]
+
+        Orientation.matrix = axis_conversion(to_forward=axis(forward), to_up=axis(up)).to_4x4()
+        Orientation.array  = numpy.array(Orientation.matrix, dtype=numpy.float64)
+
+        return
+
+    # Raises ValueError if forward and up are on the same axis
+    @staticmethod
+    def check(forward: str, up: str):
+
+        if forward[0] == up[0]:
+            raise ValueError("[gxport] [Orientation] Forward and up are both on the " + forward[0] + " axis")
+
+        return
+
+    # Turns points or directions to the exported axes, as an ( n, 3 ) array
+    @staticmethod
+    def points(points) -> numpy.ndarray:
+
+        ret = numpy.array([ tuple(p) for p in points ], dtype=numpy.float64).reshape(-1, 3)
+
+        if Orientation.array is None:
+            return ret
+
+        return ret @ Orientation.array[:3, :3].T
+
+    # Turns one point or direction to the exported axes
+    @staticmethod
+    def vector(vector) -> list:
+
+        return Orientation.points([ vector ])[0].tolist()
+
+    # Turns affine matrices, shaped ( ..., 4, 4 ), to the exported axes
+    @staticmethod
+    def matrices(matrices: numpy.ndarray) -> numpy.ndarray:
+
+        if Orientation.array is None:
+            return matrices
+
+        return Orientation.array @ matrices @ Orientation.array.T
+
+# Returns the world space bounds of an object, as ( [ min x, y, z ], [ max x, y, z ] )
+def world_bounds(object: bpy.types.Object) -> tuple:
+
+    corners = Orientation.points([ object.matrix_world @ Vector(corner) for corner in object.bound_box ]).tolist()
+
+    return ( [ min(c[i] for c in corners) for i in range(3) ], [ max(c[i] for c in corners) for i in range(3) ] )
+
+# Returns the material of each slot of a mesh object. Empty slots use the first material of the object
+def slot_materials(object: bpy.types.Object) -> list:
+
+    materials = [ slot.material for slot in object.material_slots ]
+    fallback  = next(( m for m in materials if m is not None ), None)
+
+    return [ m or fallback for m in materials ] or [ fallback ]
+
+# Returns the materials the faces of a mesh object use, in slot order, without duplicates
+def used_materials(object: bpy.types.Object) -> list:
+
+    materials = slot_materials(object)
+    indices   = [ 0 ] * len(object.data.polygons)
+
+    object.data.polygons.foreach_get("material_index", indices)
+
+    # Faces past the last slot use the last slot, like they do in Blender
+    used      = sorted({ min(i, len(materials) - 1) for i in set(indices) })
+
+    return [ m for m in dict.fromkeys(materials[i] for i in used) if m is not None ]
+
+class Batch:
+
+    '''
+        gxport.Batch
+    '''
+
+    # Name of the batch, and the objects merged into it
+    name   : str  = None
+    objects: list = None
+
+    def __init__(self, name: str, objects: list):
+
+        self.name    = name
+        self.objects = objects
+
+        return
+
+    # Can an object be merged into a static batch?
+    @staticmethod
+    def is_static(object: bpy.types.Object) -> bool:
+
+        '''
+            Objects without a rigidbody can be merged, and so can passive ones that collide with
+            their mesh, since the mesh collider of the batch collides the same way. Deformed 
+            objects, and objects with more than one material, are not merged
+        '''
+
+        rigid_body = object.rigid_body
+
+        if rigid_body is not None and ( rigid_body.type != 'PASSIVE' or rigid_body.collision_shape != 'MESH' ):
+            return False
+
+        if object.find_armature() is not None:
+            return False
+
+        return len(used_materials(object)) == 1
+
+    # Merges static objects into batches
+    @staticmethod
+    def plan(objects: list, cell_size: float = 32.0, vertex_limit: int = 65535) -> list:
+
+        '''
+            Groups static objects by material, by rigidbody and by the grid cell the center of 
+            their world space bounds is in, then fills batches in order, starting a new one when
+            an object would take a batch past vertex_limit vertices. Returns the objects that are 
+            not merged and a batch for each batch, in the order of their first objects
+        '''
+
+        groups   = { }
+        batch_of = { }
+        ret      = [ ]
+
+        for object in objects:
+            if Batch.is_static(object) is False:
+                continue
+
+            lo, hi = world_bounds(object)
+            cell   = tuple(math.floor((lo[i] + hi[i]) / 2 / cell_size) for i in range(3))
+            key    = ( used_materials(object)[0].name, "passive" if object.rigid_body is not None else "static", cell )
+
+            groups.setdefault(key, [ ]).append(object)
+
+        for ( material, kind, cell ), members in groups.items():
+
+            batches = [ [ ] ]
+            count   = 0
+
+            for object in members:
+
+                # A face has at most as many unique vertices as it has corners
+                corners = len(object.data.loops)
+
+                if batches[-1] and count + corners > vertex_limit:
+                    batches.append([ ])
+                    count = 0
+
+                batches[-1].append(object)
+                count += corners
+
+            # An object on its own is written as it is
+            for i, batch_objects in enumerate(batches):
+                if len(batch_objects) < 2:
+                    continue
+
+                batch = Batch("batch." + material + "." + kind + "." + "_".join(str(c) for c in cell) + "." + str(i), batch_objects)
+
+                for object in batch_objects:
+                    batch_of[object.name] = batch
+
+        for object in objects:
+            batch = batch_of.get(object.name)
+
+            if batch is None:
+                ret.append(object)
+            elif batch.objects[0] is object:
+                ret.append(batch)
+
+        return ret
 
-        # Set the normal node
-        self.normal_node = self.principled_node.inputs["Normal"]
+class Partition:
 
-        # Are there any links on the normal input?
-        if bool(self.normal_node.links):
+    '''
+        gxport.Partition
+    '''
 
-            # Export an image
-            if isinstance(self.normal_node.links[0].from_node, bpy.types.ShaderNodeTexImage):
-                self.normal = Texture(self.normal_node.links[0].from_node)
+    # Modes
+    GRID     : str   = 'GRID'
+    OCTREE   : str   = 'OCTREE'
 
-            # Bake an image
-            else:
-                print("LINKED TO NODE SETUP")
-        
-        #############
-        # Export AO #
-        #############
-        
-        #################
-        # Export Height #
-        #################
-        
+    mode     : str   = None
 
+    # Edge length of a grid cell
+    cell_size: float = 32.0
 
-        self.json_data['$schema']  = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/material-schema.json"
-        self.json_data['name']     = material.name
-        self.json_data['textures'] = []
+    # Entities in an octree cell before it is split, and how many times it can be split
+    capacity : int   = 64
+    depth    : int   = 8
 
-        materials[material.name] = self
+    # { "name", "path", "bounds", "dependencies" } for each entity
+    entries  : list  = None
 
-        return
+    # Constructor
+    def __init__(self, mode: str = 'GRID', cell_size: float = 32.0, capacity: int = 64, depth: int = 8):
 
-    # Bake images
-    def bake(self, path: str):
+        '''
+            Constructs a gxport.Partition, which buckets entities into a uniform GRID of cells
+            cell_size wide, or an OCTREE whose cells are split when they hold more than capacity
+            entities, at most depth times. Entities are bucketed by the center of their bounds
+        '''
+
+        # Type check
+        if mode not in ( Partition.GRID, Partition.OCTREE ):
+            raise ValueError("[gxport] [Partition] Unknown partition \"" + str(mode) + "\"")
+
+        if cell_size <= 0:
+            raise ValueError("[gxport] [Partition] Cell size must be positive")
+
+        self.mode      = mode
+        self.cell_size = cell_size
+        self.capacity  = max(capacity, 1)
+        self.depth     = depth
+        self.entries   = [ ]
 
         return
 
-    def bake_albedo(self):
-        pass
-    def bake_rough(self):
-        pass
-    def bake_metal(self):
-        pass
-    def bake_normal(self):
-        pass
-    def bake_ao(self):
-        pass
-    def bake_height(self):
-        pass
+    # Adds an entity once it is written
+    def add(self, entity):
 
-    # Save all textures
-    def save_textures(self, directory: str):
+        '''
+            Records the path, bounds and asset dependencies of an entity. Only plain data is kept,
+            so the entity can be freed. Its collider must be built first, or a convex hull it 
+            writes is left out of the dependencies
+        '''
 
-        # Construct a texture
-        texture_directory: str = directory + "/textures/" + self.name 
+        self.entries.append({
+            "name"        : entity.name,
+            "path"        : entity.path,
+            "bounds"      : entity.bounds,
+            "dependencies": entity.dependencies()
+        })
 
-        # Make a directory for the textures
-        try:    os.mkdir(texture_directory)
-        except: pass
+        return
 
-        # Save the albedo texture
-        if self.albedo is not None:
-            self.albedo.save_texture(texture_directory + "/albedo." + "png")
+    # Buckets the entities into cells
+    def cells(self) -> dict:
 
-        # Save the roughness texture
-        if self.rough is not None:
-            self.rough.save_texture(texture_directory + "/rough." + "png")
+        '''
+            Returns { cell name: [ entries ] }. Empty cells are left out
+        '''
 
-        # Save the metal texture
-        if self.metal is not None:
-            self.metal.save_texture(texture_directory + "/metal." + "png")
+        ret: dict = { }
 
-        # Save the normal texture
-        if self.normal is not None:
-            self.normal.save_texture(texture_directory + "/normal." + "png")
+        if self.mode == Partition.GRID:
+            for entry in self.entries:
+                center = Partition.center(entry["bounds"])
+                key    = tuple(math.floor(c / self.cell_size) for c in center)
 
-        # Save the ambient occlusion texture
-        if self.ao is not None:
-            self.ao.save_texture(texture_directory + "/ao." + "png")
+                ret.setdefault("cell %d %d %d" % key, [ ]).append(entry)
 
-        # Save the height texture
-        if self.height is not None:
-            self.height.save_texture(texture_directory + "/height." + "png")
+        elif self.entries:
 
-        return
+            # The octree is a cube around every entity
+            lo, hi = Partition.union(e["bounds"] for e in self.entries)
+            size   = max(max(hi[i] - lo[i] for i in range(3)), 1e-6)
 
-    # Save each material texture to a directory
-    def save_material(self,  path: str):
-        
-        self.path              = path
-        self.json_data['path'] = self.path
-        self.json_data['textures'] = []
+            self.split(self.entries, lo, size, 0, "", ret)
 
-        if self.albedo:
-            self.json_data['textures'].append(json.loads(self.albedo.json()))
-        if self.rough:
-            self.json_data['textures'].append(json.loads(self.rough.json()))
-        if self.metal:
-            self.json_data['textures'].append(json.loads(self.metal.json()))
-        if self.normal:
-            self.json_data['textures'].append(json.loads(self.normal.json()))
-        if self.ao:
-            self.json_data['textures'].append(json.loads(self.ao.json()))
-        if self.height:
-            self.json_data['textures'].append(json.loads(self.height.json()))
+        return ret
 
-        self.write_to_file(self.path)
+    # Splits an octree cell until it holds few enough entities
+    def split(self, entries: list, lo: list, size: float, level: int, key: str, cells: dict):
 
-        return
+        # Leaf
+        if len(entries) <= self.capacity or level >= self.depth:
+            cells["cell " + (key or "root")] = entries
+            return
 
-    def write_to_file(self, path: str):
-        
-        # Write the JSON data to the specified path
-        with open(path, "w+") as f:
-            try:
-                f.write(self.json())
-            except FileExistsError:
-                pass
+        half     = size / 2
+        mid      = [ lo[i] + half for i in range(3) ]
+        children = [ [ ] for i in range(8) ]
 
-        return
+        # Bit 0 is x, bit 1 is y and bit 2 is z
+        for entry in entries:
+            center = Partition.center(entry["bounds"])
+            octant = (center[0] >= mid[0]) | (center[1] >= mid[1]) << 1 | (center[2] >= mid[2]) << 2
 
-    # Returns JSON text of object
-    def json(self):
+            children[octant].append(entry)
 
-        return json.dumps(self.json_data, indent=4)
+        for octant, child in enumerate(children):
+            if child:
+                child_lo = [ mid[i] if octant & (1 << i) else lo[i] for i in range(3) ]
+                self.split(child, child_lo, half, level + 1, key + str(octant), cells)
 
-    # Destructor
-    def __del__(self):
+        return
 
-        # Delete all the textures
-        if self.albedo is not None:
-            del(self.albedo)
+    # Writes a document for each cell, and an index of the cells
+    def write(self, directory: str, scene_name: str) -> str:
 
-        if self.rough is not None:
-            del(self.rough)
+        '''
+            Writes "cells/[cell name]" for each cell, and "cells/index". Returns the path of the index
+        '''
 
-        if self.metal is not None:
-            del(self.metal)
+        cells_directory = directory + "/cells/"
+        index           = { 
+            "name"     : scene_name, 
+            "partition": self.mode, 
+            "bounds"   : None,
+            "cells"    : [ ] 
+        }
 
-        if self.normal is not None:
-            del(self.normal)
+        if self.mode == Partition.GRID:
+            index["cell size"] = self.cell_size
+        else:
+            index["capacity"]  = self.capacity
+            index["depth"]     = self.depth
 
-        if self.ao is not None:
-            del(self.ao)
+        for name, entries in sorted(self.cells().items()):
+            lo, hi = Partition.union(e["bounds"] for e in entries)
+            path   = cells_directory + name + serializer.extension()
 
-        if self.height is not None:
-            del(self.height)
-        
-        return
+            # Every asset the cell needs, in the order they are first used
+            dependencies = list(dict.fromkeys(d for e in entries for d in e["dependencies"]))
 
-class LightProbe:
+            serializer.write({
+                "name"    : name,
+                "bounds"  : { "min": lo, "max": hi },
+                "entities": [ e["path"] for e in entries ]
+            }, path)
 
-    '''
-        - Light Probes
-    '''
+            index["cells"].append({
+                "name"        : name,
+                "path"        : path,
+                "bounds"      : { "min": lo, "max": hi },
+                "entities"    : len(entries),
+                "dependencies": dependencies
+            })
 
-    json_data: dict = None
+        if self.entries:
+            lo, hi          = Partition.union(e["bounds"] for e in self.entries)
+            index["bounds"] = { "min": lo, "max": hi }
 
-    def __init__(self, object: bpy.types.Object):
-        self.json_data = { }
+        path = cells_directory + "index" + serializer.extension()
 
-        # Spawn a very small sphere at the location of the light probe
-        bpy.ops.mesh.primitive_uv_sphere_add(segments=64, ring_count=32, radius=0.001, calc_uvs=True, enter_editmode=False, align='WORLD', location=(object.location[0], object.location[1], object.location[2]), rotation=(0, 0, 0), scale=(1, 1, 1))
+        serializer.write(index, path)
 
-        # TODO: Add a principled BSDF, Base Color = #FFFFFF, Metal=0, Rough=0, 
+        return path
 
-        # TODO: Investigate: Set smooth shading?
+    # Returns the center of bounds
+    @staticmethod
+    def center(bounds: tuple) -> list:
 
-        # Commentary: Maybe set roughness such that it will blur an amount proportional to the resolution
+        return [ (bounds[0][i] + bounds[1][i]) / 2 for i in range(3) ]
 
-        # TODO: Use equirectangular uv for bake
+    # Returns the union of bounds
+    @staticmethod
+    def union(bounds) -> tuple:
 
-        # TODO: Bake the GLOSSY with all influences into a generated 32 bit float image
+        lo = [  math.inf ] * 3
+        hi = [ -math.inf ] * 3
 
-        pass
+        for b in bounds:
+            lo = [ min(lo[i], b[0][i]) for i in range(3) ]
+            hi = [ max(hi[i], b[1][i]) for i in range(3) ]
 
-    # Bake a scaled down sphere with an equirectangular UV? Maybe use a cubemap?
-    pass
+        return ( lo, hi )
+
+class BVH:
 
-class Transform:
-    
     '''
-        - Transform
+        gxport.BVH
     '''
 
-    # Class data
-    location : list = None
-    rotation : list = None
-    scale    : list = None
-
-    json_data: dict = None
-    # Class methods
+    # BVH layout. Every integer is little endian
+    #
+    # Header, 16 bytes
+    #     char[4]  magic             "GXBV"
+    #     uint32   version
+    #     uint32   node count
+    #     uint32   index count
+    #
+    # Nodes, node count * 32 bytes, depth first, so the left child of an interior node is the
+    # node after it
+    #     float32  min x, y, z
+    #     float32  max x, y, z
+    #     uint32   right child       of an interior node, or first index of a leaf
+    #     uint16   index count       0 for an interior node
+    #     uint16   split axis        of an interior node, 0 for x, 1 for y and 2 for z
+    #
+    # Indices, index count * uint32, into the entities array of the scene document
+    MAGIC      : bytes = b"GXBV"
+    VERSION    : int   = 1
+    HEADER_SIZE: int   = 16
+    NODE_SIZE  : int   = 32
+
+    # Entities in a leaf before it is split
+    leaf_size  : int   = 4
+
+    bounds     : list  = None
+    nodes      : list  = None
+    indices    : list  = None
 
     # Constructor
-    def __init__(self, object: bpy.types.Object):
+    def __init__(self, bounds: list, leaf_size: int = 4):
 
-        self.json_data = { }
+        '''
+            Builds a gxport.BVH over a list of ( [ min x, y, z ], [ max x, y, z ] ) bounds. Nodes
+            are split at the median center, on the longest axis of their centers
+        '''
 
-        # Location
-        self.location = [ None, None, None ]
-        self.location[0]             = object.location[0]
-        self.location[1]             = object.location[1]
-        self.location[2]             = object.location[2]
+        self.bounds    = bounds
+        self.leaf_size = max(leaf_size, 1)
+        self.nodes     = [ ]
+        self.indices   = [ ]
 
-        # Save the rotation mode
-        temp                         = object.rotation_mode
+        if bounds:
+            self.build(list(range(len(bounds))))
 
-        # Set the rotation mode to quaternion
-        object.rotation_mode         = 'QUATERNION'
+        return
 
-        # Rotation 
-        self.rotation = [ None, None, None, None ]
-        self.rotation[0]             = object.rotation_quaternion[0]
-        self.rotation[1]             = object.rotation_quaternion[1]
-        self.rotation[2]             = object.rotation_quaternion[2]
-        self.rotation[3]             = object.rotation_quaternion[3]
-        
-        # Restore the rotation mode
-        object.rotation_mode         = temp
+    # Builds the subtree over some bounds, and returns the index of its root
+    def build(self, items: list) -> int:
 
-        # Scale
-        self.scale = [ None, None, None ]
-        self.scale[0]                = object.scale[0]
-        self.scale[1]                = object.scale[1]
-        self.scale[2]                = object.scale[2]
+        index = len(self.nodes)
+        self.nodes.append(None)
 
-        # Set up the dictionary
-        self.json_data["$schema"]    = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/transform-schema.json"
-        self.json_data["location"]   = self.location.copy()
-        self.json_data["quaternion"] = self.rotation.copy()
-        self.json_data["scale"]      = self.scale.copy()
+        lo, hi  = Partition.union(self.bounds[i] for i in items)
+        centers = { i: Partition.center(self.bounds[i]) for i in items }
 
-        return 
+        # The axis the centers are spread furthest along
+        extents = [ max(c[a] for c in centers.values()) - min(c[a] for c in centers.values()) for a in range(3) ]
+        axis    = extents.index(max(extents))
 
-    # Returns class as JSON text
-    def json(self):
-        
-        return json.dumps(self.json_data, indent=4)
+        # Leaf
+        if len(items) <= self.leaf_size:
+            self.nodes[index] = ( lo, hi, len(self.indices), len(items), 0 )
+            self.indices.extend(items)
 
-class Rigidbody:
-    
-    '''
-        - Rigidbody
-    '''
+            return index
 
-    # Class data
-    mass     : float = None
-    active   : bool  = None
+        # Entities with the same center are split in half as they are, so no leaf outgrows leaf_size
+        if extents[axis] > 0.0:
+            items.sort(key=lambda i: centers[i][axis])
 
-    json_data: dict  = None
+        middle = len(items) // 2
 
-    # Class methods
+        self.build(items[:middle])
 
-    @staticmethod
-    def has_rigidbody(object: bpy.types.Object) -> bool:
-        return True if isinstance(object.rigid_body, bpy.types.RigidBodyObject) else False
+        right  = self.build(items[middle:])
 
-    def __init__(self, object: bpy.types.Object):
-        
-        # Exit if there is no rigidbody
-        if Rigidbody.has_rigidbody(object) == False:
-            return
-        
-        self.json_data = { }
+        self.nodes[index] = ( lo, hi, right, 0, axis )
 
-        # Set class data
-        self.mass   = object.rigid_body.mass 
-        self.active = object.rigid_body.type 
+        return index
 
-        # Set up the dictionary
-        self.json_data["$schema"] = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/rigidbody-schema.json"
-        self.json_data["active"]  = self.active
+    # Returns the BVH as bytes
+    def dumps(self) -> bytes:
 
-        return 
+        ret = bytearray(pack("<4sIII", BVH.MAGIC, BVH.VERSION, len(self.nodes), len(self.indices)))
 
-    # Returns class as JSON text
-    def json(self):
-        if self.active:
-            self.json_data["mass"]    = self.mass
+        for lo, hi, offset, count, axis in self.nodes:
+            ret += pack("<6fIHH", lo[0], lo[1], lo[2], hi[0], hi[1], hi[2], offset, count, axis)
 
-        return json.dumps(self.json_data, indent=4)
+        ret += pack("<%dI" % len(self.indices), *self.indices)
 
-    def write_to_file(self, path: str):
-        
-        # Write the JSON data to the specified path
-        with open(path, "w+") as f:
-            try:
-                f.write(self.json())
-            except FileExistsError:
-                pass
+        return bytes(ret)
+
+    # Writes the BVH to a file
+    def write(self, path: str):
+
+        session = ExportSession.get()
+        data    = self.dumps()
+
+        session.record(path)
+
+        with open(path, "wb") as f:
+            f.write(data)
+
+        session.profiler.add_bytes("bvh", len(data), "bvh")
 
         return
 
-class Collider:
+class InstanceArray:
+
     '''
-        - Collider
+        gxport.InstanceArray
     '''
 
-    # Class data
-    dimensions : list = None
-    shape      : str  = None
-    convex_hull: str  = None
+    # Transforms layout. Every integer and float is little endian
+    #
+    # Header, 16 bytes
+    #     char[4]  magic             "GXIN"
+    #     uint32   version
+    #     uint32   instance count
+    #     uint32   floats per instance, 12
+    #
+    # Transforms, instance count * 48 bytes
+    #     float32  rows 0, 1 and 2 of the world matrix of the instance, 4 floats each. The
+    #              last row is always 0, 0, 0, 1
+    MAGIC      : bytes = b"GXIN"
+    VERSION    : int   = 1
+    HEADER_SIZE: int   = 16
+    FLOATS     : int   = 12
+
+    name       : str   = None
+    part       : Part  = None
+    materials  : list  = None
+
+    # Flat world matrices, FLOATS floats per instance
+    matrices   : array = None
+
+    json_data  : dict  = None
+
+    path       : str   = None
+    data_path  : str   = None
+
+    # World space bounds of every instance, as ( [ min x, y, z ], [ max x, y, z ] )
+    bounds     : tuple = None
 
-    json_data  : dict = None
+    # Constructor
+    def __init__(self, object: bpy.types.Object, matrices: array):
 
-    # Class methods
+        self.name      = object.name
+        self.part      = ExportSession.get().parts.get(object.name) or Part(object)
+        self.materials = [ ExportSession.get().materials.get(m.name) or Material(m) for m in self.part.materials ]
 
-    # Constructor
-    def __init__ (self, object: bpy.types.Object):
-        
-        # Check for a rigidbody
-        if Rigidbody.has_rigidbody(object) == False:
-            return
+        # Turn the transforms to the exported axes
+        m              = numpy.zeros(( len(matrices) // InstanceArray.FLOATS, 4, 4 ))
+        m[:, :3, :]    = numpy.frombuffer(matrices, dtype=numpy.float32).reshape(-1, 3, 4)
+        m[:, 3, 3]     = 1.0
+        m              = Orientation.matrices(m)
 
-        # Set the shape
-        self.shape = object.rigid_body.collision_shape
+        self.matrices  = array('f', m[:, :3, :].astype(numpy.float32).tobytes())
 
-        # Set the dimensions
-        self.dimensions = [ None, None, None ]
-        # TODO
+        # Bound the corners of the source object under every instance transform
+        corners        = Orientation.points(object.bound_box)
+        points         = m[:, :3, :3] @ corners.T + m[:, :3, 3:]
+        lo             = points.min(axis=(0, 2)).tolist()
+        hi             = points.max(axis=(0, 2)).tolist()
 
-        # Set the JSON
-        self.json_data               = { }
-        self.json_data["$schema"]    = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/collider-schema.json"
-        self.json_data["type"]       = self.shape
-        self.json_data["dimensions"] = self.dimensions
+        self.bounds    = ( lo, hi )
+
+        self.json_data = { }
+
+        self.json_data['name']   = self.name
+        self.json_data['count']  = len(matrices) // InstanceArray.FLOATS
+        self.json_data['bounds'] = { "min": lo, "max": hi }
 
-        # Write the convex hull
-        if self.convex_hull is not None:
-            self.json_data["convex hull path"] = self.convex_hull
-        
         return
-    
-    def json(self):
 
-        return json.dumps(self.json_data, indent=4)
+    # Reads every instance of a mesh object out of an evaluated depsgraph, and groups them by object
+    @staticmethod
+    def collect(depsgraph) -> list:
+
+        '''
+            Returns a gxport.InstanceArray for each mesh object that collection instances or
+            geometry nodes instance. Instances of geometry that is not an object have nothing to
+            point a part at, so they are counted and skipped. Must run on the main thread
+        '''
+
+        groups  = { }
+        skipped = 0
+
+        for instance in depsgraph.object_instances:
+
+            if instance.is_instance is False or instance.object.type != 'MESH':
+                continue
+
+            source = instance.object.original
+
+            # Geometry made by the instancer itself
+            if instance.parent is not None and source == instance.parent.original:
+                skipped = skipped + 1
+                continue
+
+            # Copy the matrix now, since the instance is only valid while iterating
+            m = instance.matrix_world
+
+            groups.setdefault(source.name, ( source, array('f') ))[1].extend((
+                m[0][0], m[0][1], m[0][2], m[0][3],
+                m[1][0], m[1][1], m[1][2], m[1][3],
+                m[2][0], m[2][1], m[2][2], m[2][3]
+            ))
+
+        if skipped > 0:
+            print("[gxport] [InstanceArray] Skipped " + str(skipped) + " instances of geometry that is not an object")
+
+        return [ InstanceArray(source, matrices) for source, matrices in groups.values() ]
+
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        return self.json_data
 
     def write_to_file(self, path: str):
-        
+
         # Write the JSON data to the specified path
-        with open(path, "w+") as f:
-            try:
-                f.write(self.json())
-            except FileExistsError:
-                pass
+        serializer.write(self.to_dict(), path)
 
         return
 
-class Entity:
-    '''
-        - Entity
-    '''
+    # Returns the transforms as bytes
+    def dumps(self) -> bytes:
 
-    name     : str       = None
-    part     : Part      = None
-    material : Material  = None
-    transform: Transform = None
-    rigidbody: Rigidbody = None
-    collider : Collider  = None
+        matrices = array('f', self.matrices)
 
-    json_data: dict      = None
+        if sys.byteorder == 'big':
+            matrices.byteswap()
 
-    path     : str       = None
+        return pack("<4sIII", InstanceArray.MAGIC, InstanceArray.VERSION, len(matrices) // InstanceArray.FLOATS, InstanceArray.FLOATS) + matrices.tobytes()
 
-    def __init__(self, object: bpy.types.Object):
-        if isinstance(object.data, bpy.types.Mesh) == False:
-            return
-        
-        self.name      = object.name
-        self.part      = Part(object)
-        self.material  = materials.get(object.material_slots[0].material.name) if materials.get(object.material_slots[0].material.name) is not None else Material(object.material_slots[0].material)
-        self.transform = Transform(object)
-        self.rigidbody = Rigidbody(object)
-        self.collider  = Collider(object)
-        self.rig       = Rig(object)
+    # Writes the transforms to a file
+    def write_transforms(self, path: str):
 
-        self.json_data = { }
+        session = ExportSession.get()
+        start   = timer()
+        data    = self.dumps()
 
-        self.json_data['$schema']   = 'https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/entity-schema.json'
-        self.json_data['name']      = self.name
+        session.record(path)
 
-        if bool(self.part.json_data):
-            self.json_data['parts'] = []
-            self.json_data['parts'].append(json.loads(self.part.json()))
+        with open(path, "wb") as f:
+            f.write(data)
 
-        if bool(self.material.json_data):
-            self.json_data['materials'] = []
-            self.json_data['materials'].append(json.loads(self.material.json()))
+        session.profiler.add_time("instances", timer() - start, "instances:" + self.name)
+        session.profiler.add_bytes("instances", len(data), "instances:" + self.name)
 
-        self.json_data['shader'] = 'G10/shaders/G10 PBR.json'
+        # The transforms are not needed once they are written
+        self.matrices = None
 
-        if bool(self.transform.json_data):
-            self.json_data['transform'] = json.loads(self.transform.json())
+        return
 
-        if bool(self.rigidbody.json_data):
-            self.json_data['rigidbody'] = json.loads(self.rigidbody.json())
+    # Schedules writing the part, the materials, the transforms and the instance array document
+    def schedule(self, scheduler: Scheduler, directory: str) -> str:
 
-        if bool(self.collider.json_data):
-            self.json_data['collider'] = json.loads(self.collider.json())
+        '''
+            Adds nodes for the materials, the part, the transforms and the instance array
+            document, which is written last. Returns the name of the document node
+        '''
 
-        # TODO: Rig
-        # Check parent objects for an armature type
-        # Construct a rig from the armature
-        # Add rig json
+        self.path      = directory + "/instances/" + self.name + serializer.extension()
+        self.data_path = directory + "/instances/" + self.name + ".bin"
 
-        return
-    
-    def json (self):
-        
-        return (json.dumps(self.json_data, indent=4))
+        material_nodes = [ m.schedule(scheduler, directory) for m in self.materials ]
+        part_node      = self.part.schedule(scheduler, directory)
+        data_node      = scheduler.add("instance transforms:" + self.name, lambda: self.write_transforms(self.data_path))
 
-    def write_to_file(self, path: str):
-        
-        # Write the JSON data to the specified path
-        with open(path, "w+") as f:
-            try:
-                f.write(self.json())
-            except FileExistsError:
-                pass
+        self.json_data["parts"]      = [ self.part.path ]
+        self.json_data["materials"]  = [ m.path for m in self.materials ]
+        self.json_data["transforms"] = self.data_path
 
-        return
+        return scheduler.add("instances:" + self.name, lambda: self.write_to_file(self.path), material_nodes + [ part_node, data_node ])
 
-    def write_to_directory(self, directory: str):
+class TransformTable:
 
-        # Set the path to the entity json
-        self.path = directory + "/entities/" + self.name + ".json"
+    '''
+        gxport.TransformTable
+    '''
 
-        # Directories for exports
-        material_dir = directory + "/materials/"
-        part_dir     = directory + "/part/"
-        collider_dir = directory + "/collider/"
+    # Table layout. Every integer and float is little endian
+    #
+    # Header, 16 bytes
+    #     char[4]  magic             "GXTF"
+    #     uint32   version
+    #     uint32   row count
+    #     uint32   row size          44
+    #
+    # Rows, row count * 44 bytes. Parents come before their children
+    #     float32  location x, y, z
+    #     float32  quaternion w, x, y, z
+    #     float32  scale x, y, z
+    #     int32    parent            row of the parent, or -1. Rows with a parent are relative to it
+    MAGIC      : bytes = b"GXTF"
+    VERSION    : int   = 1
+    HEADER_SIZE: int   = 16
+    ROW        : numpy.dtype = numpy.dtype([ ( "location", "<f4", 3 ), ( "quaternion", "<f4", 4 ), ( "scale", "<f4", 3 ), ( "parent", "<i4" ) ])
+
+    # Row of each object name
+    index      : dict  = None
+    rows       : numpy.ndarray = None
 
-        # Save the textures
-        self.material.save_textures(directory)
-        
-        # Write the material to a directory
-        self.material.save_material(material_dir + self.material.name + ".json")
-        self.json_data["materials"] = [ self.material.path ]
-        
-        # Save the part
-        self.part.write_to_directory(directory)
-        self.json_data["parts"]     = [ self.part.path ]
-        
-        # Write the entity to a directory
-        self.write_to_file(self.path)
+    # Constructor
+    def __init__(self, objects: list):
 
-        # Clean up
-        del self.part
-        del self.material
+        '''
+            Decomposes every object in one pass. Objects are only read. Objects whose parent is in
+            the table are relative to the world matrix of the parent, and the rest are in world 
+            space, so parenting and constraints are baked in. matrix_local is not used, since with
+            bone or vertex parenting it is relative to something other than the parent object. A 
+            gxport.Batch is the identity
+        '''
 
-        return
+        start   = timer()
+        names   = { o.name for o in objects }
 
-class Skybox:
+        # Ancestors in the table, so parents can be put first
+        def depth(object) -> int:
+            ret = 0
 
-    '''
-        - Skybox
-    '''
+            while not isinstance(object, Batch) and object.parent is not None and object.parent.name in names:
+                object = object.parent
+                ret    = ret + 1
 
-    json_data: dict            = None
-    image:     bpy.types.Image = None
-    name :     str             = None
+            return ret
 
-    def __init__ (self, world: bpy.types.World):
-        
-        # Check if there is a node to grab the equirectangular image from
-        if bool(world.node_tree.nodes.find('Environment Texture')) == False:
+        objects    = sorted(objects, key=depth)
+        self.index = { o.name: i for i, o in enumerate(objects) }
 
-            # If not, bail
-            return
+        matrices   = numpy.empty(( len(objects), 4, 4 ), dtype=numpy.float64)
+        parents    = numpy.full(len(objects), -1, dtype=numpy.int32)
 
-        self.name = world.name
+        for i, object in enumerate(objects):
 
-        # Make a copy of the image
-        self.json_data                = {}
-        self.json_data['$schema']     = 'https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/skybox-schema.json'
-        self.json_data['name']        = self.name
-        self.json_data['environment'] = ""
+            if isinstance(object, Batch):
+                matrices[i] = numpy.identity(4)
+                continue
 
-        self.image = world.node_tree.nodes['Environment Texture'].image.copy()
+            matrices[i] = object.matrix_world
+
+            if object.parent is not None and object.parent.name in self.index:
+                parents[i] = self.index[object.parent.name]
+
+        # Make children relative to their parents, in one pass. A parent scaled to 0 has no inverse, so the pseudo inverse is used
+        children           = parents >= 0
+        matrices[children] = numpy.linalg.pinv(matrices[parents[children]]) @ matrices[children]
+
+        self.rows           = numpy.zeros(len(objects), dtype=TransformTable.ROW)
+        self.rows["parent"] = parents
+
+        self.decompose(Orientation.matrices(matrices))
+
+        ExportSession.get().profiler.add_time("transforms", timer() - start, "transforms")
 
         return
 
-    def save_image (self, path: str):
-        
-        if self.image is not None:
+    # Decomposes affine matrices into the location, quaternion and scale of each row
+    def decompose(self, matrices: numpy.ndarray):
 
-            # Preserve the image rendering type
-            tmp = bpy.context.scene.render.image_settings.file_format
+        '''
+            A mirroring matrix is decomposed with a negative x scale. Rotations are turned into
+            quaternions with Shepperd's method, which divides by the biggest of the four terms
+        '''
 
-            # Set the image type to Radiance HDR
-            bpy.context.scene.render.image_settings.file_format = 'HDR'
-            
-            # Save the image to the specified path
-            self.image.save_render(path)
+        linear = matrices[:, :3, :3]
+        scale  = numpy.linalg.norm(linear, axis=1)
 
-            # Restore the image type
-            bpy.context.scene.render.image_settings.file_format = tmp
+        # Mirror on x
+        scale[:, 0] = numpy.where(numpy.linalg.det(linear) < 0, -scale[:, 0], scale[:, 0])
 
-            self.json_data['environment'] = path
-        else:
-            print("[GXPort] [Skybox] Failed to export skybox")
+        # Remove the scale from the columns. Zero scales are left alone
+        r      = linear / numpy.where(scale == 0, 1.0, scale)[:, None, :]
 
-        return
-    
-    def json (self):
+        m00, m01, m02 = r[:, 0, 0], r[:, 0, 1], r[:, 0, 2]
+        m10, m11, m12 = r[:, 1, 0], r[:, 1, 1], r[:, 1, 2]
+        m20, m21, m22 = r[:, 2, 0], r[:, 2, 1], r[:, 2, 2]
 
-        return (json.dumps(self.json_data, indent=4))
+        # Four times the square of w, x, y and z
+        terms  = numpy.stack(( 1 + m00 + m11 + m22, 1 + m00 - m11 - m22, 1 - m00 + m11 - m22, 1 - m00 - m11 + m22 ), axis=1)
+        case   = numpy.argmax(terms, axis=1)
+        s      = 2 * numpy.sqrt(numpy.maximum(terms[numpy.arange(len(case)), case], 1e-12))
 
-    def write_to_file(self, path: str):
-        
-        # Write the JSON data to the specified path
-        with open(path, "w+") as f:
+        candidates = numpy.stack((
+            numpy.stack(( s / 4, (m21 - m12) / s, (m02 - m20) / s, (m10 - m01) / s ), axis=1),
+            numpy.stack(( (m21 - m12) / s, s / 4, (m01 + m10) / s, (m02 + m20) / s ), axis=1),
+            numpy.stack(( (m02 - m20) / s, (m01 + m10) / s, s / 4, (m12 + m21) / s ), axis=1),
+            numpy.stack(( (m10 - m01) / s, (m02 + m20) / s, (m12 + m21) / s, s / 4 ), axis=1)
+        ), axis=1)
 
-            # Try to write the file
-            try:
-                f.write(self.json())
+        quaternions  = candidates[numpy.arange(len(case)), case]
+        quaternions /= numpy.linalg.norm(quaternions, axis=1, keepdims=True)
 
-            # Exceptions
-            except FileExistsError:
+        # Keep w positive
+        quaternions *= numpy.where(quaternions[:, :1] < 0, -1.0, 1.0)
 
-                pass
+        self.rows["location"]   = matrices[:, :3, 3]
+        self.rows["quaternion"] = quaternions
+        self.rows["scale"]      = scale
 
         return
 
-    def __del__ (self):
+    # Returns the location, quaternion and scale of an object, as lists
+    def row(self, name: str) -> tuple:
 
-        # Check if there is an image to remove
-        if self.image is not None:
+        row = self.rows[self.index[name]]
+
+        return ( row["location"].tolist(), row["quaternion"].tolist(), row["scale"].tolist() )
+
+    # Returns the table as bytes
+    def dumps(self) -> bytes:
+
+        return pack("<4sIII", TransformTable.MAGIC, TransformTable.VERSION, len(self.rows), TransformTable.ROW.itemsize) + self.rows.tobytes()
+
+    # Writes the table to a file
+    def write(self, path: str):
+
+        session = ExportSession.get()
+        data    = self.dumps()
+
+        session.record(path)
+
+        with open(path, "wb") as f:
+            f.write(data)
+
+        session.profiler.add_bytes("transforms", len(data), "transforms")
 
-            # Remove the copy made in the constructor
-            bpy.data.images.remove(self.image)
-        
         return
 
 class Scene:
@@ -1426,29 +4740,58 @@ class Scene:
     '''
 
 
-    name         : str           = None
-    entities     : list          = None
-    cameras      : list          = None
-    lights       : list          = None
-    light_probes : list          = None
+    name          : str           = None
+    entities      : list          = None
+    entity_objects: list          = None
+    cameras       : list          = None
+    lights        : list          = None
+    light_probes  : list          = None
 
-    skybox       : Skybox        = None
+    skybox        : Skybox        = None
 
-    json_data    : dict          = None
+    # Instances of mesh objects, grouped by object
+    instance_arrays: list          = None
 
-    def __init__(self, scene: bpy.types.Scene):
+    # Transforms of every entity
+    transform_table: TransformTable = None
+
+    streaming     : bool          = False
+
+    # Buckets entities into cells, while the scene is scheduled
+    partition     : Partition     = None
+
+    # World space bounds of each entity, in the order of the entities array
+    entity_bounds : list          = None
+
+    json_data     : dict          = None
+
+    def __init__(self, scene: bpy.types.Scene, streaming: bool = False, selected_only: bool = False, static_batching: bool = False, batch_cell_size: float = 32.0, batch_vertex_limit: int = 65535, instances: bool = False):
+
+        """
+            Constructs a scene. If streaming is True, entities are not constructed until the
+            scene is written, and each one is freed before the next is constructed. If selected_only
+            is True, only selected objects are constructed, and the skybox is left out. If 
+            static_batching is True, static objects with the same material in the same batch_cell_size
+            cell are merged into entities of up to batch_vertex_limit vertices. If instances is True,
+            collection and geometry nodes instances are read from the evaluated depsgraph, and 
+            written as an instance array for each instanced object
+        """
 
         # Check for the right type
         if isinstance(scene, bpy.types.Scene) == False:
             # TODO: Throw an exception?
             return
 
-        self.name         = scene.name
+        self.name           = scene.name
+        self.streaming      = streaming
 
-        self.entities     = []
-        self.cameras      = []
+        self.entities       = []
+        self.entity_objects = []
+        self.entity_bounds  = []
+        self.cameras        = []
         self.lights       = []
         self.light_probes = []
+        self.instance_arrays = []
         self.json_data    = { }
 
         self.json_data["$schema"]      = "https://raw.githubusercontent.com/Jacob-C-Smith/G10-Schema/main/scene-schema.json"
@@ -1458,10 +4801,22 @@ class Scene:
         self.json_data["lights"]       = []
         self.json_data["light probes"] = []
         self.json_data["skybox"]       = {}
-        
+
+        start  = timer()
+        meshes = [ ]
+
+        # A batch of selected objects would be written next to the entities of those objects
+        if static_batching is True and selected_only is True:
+            print("[gxport] [Scene] Static batching is skipped when appending to a scene")
+            static_batching = False
+
         # Iterate over each object in the scene
         for object in scene.objects:
 
+            # Skip unselected objects
+            if selected_only is True and object.select_get() == False:
+                continue
+
             # Construct a light 
             if object.type == 'LIGHT':
                 self.lights.append(Light(object))
@@ -1470,83 +4825,235 @@ class Scene:
             elif object.type == 'CAMERA':
                 self.cameras.append(Camera(object))
 
-            # Construct an entity
+            # Construct entities once every object has been seen, so static ones can be batched
             elif object.type == 'MESH':
-                self.entities.append(Entity(object))
+                meshes.append(object)
 
             # Construct a light probe 
             elif object.type == 'LIGHT_PROBE':
                 self.light_probes.append(LightProbe(object))            
 
+            # Instances are read from the depsgraph
+            elif instances is True and object.type == 'EMPTY' and object.instance_type == 'COLLECTION':
+                pass
+
             # Default case
             else:
                 print("[gxport] [Scene] Unrecognized object in scene \"" + scene.name + "\"")
 
+        # Read instances. A patch has no way to remove the instances of a scene
+        if instances is True and selected_only is True:
+            print("[gxport] [Scene] Instances are skipped when appending to a scene")
+        elif instances is True:
+            self.instance_arrays = InstanceArray.collect(bpy.context.evaluated_depsgraph_get())
+
+        # Merge static objects
+        if static_batching is True:
+            meshes = Batch.plan(meshes, batch_cell_size, batch_vertex_limit)
+
+        # Decompose the transform of every entity at once. A patch has no table to index into
+        if selected_only is False:
+            self.transform_table = TransformTable(meshes)
+
+        # Construct an entity, or defer it until the scene is written
+        for object in meshes:
+            if self.streaming is True:
+                self.entity_objects.append(object)
+            else:
+                self.entities.append(Entity(object, self.transform_table))
+
         # Construct the skybox
-        if isinstance(scene.world, bpy.types.World):
+        if selected_only is False and isinstance(scene.world, bpy.types.World):
             self.skybox = Skybox(scene.world)
-            
+
+        ExportSession.get().profiler.add_time("scene walk", timer() - start, "scene:" + self.name)
 
         return
 
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        return self.json_data
+
     def json(self):
 
-        return json.dumps(self.json_data,indent=4)
+        return json.dumps(self.to_dict(),indent=4)
 
-    def write_to_directory(self, directory: str):
+    def write_to_directory(self, directory: str, bundle: bool = False, workers: int = 0, patch: bool = False, progress_path: str = None, memory_budget: int = 0, partition: Partition = None, bvh: bool = False):
         
         """
             Writes a scene to a directory, with entities, materials, parts, colliders, and skyboxes.
+            If bundle is True, every file is also packed into "[scene name].gxpk". Encoding and I/O
+            run on workers threads, or one per core if workers is 0. If patch is True, the entities, 
+            cameras and lights are merged into the scene file in the directory, instead of replacing it.
+            If progress_path is set, progress is written to it as the scene is written. If memory_budget
+            is set, work is throttled while the process uses more than memory_budget bytes. If there 
+            is a partition, entities are also bucketed into cells under "cells/", with an index. If bvh
+            is True, a BVH over the world space bounds of the entities is written to "[scene name].bvh"
         """
 
         # Make scene directories
+        Scene.make_directories(directory)
+
+        # Assets are exported as a graph. Nodes that touch Blender run on this thread, and
+        # encoding and I/O run on a pool of workers
+        scheduler               = Scheduler(workers)
+        scheduler.progress_path = progress_path
+        scheduler.memory_budget = memory_budget
+
+        try:
+            self.schedule(scheduler, directory, bundle, patch, partition, bvh)
+
+            # Write everything
+            scheduler.run()
+
+            # Report the critical path
+            scheduler.report()
+        finally:
+            scheduler.close()
+            ExportSession.end_implicit()
+
+        return
+
+    @staticmethod
+    def make_directories(directory: str):
+
+        """
+            Makes the scene directory, and the directories for each kind of asset
+        """
 
         # This is where the scene is exported
-        try   : os.mkdir(directory)
+        try   : make_directory(directory)
         except: pass
     
         # This is where convex hulls are exported
-        try   : os.mkdir(directory + "/colliders/")
+        try   : make_directory(directory + "/colliders/")
         except: pass
         
         # This is where entities are exported
-        try   : os.mkdir(directory + "/entities/")
+        try   : make_directory(directory + "/entities/")
         except: pass
         
         # This is where materials are exported
-        try   : os.mkdir(directory + "/materials/")
+        try   : make_directory(directory + "/materials/")
         except: pass
         
         # This is where 3D models are exported
-        try   : os.mkdir(directory + "/parts/")
+        try   : make_directory(directory + "/parts/")
         except: pass
         
         # This is where the skybox is exported
-        try   : os.mkdir(directory + "/skybox/")
+        try   : make_directory(directory + "/skybox/")
+        except: pass
+        
+        # This is where cells are exported
+        try   : make_directory(directory + "/cells/")
+        except: pass
+        
+        # This is where instance arrays are exported
+        try   : make_directory(directory + "/instances/")
         except: pass
         
         # This is where material textures are exported
         # NOTE: Material textures are written to "textures/[material name]/". 
-        try   : os.mkdir(directory + "/textures/")
+        try   : make_directory(directory + "/textures/")
         except: pass
-        
+
+        return
+
+    def schedule(self, scheduler: Scheduler, directory: str, bundle: bool = False, patch: bool = False, partition: Partition = None, bvh: bool = False) -> str:
+
+        """
+            Adds every node needed to write the scene to a scheduler. Entities are scheduled together,
+            unless the scene is streaming, where each one is constructed when the previous one is 
+            written and freed. Returns the name of the last node
+        """
+
+        # Nodes that must finish before the scene is written
+        scene_dependencies = []
+
+        # A patch only has some of the entities, so it would replace the cells with a partial index
+        if partition is not None and patch is True:
+            print("[gxport] [Scene] Entities are not partitioned when appending to a scene")
+            partition = None
+
+        # The BVH indexes the entities array, which a patch reorders
+        if bvh is True and patch is True:
+            print("[gxport] [Scene] The BVH is not written when appending to a scene")
+            bvh = False
+
+        self.partition = partition
+
         # Write entities
         if bool(self.entities) == True:
 
             # Make an entity array in the json object
             self.json_data["entities"] = []
 
+            # The last entity bucketed into a cell
+            previous = None
+
             # Save each entity
             for entity in self.entities:
 
-                # Write the entity and all its data
-                entity.write_to_directory(directory)
+                # Schedule the entity and all its data
+                entity_node = entity.schedule(scheduler, directory)
+                scene_dependencies.append(entity_node)
 
                 # Write the entity path into the entities array
                 self.json_data["entities"].append(entity.path)
+                self.entity_bounds.append(entity.bounds)
+                self.map_batch(entity)
+
+                # Bucket the entity into a cell once it is written, in the order entities are scheduled
+                if partition is not None:
+                    previous = scheduler.add("cell entry:" + entity.name, lambda entity=entity: partition.add(entity), [ entity_node ] + ( [ previous ] if previous is not None else [ ] ))
+
+                # Free written assets if the caches are over the memory cap
+                scheduler.add("evict:" + entity.name, ExportSession.get().evict, [ entity_node ], main_thread=True)
+
+            if previous is not None:
+                scene_dependencies.append(previous)
+
+        # Stream entities
+        if bool(self.entity_objects) == True:
+
+            previous = None
+
+            # Chain each entity after the previous one
+            for object in self.entity_objects:
+
+                construct = scheduler.add(
+                    "entity construct:" + object.name, 
+                    lambda object=object: self.stream_entity(scheduler, directory, object), 
+                    [ previous ] if previous is not None else [ ],
+                    main_thread=True
+                )
+
+                previous  = scheduler.add(
+                    "entity streamed:" + object.name,
+                    lambda name=object.name: self.free_entity(name),
+                    [ construct ],
+                    main_thread=True
+                )
+
+            scene_dependencies.append(previous)
 
-                # Destruct the entity
-                del entity
+        # Write instance arrays
+        if bool(self.instance_arrays) == True:
+
+            self.json_data["instances"] = []
+
+            for instance_array in self.instance_arrays:
+                scene_dependencies.append(instance_array.schedule(scheduler, directory))
+
+                self.json_data["instances"].append(instance_array.path)
+
+        # Write the transform table
+        if self.transform_table is not None:
+            self.json_data["transforms"] = directory + "/" + self.name + ".transforms"
+
+            scene_dependencies.append(scheduler.add("transforms", lambda: self.transform_table.write(self.json_data["transforms"])))
 
         # Write cameras
         if bool(self.cameras) == True:
@@ -1558,7 +5065,7 @@ class Scene:
             for camera in self.cameras:
 
                 # Write the camera json object into the cameras array
-                self.json_data["cameras"].append(json.loads(camera.json()))
+                self.json_data["cameras"].append(camera.to_dict())
 
                 # Destruct the camera
                 del camera
@@ -1573,7 +5080,7 @@ class Scene:
             for light in self.lights:
 
                 # Write the light json object into the lights array
-                self.json_data["lights"].append(json.loads(light.json()))
+                self.json_data["lights"].append(light.to_dict())
 
                 # Destruct the light
                 del light
@@ -1595,26 +5102,137 @@ class Scene:
 
         # Write the skybox
         if bool(self.skybox) == True:
+
+            skybox_path = directory + "/skybox/" + self.skybox.name
             
             # Save the skybox image
-            self.skybox.save_image(directory + "/skybox/" + self.skybox.name + ".hdr")
+            scheduler.add("skybox image", lambda: self.skybox.save_image(skybox_path + ".hdr"), main_thread=True)
 
             # Save the skybox json
-            self.skybox.write_to_file(directory + "/skybox/" + self.skybox.name + ".json")
+            scene_dependencies.append(scheduler.add("skybox write", lambda: self.skybox.write_to_file(skybox_path + serializer.extension()), [ "skybox image" ]))
 
             # Make a reference to the skybox json file in the json object
-            self.json_data["skybox"]       = directory + "/skybox/" + self.skybox.name + ".json"
+            self.json_data["skybox"]       = skybox_path + serializer.extension()
+
+
+        # Write the cells, once every entity has been scheduled
+        if partition is not None:
+            self.json_data["cells"] = directory + "/cells/index" + serializer.extension()
 
+            scene_dependencies.append(scheduler.add("cells", lambda: partition.write(directory, self.name), list(scene_dependencies)))
+
+        # Write the BVH, once every entity has been scheduled
+        if bvh is True:
+            self.json_data["bvh"] = directory + "/" + self.name + ".bvh"
+
+            scene_dependencies.append(scheduler.add("bvh", lambda: self.write_bvh(self.json_data["bvh"]), list(scene_dependencies)))
 
         # The path to the scene
-        path = directory + "/" + self.name + ".json"
+        path = directory + "/" + self.name + serializer.extension()
 
-        # Write the JSON data to the path
-        with open(path, "w+") as f:
-            try:
-                f.write(self.json())
-            except FileExistsError:
-                pass
+        # Write the JSON data to the path, or merge it into the scene that is already there
+        if patch is True:
+            scheduler.add("scene", lambda: self.patch_file(path), scene_dependencies)
+        else:
+            scheduler.add("scene", lambda: serializer.write(self.to_dict(), path), scene_dependencies)
+
+        # Pack the scene into a bundle
+        if bundle is True:
+            return scheduler.add("bundle", lambda: Bundle.pack(directory, path, directory + "/" + self.name + ".gxpk"), [ "scene" ])
+
+        return "scene"
+
+    # Merges the scene into the scene file at a path
+    def patch_file(self, path: str):
+
+        """
+            Patches the entities, cameras and lights of the scene into the scene file at path.
+            Entities are matched by path, and cameras and lights by name. Everything else in the
+            file is left alone. If there is no file, the scene is written as is
+        """
+
+        # Read the scene that is already there
+        try:
+            existing = serializer.load(path)
+        except FileNotFoundError:
+            serializer.write(self.to_dict(), path)
+            return
+
+        # Append new entities. Entities that are already there were overwritten in place
+        existing.setdefault("entities", [])
+
+        for entity_path in self.json_data["entities"]:
+            if entity_path not in existing["entities"]:
+                existing["entities"].append(entity_path)
+
+        # Replace cameras and lights with the same name, and append the rest
+        for key in ( "cameras", "lights" ):
+            existing.setdefault(key, [])
+
+            indices = { o.get("name"): i for i, o in enumerate(existing[key]) }
+
+            for o in self.json_data[key]:
+                i = indices.get(o["name"])
+
+                if i is None:
+                    existing[key].append(o)
+                else:
+                    existing[key][i] = o
+
+        serializer.write(existing, path)
+
+        return
+
+    # Builds and writes a BVH over the entities
+    def write_bvh(self, path: str):
+
+        with ExportSession.get().profiler.phase("bvh", "bvh"):
+            BVH(self.entity_bounds).write(path)
+
+        return
+
+    # Constructs and schedules one entity of a streaming scene
+    def stream_entity(self, scheduler: Scheduler, directory: str, object: bpy.types.Object):
+
+        # Construct the entity
+        with ExportSession.get().profiler.phase("scene walk", "scene:" + self.name):
+            entity = Entity(object, self.transform_table)
+
+        # Write the entity and all its data before it is freed
+        entity_node = entity.schedule(scheduler, directory)
+
+        scheduler.add_dependency("entity streamed:" + object.name, entity_node)
+
+        # Write the entity path into the entities array
+        self.json_data["entities"].append(entity.path)
+        self.entity_bounds.append(entity.bounds)
+        self.map_batch(entity)
+
+        # Bucket the entity into a cell once it is written. Entities are chained, so they stay in order
+        if self.partition is not None:
+            scheduler.add_dependency("entity streamed:" + object.name, scheduler.add("cell entry:" + entity.name, lambda: self.partition.add(entity), [ entity_node ]))
+
+        return
+
+    # Maps each object merged into a static batch to the path of the batch
+    def map_batch(self, entity: Entity):
+
+        if entity.batched is not None:
+            batches = self.json_data.setdefault("batches", { })
+
+            for name in entity.batched:
+                batches[name] = entity.path
+
+        return
+
+    # Frees one entity of a streaming scene
+    def free_entity(self, name: str):
+
+        # Drop the part from the cache, so it is freed with the entity
+        ExportSession.get().parts.pop(name, None)
+
+        # Free written assets if the caches are over the memory cap
+        ExportSession.get().evict()
 
         return
 
@@ -1633,12 +5251,13 @@ class Bone:
     children    : list = None
 
     # Constructor
-    def __init__(self, bone: bpy.types.Bone, bone_names_and_indexes):
+    def __init__(self, bone: bpy.types.PoseBone, bone_names_and_indexes):
         
+        # Armature space, turned to the exported axes like the vertices of the skinned part
         self.name        = bone.name
-        self.bone_matrix = bone.matrix
-        self.bone_head   = [ bone.head[0], bone.head[1], bone.head[2] ]
-        self.bone_tail   = [ bone.tail[0], bone.tail[1], bone.tail[2] ]
+        self.bone_matrix = Orientation.matrices(numpy.array(bone.matrix, dtype=numpy.float64)).tolist()
+        self.bone_head   = Orientation.vector(bone.head)
+        self.bone_tail   = Orientation.vector(bone.tail)
 
         self.json_data = {}
         self.json_data['name']  = self.name
@@ -1652,24 +5271,25 @@ class Bone:
             self.json_data['children'] = [  ]
             for b_i, b in enumerate(bone.children):
                 self.children.append(Bone(b, bone_names_and_indexes))
-                self.json_data['children'].append(json.loads(self.children[b_i].json()))
+                self.json_data['children'].append(self.children[b_i].to_dict())
 
         return
 
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        return self.json_data
+
     # Returns file JSON
     def json(self):
 
-        return json.dumps(self.json_data, indent=4)
+        return json.dumps(self.to_dict(), indent=4)
 
     # Writes JSON to a specified file
     def write_to_file(self, path: str):
         
         # Write the JSON data to the specified path
-        with open(path, "w+") as f:
-            try:
-                f.write(self.json())
-            except FileExistsError:
-                pass
+        serializer.write(self.to_dict(), path)
 
         return
 
@@ -1703,23 +5323,24 @@ class Pose:
 
         return
 
-    # Returns file JSON
-    def json(self):
+    # Returns the document as a dictionary
+    def to_dict(self):
         self.json_data          = {}
         self.json_data['name']  = self.name
         self.json_data['delta'] = self.delta
+
+        return self.json_data
+
+    # Returns file JSON
+    def json(self):
         
-        return json.dumps(self.json_data, indent=4)
+        return json.dumps(self.to_dict(), indent=4)
 
     # Writes JSON to a specified file
     def write_to_file(self, path: str):
         
         # Write the JSON data to the specified path
-        with open(path, "w+") as f:
-            try:
-                f.write(self.json())
-            except FileExistsError:
-                pass
+        serializer.write(self.to_dict(), path)
 
         return
 
@@ -1762,27 +5383,27 @@ class Action:
 
         return
 
-    # Returns file JSON
-    def json(self):
+    # Returns the document as a dictionary
+    def to_dict(self):
 
-        
         self.json_data['name']          = self.name
-
+        self.json_data['pose sequence'] = []
 
         for p_i in self.pose_sequence:
-            self.json_data['pose sequence'].append(json.loads(p_i.json()))
+            self.json_data['pose sequence'].append(p_i.to_dict())
+
+        return self.json_data
 
-        return json.dumps(self.json_data, indent=4)
+    # Returns file JSON
+    def json(self):
+
+        return json.dumps(self.to_dict(), indent=4)
 
     # Writes JSON to a specified file
     def write_to_file(self, path: str):
         
         # Write the JSON data to the specified path
-        with open(path, "w+") as f:
-            try:
-                f.write(self.json())
-            except FileExistsError:
-                pass
+        serializer.write(self.to_dict(), path)
 
         return
 
@@ -1807,6 +5428,7 @@ class Rig:
         if isinstance(object.data, bpy.types.Armature) == False:
             return
 
+        start          = timer()
         context_action = object.animation_data.action
 
         # Construct a dictionary
@@ -1822,7 +5444,7 @@ class Rig:
             b = b.parent[0]
 
         # Make sure there is a valid part first
-        bone_names_and_indexes = parts[object.children[0].name].get_bone_names_and_indexes(object.children[0])
+        bone_names_and_indexes = ExportSession.get().parts[object.children[0].name].get_bone_names_and_indexes(object.children[0])
 
         self.actions = []
 
@@ -1848,8 +5470,8 @@ class Rig:
                 
                 
                 z['name'] = pose.name
-                z['bones'] = json.loads(Bone(object.pose.bones[0], bone_names_and_indexes).json())
-                action.json_data['poses'].append(json.loads(json.dumps(z)))
+                z['bones'] = Bone(object.pose.bones[0], bone_names_and_indexes).to_dict()
+                action.json_data['poses'].append(z)
 
                 z = None
 
@@ -1864,30 +5486,33 @@ class Rig:
         self.json_data['actions']          = []
 
         for a in self.actions:
-            self.json_data['actions'].append(json.loads(a.json()))
+            self.json_data['actions'].append(a.to_dict())
 
-        self.json_data['bones']            = json.loads(self.bone.json())
+        self.json_data['bones']            = self.bone.to_dict()
 
 
 
         object.animation_data.action = context_action
 
+        ExportSession.get().profiler.add_time("rig", timer() - start, "rig:" + self.name)
+
         return
 
+    # Returns the document as a dictionary
+    def to_dict(self):
+
+        return self.json_data
+
     # Returns file JSON
     def json(self):
 
-        return json.dumps(self.json_data, indent=4)
+        return json.dumps(self.to_dict(), indent=4)
 
     # Writes JSON to a specified file
     def write_to_file(self, path: str):
         
         # Write the JSON data to the specified path
-        with open(path, "w+") as f:
-            try:
-                f.write(self.json())
-            except FileExistsError:
-                pass
+        serializer.write(self.to_dict(), path)
 
         return
 
@@ -1939,6 +5564,44 @@ class gxport(Operator, ExportHelper):
         ("Custom"      , "Custom"          , "Custom")
     }
 
+    DOCUMENT_ENCODINGS = (
+        ('PRETTY' , "Pretty JSON" , "Indented JSON text"),
+        ('COMPACT', "Compact JSON", "JSON text without whitespace"),
+        ('BINARY' , "Binary"      , "Length prefixed binary encoding of the same documents"),
+    )
+
+    PARTITIONS = (
+        ('NONE'  , "None"  , "Only write the flat entities array"),
+        ('GRID'  , "Grid"  , "Bucket entities into a uniform grid of cells"),
+        ('OCTREE', "Octree", "Bucket entities into an octree, splitting cells with too many entities"),
+    )
+
+    POSITION_ENCODINGS = (
+        ('FLOAT'  , "Float"  , "32 bit floats"),
+        ('UNORM16', "16 bit" , "16 bit normalized integers, relative to the part bounds"),
+    )
+
+    UV_ENCODINGS = (
+        ('FLOAT'  , "Float"  , "32 bit floats"),
+        ('HALF'   , "Half"   , "16 bit floats"),
+        ('UNORM16', "16 bit" , "16 bit normalized integers, relative to the part UV bounds"),
+    )
+
+    DIRECTION_ENCODINGS = (
+        ('FLOAT'     , "Float"     , "Three 32 bit floats"),
+        ('OCTAHEDRAL', "Octahedral", "Two 16 bit signed normalized integers, on an octahedron"),
+    )
+
+    INDEX_ENCODINGS = (
+        ('LIST'     , "Face list"    , "A vertex count and three 32 bit indices per face"),
+        ('TRIANGLES', "Triangle list", "One block of 16 bit indices, or 32 bit if a part has 65536 or more vertices"),
+    )
+
+    WEIGHT_ENCODINGS = (
+        ('FLOAT' , "Float" , "32 bit floats"),
+        ('UNORM8', "8 bit" , "8 bit normalized integers, adding up to 255"),
+    )
+
     IMAGE_FORMATS = {
         ("PNG", "PNG", "PNG"),
         ("JPG", "JPG", "JPG"),
@@ -1974,6 +5637,146 @@ class gxport(Operator, ExportHelper):
         description = "Append selected objects to scene directory and scene file",
         default     = True,
     )
+
+    use_background: BoolProperty(
+        name        = "Export in background",
+        description = "Save a copy of the file, and export it in a background Blender. Blender stays usable, and the background Blender simplifies, encodes and builds hulls on a process per core",
+        default     = False,
+    )
+
+    progress_path: StringProperty(
+        name        = "Progress file",
+        description = "File the export writes its progress to",
+        default     = "",
+        options     = {'HIDDEN', 'SKIP_SAVE'},
+    )
+
+    use_modal: BoolProperty(
+        name        = "Keep working while exporting",
+        description = "Export a little at a time, so Blender stays usable. Entities are streamed. Press Esc to cancel and remove everything written so far",
+        default     = False,
+    )
+
+    use_streaming: BoolProperty(
+        name        = "Stream entities",
+        description = "Construct, write and free one entity at a time. Slower to start, but uses far less memory on large scenes",
+        default     = False,
+    )
+
+    memory_cap: IntProperty(
+        name        = "Memory cap (MB)",
+        description = "Free assets that have already been written once the export caches exceed this many megabytes. 0 is unlimited",
+        default     = 0,
+        min         = 0,
+    )
+
+    memory_budget: IntProperty(
+        name        = "Memory budget (MB)",
+        description = "Bounded memory mode. Entities are streamed, everything written is freed straight away, and work runs one node at a time while Blender uses more than this many megabytes. 0 is off",
+        default     = 0,
+        min         = 0,
+    )
+
+    export_workers: IntProperty(
+        name        = "Workers",
+        description = "Threads used to encode and write files. 0 uses one per core",
+        default     = 0,
+        min         = 0,
+    )
+
+    use_report: BoolProperty(
+        name        = "Performance report",
+        description = "Write the time spent in each phase, and per asset timings, sizes and vertex counts, to gxport-report.json in the export directory",
+        default     = False,
+    )
+
+    use_tracemalloc: BoolProperty(
+        name        = "Trace Python memory",
+        description = "Also record the peak memory allocated by Python in each phase of the performance report, with tracemalloc. Slows the export down",
+        default     = False,
+    )
+
+    use_cprofile: BoolProperty(
+        name        = "Profile with cProfile",
+        description = "Also write cProfile stats of the export to gxport-profile.prof in the export directory. Slows the export down",
+        default     = False,
+    )
+
+    use_bvh: BoolProperty(
+        name        = "BVH",
+        description = "Write a bounding volume hierarchy over the world space bounds of every entity, for culling without loading geometry",
+        default     = False,
+    )
+
+    partition: EnumProperty(
+        name        = "Cells",
+        default     = "NONE",
+        items       = PARTITIONS,
+        description = "Also bucket entities into streamable cells by their world space bounds, with an index of cell bounds and dependencies"
+    )
+
+    cell_size: FloatProperty(
+        name        = "Cell size",
+        description = "Edge length of a grid cell",
+        default     = 32.0,
+        min         = 0.001,
+        subtype     = 'DISTANCE',
+    )
+
+    cell_capacity: IntProperty(
+        name        = "Cell capacity",
+        description = "Entities in an octree cell before it is split",
+        default     = 64,
+        min         = 1,
+    )
+
+    use_instances: BoolProperty(
+        name        = "Instances",
+        description = "Write collection and geometry nodes instances of mesh objects as a part and an array of instance transforms for each object",
+        default     = False,
+    )
+
+    use_static_batching: BoolProperty(
+        name        = "Static batching",
+        description = "Merge objects without a rigidbody, or with a passive mesh rigidbody, that share a material and a cell into one entity with their transforms baked in",
+        default     = False,
+    )
+
+    batch_cell_size: FloatProperty(
+        name        = "Batch cell size",
+        description = "Edge length of the grid cells objects are batched in",
+        default     = 32.0,
+        min         = 0.001,
+        subtype     = 'DISTANCE',
+    )
+
+    batch_vertex_limit: IntProperty(
+        name        = "Batch vertex limit",
+        description = "Vertices in a batch before another one is started. 65535 keeps indices 16 bit",
+        default     = 65535,
+        min         = 3,
+    )
+
+    hull_vertex_limit: IntProperty(
+        name        = "Hull vertex limit",
+        description = "Most vertices a convex hull collider is simplified to",
+        default     = 64,
+        min         = 4,
+        max         = 255,
+    )
+
+    use_bundle: BoolProperty(
+        name        = "Bundle",
+        description = "Also pack the exported scene into a single file with an index",
+        default     = False,
+    )
+
+    document_encoding: EnumProperty(
+        name        = "Encoding",
+        default     = "PRETTY",
+        items       = DOCUMENT_ENCODINGS,
+        description = "How scene, entity, material, part and rig documents are encoded"
+    )
     
     # All the exporter tab properties
     context_tab: EnumProperty(
@@ -2109,6 +5912,79 @@ class gxport(Operator, ExportHelper):
         description = "Bone weights",
         default     = False
     )
+
+    # Vertex encoding properties
+    position_encoding: EnumProperty(
+        name        = "Positions",
+        description = "How vertex positions are written",
+        items       = POSITION_ENCODINGS,
+        default     = 'FLOAT'
+    )
+
+    uv_encoding: EnumProperty(
+        name        = "UVs",
+        description = "How texture coordinates are written",
+        items       = UV_ENCODINGS,
+        default     = 'FLOAT'
+    )
+
+    normal_encoding: EnumProperty(
+        name        = "Directions",
+        description = "How normals, tangents and bitangents are written",
+        items       = DIRECTION_ENCODINGS,
+        default     = 'FLOAT'
+    )
+
+    weight_encoding: EnumProperty(
+        name        = "Weights",
+        description = "How bone weights are written",
+        items       = WEIGHT_ENCODINGS,
+        default     = 'FLOAT'
+    )
+
+    # Index buffer properties
+    index_encoding: EnumProperty(
+        name        = "Indices",
+        description = "How faces are written",
+        items       = INDEX_ENCODINGS,
+        default     = 'LIST'
+    )
+
+    optimize_vertex_cache: BoolProperty(
+        name        = "Optimize vertex cache",
+        description = "Reorder triangles so the GPU transforms fewer vertices, and vertices so they are fetched in order. The ACMR before and after is in the performance report",
+        default     = False
+    )
+
+    optimize_overdraw: BoolProperty(
+        name        = "Optimize overdraw",
+        description = "Also sort clusters of triangles so outward facing ones are drawn first, which shades fewer hidden pixels",
+        default     = False
+    )
+
+    # Level of detail properties
+    lod_count: IntProperty(
+        name        = "Levels of detail",
+        description = "Simplified meshes to write for each part, with quadric edge collapse. UV and normal seams are kept. 0 writes none",
+        default     = 0,
+        min         = 0,
+        max         = 8
+    )
+
+    lod_ratio: FloatProperty(
+        name        = "Ratio",
+        description = "Fraction of the triangles of the previous level of detail to keep",
+        default     = 0.5,
+        min         = 0.01,
+        max         = 0.99
+    )
+
+    lod_pixel_error: FloatProperty(
+        name        = "Pixel error",
+        description = "Switch to a level of detail once its error covers fewer than this many pixels, at 1080p with a 60 degree field of view",
+        default     = 1.0,
+        min         = 0.01
+    )
     
     # Texture export resolution property
     texture_resolution: IntProperty(
@@ -2149,6 +6025,23 @@ class gxport(Operator, ExportHelper):
         # General state
         state['relative paths']         = self.relative_paths
         state['comment']                = self.comment
+        state['document encoding']      = self.document_encoding
+        state['bundle']                 = self.use_bundle
+        state['streaming']              = self.use_streaming
+        state['memory cap']             = self.memory_cap * 1024 * 1024
+        state['workers']                = self.export_workers
+        state['progress path']          = self.progress_path if self.progress_path != "" else None
+        state['memory budget']          = self.memory_budget * 1024 * 1024
+        state['report']                 = self.use_report or self.use_cprofile or self.use_tracemalloc
+        state['cprofile']               = self.use_cprofile
+        state['partition']              = self.make_partition()
+        state['bvh']                    = self.use_bvh
+        state['instances']              = self.use_instances
+        state['static batching']        = self.use_static_batching
+        state['batch cell size']        = self.batch_cell_size
+        state['batch vertex limit']     = self.batch_vertex_limit
+        state['hull vertex limit']      = self.hull_vertex_limit
+        state['tracemalloc']            = self.use_tracemalloc
 
         # Global orientation
         state['forward axis']           = self.forward_axis
@@ -2182,30 +6075,256 @@ class gxport(Operator, ExportHelper):
         state['image format']           = self.image_format
         state['light probe resolution'] = self.light_probe_dim
 
-        # What mode?
-        if self.append_selected is False:
-            
-            # Create a scene object
-            scene = Scene(bpy.context.scene)
-            
-            # Write it to the directory
-            scene.write_to_directory(self.filepath)
-            
-        else:
-            print("TODO:")
+        # Vertex encoding settings
+        state['position encoding']      = self.position_encoding
+        state['uv encoding']            = self.uv_encoding
+        state['normal encoding']        = self.normal_encoding
+        state['weight encoding']        = self.weight_encoding
+
+        # Index buffer settings
+        state['index encoding']         = self.index_encoding
+        state['optimize vertex cache']  = self.optimize_vertex_cache
+        state['optimize overdraw']      = self.optimize_vertex_cache and self.optimize_overdraw
+
+        # Level of detail settings
+        state['lod ratios']             = tuple(self.lod_ratio ** (i + 1) for i in range(self.lod_count))
+        state['lod pixel error']        = self.lod_pixel_error
+
+        # Check the exported axes. The session applies them, with the other settings
+        try:
+            Orientation.check(state['forward axis'], state['up axis'])
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        # Export in another Blender
+        if self.use_background is True:
+            return self.start_background(context)
+
+        # Export a slice at a time, from a timer
+        if self.use_modal is True:
+            return self.start_modal(context, state)
+
+        # The session owns every cache, and frees them when the export is done
+        with ExportSession(memory_cap=state['memory cap'], profiler=self.make_profiler(state), memory_budget=state['memory budget'], settings=self.make_settings(state)) as session:
+
+            session.profiler.enable()
+
+            try:
+
+                # Create a scene object, from only the selected objects when appending. Bounded memory mode always streams
+                scene = Scene(bpy.context.scene, streaming=state['streaming'] or state['memory budget'] > 0, selected_only=self.append_selected, static_batching=state['static batching'], batch_cell_size=state['batch cell size'], batch_vertex_limit=state['batch vertex limit'], instances=state['instances'])
+                
+                # Write it to the directory. When appending, patch the scene file that is already there
+                scene.write_to_directory(self.filepath, bundle=state['bundle'], workers=state['workers'], patch=self.append_selected, progress_path=state['progress path'], memory_budget=state['memory budget'], partition=state['partition'], bvh=state['bvh'])
+
+                # Destruct the scene
+                del scene
+            finally:
+                session.profiler.disable()
+
+            # Write the performance report
+            if state['report'] is True:
+                session.profiler.write(self.filepath)
 
-        
-        
         # Stop the timer
         end = timer()
         seconds = end-start
 
         # Write the time
-        print( "[G10] [Export] Export Finished in " + str(int(seconds/3600)) + "h " + str(int(seconds/60)) + "m " + str(int(seconds%60)) + "s ")
+        print( "[G10] [Export] Export Finished in " + str(int(seconds // 3600)) + "h " + str(int(seconds % 3600 // 60)) + "m " + str(int(seconds % 60)) + "s ")
 
         return {'FINISHED'}
         return {'CANCELLED'}
 
+    # Makes the partition for an export, or None
+    def make_partition(self) -> Partition:
+
+        if self.partition == 'NONE':
+            return None
+
+        return Partition(self.partition, cell_size=self.cell_size, capacity=self.cell_capacity)
+
+    # Makes the profiler for an export
+    @staticmethod
+    def make_profiler(state: dict) -> Profiler:
+
+        # Memory is only sampled for the report. The budget is checked by the scheduler
+        return Profiler(cprofile=state['cprofile'], memory=state['report'], trace=state['tracemalloc'])
+
+    # Makes the settings of an export. The session applies them while it is entered
+    @staticmethod
+    def make_settings(state: dict) -> dict:
+
+        names = list(ExportSession.setting_attributes().keys()) + [ 'forward axis', 'up axis' ]
+
+        # Settings the operator has no property for, like bone groups and weights, keep their defaults
+        return { name: state[name] for name in names if name in state }
+
+    # Properties that are not passed to a background export
+    BACKGROUND_SKIP = ( "filter_glob", "filepath", "context_tab", "scene_objects", "use_background", "use_modal", "progress_path" )
+
+    # Starts an export in a background Blender
+    def start_background(self, context):
+
+        # Pass every export option through
+        options = { }
+
+        for name in self.__annotations__.keys():
+            if name not in self.BACKGROUND_SKIP:
+                options[name] = getattr(self, name)
+
+        # Start the export
+        try:
+            job = BackgroundExport(self.filepath, options)
+        except Exception as e:
+            self.report({'ERROR'}, "[gxport] Could not start background export: " + str(e))
+            return {'CANCELLED'}
+
+        background_exports.append(job)
+
+        # Poll the export until it finishes
+        if bpy.app.timers.is_registered(poll_background_exports) == False:
+            bpy.app.timers.register(poll_background_exports, first_interval=BackgroundExport.POLL_INTERVAL)
+
+        self.report({'INFO'}, "[gxport] Exporting \"" + job.name + "\" in the background")
+
+        return {'FINISHED'}
+
+    # Longest time spent exporting per timer event, in seconds
+    MODAL_SLICE     = 0.02
+
+    # Modal export state. Not properties, so they are not annotated
+    modal_start     = None
+    modal_session   = None
+    modal_scene     = None
+    modal_scheduler = None
+    modal_timer     = None
+    modal_report    = False
+
+    # Starts a time sliced export
+    def start_modal(self, context, state: dict):
+
+        self.modal_start   = timer()
+        self.modal_report  = state['report']
+
+        # Journal every file, so a cancelled export can be rolled back
+        self.modal_session = ExportSession(memory_cap=state['memory cap'], journaling=True, profiler=self.make_profiler(state), memory_budget=state['memory budget'], settings=self.make_settings(state))
+        self.modal_session.__enter__()
+
+        try:
+
+            # Stream entities, so they are constructed in slices too
+            self.modal_scene     = Scene(bpy.context.scene, streaming=True, selected_only=self.append_selected, static_batching=state['static batching'], batch_cell_size=state['batch cell size'], batch_vertex_limit=state['batch vertex limit'], instances=state['instances'])
+            self.modal_scheduler = Scheduler(state['workers'])
+            self.modal_scheduler.memory_budget = state['memory budget']
+
+            Scene.make_directories(self.filepath)
+            self.modal_scene.schedule(self.modal_scheduler, self.filepath, bundle=state['bundle'], patch=self.append_selected, partition=state['partition'], bvh=state['bvh'])
+        except Exception:
+            self.stop_modal(context, False)
+            raise
+
+        # Run a slice on every timer event
+        window_manager   = context.window_manager
+        self.modal_timer = window_manager.event_timer_add(0.01, window=context.window)
+
+        window_manager.modal_handler_add(self)
+        window_manager.progress_begin(0, 100)
+
+        return {'RUNNING_MODAL'}
+
+    # Runs a slice of the export
+    def modal(self, context, event):
+
+        # Cancel
+        if event.type == 'ESC':
+            self.stop_modal(context, False)
+            self.report({'WARNING'}, "[gxport] Export cancelled")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        scheduler = self.modal_scheduler
+        deadline  = timer() + self.MODAL_SLICE
+        done      = False
+
+        self.modal_session.profiler.enable()
+
+        try:
+
+            # Run main thread nodes until the slice is used up. Workers keep going in between
+            while done is False and timer() < deadline:
+                done = scheduler.step(timeout=0)
+
+                if not any(node.main_thread for node in scheduler.ready):
+                    break
+        except Exception as e:
+            self.modal_session.profiler.disable()
+            self.stop_modal(context, False)
+            self.report({'ERROR'}, "[gxport] Export failed: " + str(e))
+            return {'CANCELLED'}
+
+        self.modal_session.profiler.disable()
+
+        # Update the progress
+        context.window_manager.progress_update(int(100 * scheduler.finished / max(len(scheduler.nodes), 1)))
+
+        if done is True:
+            scheduler.report()
+
+            # Write the performance report
+            if self.modal_report is True:
+                self.modal_session.profiler.write(self.filepath)
+
+            self.stop_modal(context, True)
+
+            print("[G10] [Export] Export Finished in " + "%.2f" % (timer() - self.modal_start) + "s")
+
+            return {'FINISHED'}
+
+        return {'PASS_THROUGH'}
+
+    # Called by Blender if the operator is cancelled
+    def cancel(self, context):
+
+        self.stop_modal(context, False)
+
+        return
+
+    # Ends a time sliced export
+    def stop_modal(self, context, keep: bool):
+
+        '''
+            Stops the timer and waits for the workers. If keep is False, everything written 
+            is rolled back
+        '''
+
+        if self.modal_timer is not None:
+            context.window_manager.event_timer_remove(self.modal_timer)
+            context.window_manager.progress_end()
+            self.modal_timer = None
+
+        # Wait for nodes that are still running
+        if self.modal_scheduler is not None:
+            self.modal_scheduler.close()
+            self.modal_scheduler = None
+
+        # Keep or undo the files
+        if self.modal_session is not None:
+            if keep is True:
+                self.modal_session.commit()
+            else:
+                self.modal_session.rollback()
+
+            self.modal_scene = None
+
+            self.modal_session.__exit__(None, None, None)
+            self.modal_session = None
+
+        return
+
     # Draw general configuration tab
     
     # Draw export config box
@@ -2219,6 +6338,31 @@ class gxport(Operator, ExportHelper):
         row.active = bpy.data.is_saved
         box.prop(self, "relative_paths")
         box.prop(self, "append_selected")
+        box.prop(self, "use_modal")
+        box.prop(self, "use_background")
+        box.prop(self, "document_encoding")
+        box.prop(self, "use_bundle")
+        box.prop(self, "use_bvh")
+        box.prop(self, "partition")
+
+        if self.partition == 'GRID':
+            box.prop(self, "cell_size")
+        elif self.partition == 'OCTREE':
+            box.prop(self, "cell_capacity")
+        box.prop(self, "use_instances")
+        box.prop(self, "use_static_batching")
+
+        if self.use_static_batching:
+            box.prop(self, "batch_cell_size")
+            box.prop(self, "batch_vertex_limit")
+        box.prop(self, "hull_vertex_limit")
+        box.prop(self, "use_streaming")
+        box.prop(self, "memory_cap")
+        box.prop(self, "memory_budget")
+        box.prop(self, "export_workers")
+        box.prop(self, "use_report")
+        box.prop(self, "use_tracemalloc")
+        box.prop(self, "use_cprofile")
         box.prop(self, "comment" )
         return
 
@@ -2393,6 +6537,35 @@ class gxport(Operator, ExportHelper):
 
         box.prop(self,"use_bone_weights")    
 
+        box = layout.box()
+        box.label(text='Vertex encoding', icon='MOD_DATA_TRANSFER')
+
+        box.prop(self,"position_encoding")
+        box.prop(self,"uv_encoding")
+        box.prop(self,"normal_encoding")
+        box.prop(self,"weight_encoding")
+
+        box = layout.box()
+        box.label(text='Index buffer', icon='MOD_TRIANGULATE')
+
+        box.prop(self,"index_encoding")
+
+        box.prop(self,"optimize_vertex_cache")
+
+        row = box.row()
+        row.active = self.optimize_vertex_cache
+        row.prop(self,"optimize_overdraw")
+
+        box = layout.box()
+        box.label(text='Levels of detail', icon='MOD_DECIM')
+
+        box.prop(self,"lod_count")
+
+        col = box.column()
+        col.active = self.lod_count > 0
+        col.prop(self,"lod_ratio")
+        col.prop(self,"lod_pixel_error")
+
         return
     
     def draw_rig_settings(self, context):
@@ -2464,14 +6637,229 @@ class gxport(Operator, ExportHelper):
 
         return 
         
+class BackgroundExport:
+
+    '''
+        gxport.BackgroundExport
+    '''
+
+    # Seconds between polls of running exports
+    POLL_INTERVAL: float = 0.5
+
+    # Finished exports kept in the panel
+    MAX_FINISHED : int   = 8
+
+    name         : str              = None
+    output       : str              = None
+    directory    : str              = None
+    progress_path: str              = None
+    report_path  : str              = None
+    log_path     : str              = None
+    process      : subprocess.Popen = None
+    start        : float            = None
+    seconds      : float            = None
+    progress     : float            = 0.0
+    status       : str              = None
+
+    # Constructor
+    def __init__(self, output: str, options: dict):
+
+        '''
+            Saves a copy of the open file, and starts a background Blender that exports it to output.
+            The background Blender runs cli.py as a worker, which only imports bpy when it runs,
+            so the export session there spawns its process pool like an interactive export
+        '''
+
+        self.name          = bpy.path.basename(bpy.data.filepath) or "untitled.blend"
+        self.output        = output
+        self.directory     = tempfile.mkdtemp(prefix="gxport-")
+        self.progress_path = os.path.join(self.directory, "progress.json")
+        self.report_path   = os.path.join(self.directory, "report.json")
+        self.log_path      = os.path.join(self.directory, "export.log")
+        self.status        = "RUNNING"
+        self.start         = timer()
+
+        # Snapshot the file. Relative paths are remapped to the copy
+        blend_path         = os.path.join(self.directory, "snapshot.blend")
+
+        bpy.ops.wm.save_as_mainfile(filepath=blend_path, copy=True, check_existing=False, relative_remap=True)
+
+        command = [
+            bpy.app.binary_path, "-b", blend_path,
+            "--python-exit-code", "1",
+            "--python", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py"),
+            "--",
+            "--worker-output"  , output,
+            "--worker-report"  , self.report_path,
+            "--worker-progress", self.progress_path,
+            "--worker-options" , json.dumps(options)
+        ]
+
+        # Run below the priority of this Blender, so the interface stays responsive
+        lower_priority = (lambda: os.nice(5)) if hasattr(os, "nice") else None
+
+        with open(self.log_path, "w") as log:
+            self.process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, preexec_fn=lower_priority)
+
+        return
+
+    # Reads the progress of the export
+    def poll(self) -> bool:
+
+        '''
+            Updates the progress and the status. Returns True once the export has finished
+        '''
+
+        if self.status != "RUNNING":
+            return True
+
+        # Read the progress
+        try:
+            with open(self.progress_path, "r") as f:
+                progress      = json.load(f)
+                self.progress = progress["finished"] / max(progress["total"], 1)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        # Still running?
+        if self.process.poll() is None:
+            return False
+
+        self.seconds = timer() - self.start
+
+        try:
+            with open(self.report_path, "r") as f:
+                self.status = json.load(f)["status"] if self.process.returncode == 0 else "FAILED"
+        except (OSError, ValueError, KeyError):
+            self.status = "FAILED"
+
+        # Keep the log of failed exports
+        if self.status == "FAILED":
+            try   : shutil.copyfile(self.log_path, os.path.join(self.output, "gxport-export.log"))
+            except: pass
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+        return True
+
+    # Stops the export
+    def terminate(self):
+
+        if self.status == "RUNNING":
+            self.process.terminate()
+            self.process.wait()
+            self.status = "CANCELLED"
+
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+        return
+
+# Background exports started in this session
+background_exports: list = []
+
+# Timer that polls background exports
+def poll_background_exports():
+
+    running: int = 0
+
+    for job in background_exports:
+        if job.status != "RUNNING":
+            continue
+
+        # Still running
+        if job.poll() is False:
+            running = running + 1
+
+        # Notify when an export finishes
+        elif job.status == "FINISHED":
+            notify("Exported \"" + job.name + "\" in " + "%.1f" % job.seconds + "s", 'INFO')
+        else:
+            notify("Export of \"" + job.name + "\" " + job.status.lower() + ". See gxport-export.log in " + job.output, 'ERROR')
+
+    # Forget old finished exports
+    finished = [ job for job in background_exports if job.status != "RUNNING" ]
+
+    for job in finished[:max(len(finished) - BackgroundExport.MAX_FINISHED, 0)]:
+        background_exports.remove(job)
+
+    # Redraw the status panel
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+    # Unregister the timer when nothing is running
+    return BackgroundExport.POLL_INTERVAL if running > 0 else None
+
+# Shows a message to the user
+def notify(text: str, icon: str = 'INFO'):
+
+    print("[gxport] " + text)
+
+    def draw(menu, context):
+        menu.layout.label(text=text)
+
+    try:
+        bpy.context.window_manager.popup_menu(draw, title="gxport", icon=icon)
+    except (RuntimeError, AttributeError):
+        pass
+
+    return
+
+class GXPORT_PT_background_exports(bpy.types.Panel):
+
+    '''
+        Status of background exports
+    '''
+
+    bl_label       = "Background exports"
+    bl_space_type  = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category    = "GXPort"
+
+    @classmethod
+    def poll(cls, context):
+        return bool(background_exports)
+
+    def draw(self, context):
+        layout = self.layout
+
+        for job in background_exports:
+            box = layout.box()
+            row = box.row()
+
+            if job.status == "RUNNING":
+                row.label(text=job.name, icon='EXPORT')
+                row.label(text="%d%%" % int(job.progress * 100))
+            elif job.status == "FINISHED":
+                row.label(text=job.name, icon='CHECKMARK')
+                row.label(text="%.1fs" % job.seconds)
+            else:
+                row.label(text=job.name, icon='ERROR')
+                row.label(text=job.status.capitalize())
+
+            box.label(text=job.output)
+
+        return
+
 def menu_func_export(self, context):
     self.layout.operator(gxport.bl_idname, text="Export G10 Scene (.json)")
 
 def register():
     bpy.utils.register_class(gxport)
+    bpy.utils.register_class(GXPORT_PT_background_exports)
     bpy.types.TOPBAR_MT_file_export.append(menu_func_export)
 
 def unregister():
+
+    # Stop background exports
+    for job in background_exports:
+        job.terminate()
+
+    if bpy.app.timers.is_registered(poll_background_exports):
+        bpy.app.timers.unregister(poll_background_exports)
+
+    bpy.utils.unregister_class(GXPORT_PT_background_exports)
     bpy.utils.unregister_class(gxport)
     bpy.types.TOPBAR_MT_file_export.remove(menu_func_export)
     
@@ -0,0 +1,446 @@
+'''
+    gxport benchmarks
+
+    Generates synthetic scenes, exports them, and compares the timings against a baseline
+
+        blender -b --factory-startup --python benchmarks/benchmark.py -- [options]
+
+    Each case is generated from scratch: meshes of a fixed vertex count, materials with image
+    and constant inputs, linked duplicates, a rigged character and an HDR world. The scene is
+    exported with Scene(...).write_to_directory, with bone groups and unorm8 bone weights, so 
+    the character's skinned mesh measures their extraction and encoding. The wall time, peak
+    RSS and bytes written of each phase are recorded. With --baseline, a metric that grew by more than --tolerance
+    fails the run. Run with --update-baseline to record a new baseline.
+
+    The export's process pool spawns processes that import this script again, without 
+    Blender, so bpy is only imported when the script runs, and annotations are not evaluated.
+'''
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import math
+import shutil
+import argparse
+import tempfile
+import time
+import threading
+import numpy as np
+from timeit import default_timer as timer
+
+# Blender is only there when the script runs, not in the processes the export spawns
+if __name__ == "__main__":
+    import bpy
+
+# Synthetic scenes
+#
+#     meshes     number of meshes
+#     vertices   vertices per mesh
+#     materials  number of materials. Every other material uses images
+#     image size width and height of material images
+#     duplicates linked duplicates of each mesh
+#     bones      bones in the armature of the rigged character
+#     hdr size   width of the world image. The height is half the width
+CASES: dict = {
+    "small" : { "meshes": 16 , "vertices": 1024 , "materials": 4 , "image size": 256 , "duplicates": 1, "bones": 8 , "hdr size": 256  },
+    "medium": { "meshes": 64 , "vertices": 16384, "materials": 16, "image size": 1024, "duplicates": 2, "bones": 32, "hdr size": 1024 },
+    "large" : { "meshes": 256, "vertices": 65536, "materials": 64, "image size": 2048, "duplicates": 4, "bones": 64, "hdr size": 2048 },
+}
+
+# Export settings of every case
+SETTINGS: dict = { "bone groups": True, "bone weights": True, "weight encoding": "UNORM8" }
+
+# Benchmark stages, outside of the exporter
+STAGES: tuple = ( "generate", "construct", "write" )
+
+# Timings under this many seconds are too noisy to compare against a baseline
+MIN_SECONDS: float = 0.05
+
+# Samples the resident set size of the process on a thread
+class MemorySampler:
+
+    '''
+        Records the peak RSS between start and stop, sampled every interval seconds
+    '''
+
+    rss     : object           = None
+    interval: float            = 0.005
+    peak    : int              = 0
+    running : bool             = False
+    thread  : threading.Thread = None
+
+    def __init__(self, rss, interval: float = 0.005):
+
+        self.rss      = rss
+        self.interval = interval
+
+        return
+
+    def sample(self):
+
+        while self.running is True:
+            self.peak = max(self.peak, self.rss())
+            time.sleep(self.interval)
+
+        return
+
+    def start(self):
+
+        self.peak    = self.rss()
+        self.running = True
+        self.thread  = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+
+        return
+
+    def stop(self) -> int:
+
+        self.running = False
+        self.thread.join()
+
+        self.peak    = max(self.peak, self.rss())
+
+        return self.peak
+
+# Imports the add-on, using the command line interface next to it
+def load_addon():
+
+    package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    if package_directory not in sys.path:
+        sys.path.insert(0, package_directory)
+
+    import cli
+
+    return cli.load_addon()
+
+# Removes everything a previous case made
+def clear_data():
+
+    ids = [ ]
+
+    for collection in ( bpy.data.objects, bpy.data.meshes, bpy.data.materials, bpy.data.images, bpy.data.armatures, bpy.data.worlds, bpy.data.actions ):
+        ids.extend(collection)
+
+    bpy.data.batch_remove(ids)
+
+    return
+
+# Makes a grid mesh with about vertex_count vertices and a UV map
+def make_grid(name: str, vertex_count: int, height: float = 0.0) -> bpy.types.Mesh:
+
+    side  = max(2, int(math.sqrt(vertex_count)))
+    mesh  = bpy.data.meshes.new(name)
+
+    # Vertices on a wavy grid, so the normals differ
+    u, v  = np.meshgrid(np.linspace(0.0, 1.0, side), np.linspace(0.0, 1.0, side))
+    z     = 0.05 * np.sin(u * 17.0) * np.cos(v * 13.0) + v * height
+    co    = np.stack(( u.ravel(), v.ravel() * (1.0 if height == 0.0 else 0.1), z.ravel() ), axis=1)
+
+    # Quads, as vertex indices
+    i     = np.arange(side - 1)
+    i, j  = np.meshgrid(i, i)
+    first = (j * side + i).ravel()
+    quads = np.stack(( first, first + 1, first + side + 1, first + side ), axis=1)
+
+    mesh.vertices.add(len(co))
+    mesh.vertices.foreach_set("co", co.astype(np.float32).ravel())
+
+    mesh.loops.add(quads.size)
+    mesh.loops.foreach_set("vertex_index", quads.astype(np.int32).ravel())
+
+    mesh.polygons.add(len(quads))
+    mesh.polygons.foreach_set("loop_start", (np.arange(len(quads)) * 4).astype(np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(len(quads), 4, dtype=np.int32))
+
+    mesh.update(calc_edges=True)
+
+    # Planar UVs
+    uv_layer = mesh.uv_layers.new(name="UVMap")
+    uv_layer.data.foreach_set("uv", co[quads.ravel(), :2].astype(np.float32).ravel())
+
+    return mesh
+
+# Makes an image filled with a pattern
+def make_image(name: str, width: int, height: int, hdr: bool = False) -> bpy.types.Image:
+
+    image  = bpy.data.images.new(name, width, height, float_buffer=hdr)
+
+    u, v   = np.meshgrid(np.linspace(0.0, 1.0, width), np.linspace(0.0, 1.0, height))
+    scale  = 8.0 if hdr else 1.0
+    pixels = np.stack(( u * scale, v * scale, 0.5 * (np.sin(u * 40.0) + 1.0) * scale, np.ones_like(u) ), axis=2)
+
+    image.pixels.foreach_set(pixels.astype(np.float32).ravel())
+
+    return image
+
+# Makes a principled material, with image or constant inputs
+def make_material(name: str, image_size: int, use_images: bool) -> bpy.types.Material:
+
+    material           = bpy.data.materials.new(name)
+    material.use_nodes = True
+
+    nodes              = material.node_tree.nodes
+    links              = material.node_tree.links
+    principled         = nodes["Principled BSDF"]
+
+    if use_images is True:
+        for input_name in ( "Base Color", "Roughness" ):
+            node       = nodes.new("ShaderNodeTexImage")
+            node.image = make_image(name + " " + input_name, image_size, image_size)
+            links.new(node.outputs["Color"], principled.inputs[input_name])
+    else:
+        principled.inputs["Base Color"].default_value = ( 0.8, 0.2, 0.1, 1.0 )
+        principled.inputs["Roughness"].default_value  = 0.4
+        principled.inputs["Metallic"].default_value   = 0.0
+
+    return material
+
+# Makes an armature with a chain of bones, and a mesh weighted to it
+def make_character(scene: bpy.types.Scene, bone_count: int, vertex_count: int, material: bpy.types.Material):
+
+    armature        = bpy.data.armatures.new("Benchmark Rig")
+    armature_object = bpy.data.objects.new("Benchmark Rig", armature)
+    scene.collection.objects.link(armature_object)
+
+    # Bones can only be added in edit mode
+    bpy.context.view_layer.objects.active = armature_object
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    previous = None
+
+    for i in range(bone_count):
+        bone        = armature.edit_bones.new("Bone.%03d" % i)
+        bone.head   = ( 0.0, 0.0, i / bone_count )
+        bone.tail   = ( 0.0, 0.0, (i + 1) / bone_count )
+        bone.parent = previous
+        previous    = bone
+
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+    # A tall grid, weighted to the nearest bone
+    mesh = make_grid("Benchmark Character", vertex_count, height=1.0)
+    mesh.materials.append(material)
+
+    character        = bpy.data.objects.new("Benchmark Character", mesh)
+    character.parent = armature_object
+    scene.collection.objects.link(character)
+
+    heights = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", heights)
+    bones   = np.clip((heights[2::3] * bone_count).astype(np.int64), 0, bone_count - 1)
+
+    for i in range(bone_count):
+        group = character.vertex_groups.new(name="Bone.%03d" % i)
+        group.add(np.flatnonzero(bones == i).tolist(), 1.0, 'REPLACE')
+
+    modifier        = character.modifiers.new("Armature", 'ARMATURE')
+    modifier.object = armature_object
+
+    return
+
+# Makes a world with an HDR environment
+def make_world(scene: bpy.types.Scene, width: int):
+
+    world           = bpy.data.worlds.new("Benchmark World")
+    world.use_nodes = True
+
+    environment       = world.node_tree.nodes.new("ShaderNodeTexEnvironment")
+    environment.name  = "Environment Texture"
+    environment.image = make_image("Benchmark HDR", width, width // 2, hdr=True)
+
+    world.node_tree.links.new(environment.outputs["Color"], world.node_tree.nodes["Background"].inputs["Color"])
+
+    scene.world = world
+
+    return
+
+# Generates the scene for a case
+def generate(case: dict) -> bpy.types.Scene:
+
+    clear_data()
+
+    scene     = bpy.context.scene
+    materials = [ make_material("Benchmark Material %d" % i, case["image size"], i % 2 == 0) for i in range(case["materials"]) ]
+
+    for i in range(case["meshes"]):
+        mesh = make_grid("Benchmark Mesh %d" % i, case["vertices"])
+        mesh.materials.append(materials[i % len(materials)])
+
+        # The mesh, and linked duplicates that share its data
+        for d in range(case["duplicates"] + 1):
+            o          = bpy.data.objects.new("Benchmark Mesh %d.%d" % ( i, d ), mesh)
+            o.location = ( (i % 16) * 1.5, (i // 16) * 1.5, d * 0.5 )
+            scene.collection.objects.link(o)
+
+    make_character(scene, case["bones"], case["vertices"], materials[0])
+    make_world(scene, case["hdr size"])
+
+    return scene
+
+# Runs a function, and returns ( result, seconds, peak RSS )
+def measure(addon, function):
+
+    sampler = MemorySampler(addon.resident_set_size)
+    sampler.start()
+
+    start   = timer()
+
+    try:
+        ret = function()
+    finally:
+        seconds = timer() - start
+        peak    = sampler.stop()
+
+    return ret, seconds, peak
+
+# Generates and exports one case, and returns its metrics
+def run_case(addon, name: str, case: dict, workers: int) -> dict:
+
+    directory = tempfile.mkdtemp(prefix="gxport-benchmark-")
+    ret       = { "case": case, "stages": { }, "phases": { } }
+
+    try:
+        scene, seconds, peak = measure(addon, lambda: generate(case))
+        ret["stages"]["generate"] = { "seconds": seconds, "peak rss": peak }
+
+        with addon.ExportSession(profiler=addon.Profiler(memory=True), settings=SETTINGS) as session:
+
+            exported, seconds, peak = measure(addon, lambda: addon.Scene(scene))
+            ret["stages"]["construct"] = { "seconds": seconds, "peak rss": peak }
+
+            _, seconds, peak = measure(addon, lambda: exported.write_to_directory(directory + "/" + name, workers=workers))
+            ret["stages"]["write"] = { "seconds": seconds, "peak rss": peak }
+
+            report = session.profiler.to_dict()
+
+            del exported
+
+        # Time, peak RSS and bytes written by each phase of the exporter
+        for phase, totals in report["phases"].items():
+            ret["phases"][phase] = { "seconds": totals["seconds"], "peak rss": totals.get("peak rss", 0), "bytes written": totals["bytes written"] }
+
+        ret["bytes written"] = report["totals"]["bytes written"]
+        ret["vertex count"]  = report["totals"]["vertex count"]
+        ret["peak rss"]      = max(s["peak rss"] for s in ret["stages"].values())
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return ret
+
+# Keeps the best of two runs of a case
+def best(a: dict, b: dict) -> dict:
+
+    if a is None:
+        return b
+
+    for group in ( "stages", "phases" ):
+        for stage, metrics in b[group].items():
+            for metric, value in metrics.items():
+                a[group][stage][metric] = min(a[group][stage][metric], value)
+
+    a["peak rss"] = min(a["peak rss"], b["peak rss"])
+
+    return a
+
+# Returns every metric of a result, as { "case/group/stage/metric": value }
+def flatten(results: dict) -> dict:
+
+    ret: dict = { }
+
+    for name, result in results.items():
+        for group in ( "stages", "phases" ):
+            for stage, metrics in result[group].items():
+                for metric, value in metrics.items():
+                    ret["/".join(( name, group, stage, metric ))] = value
+
+        ret[name + "/peak rss"]      = result["peak rss"]
+        ret[name + "/bytes written"] = result["bytes written"]
+
+    return ret
+
+# Compares results against a baseline, and returns the regressions
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+
+    ret      : list = [ ]
+    current  : dict = flatten(results)
+    reference: dict = flatten({ name: result for name, result in baseline.items() if name in results })
+
+    for key, value in sorted(current.items()):
+        before = reference.get(key)
+
+        # New metrics, and timings too short to compare
+        if before is None:
+            continue
+
+        if key.endswith("/seconds") and before < MIN_SECONDS and value < MIN_SECONDS:
+            continue
+
+        if value > before * (1.0 + tolerance):
+            ret.append(( key, before, value ))
+
+    return ret
+
+def main(argv: list) -> int:
+
+    parser = argparse.ArgumentParser(
+        prog        = "blender -b --factory-startup --python benchmarks/benchmark.py --",
+        description = "Benchmark gxport on synthetic scenes"
+    )
+
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES.keys()), default=[ "small", "medium" ], help="Cases to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case. The best of each metric is kept")
+    parser.add_argument("--workers", type=int, default=0, help="Export worker threads. 0 uses one per core")
+    parser.add_argument("--output", default="gxport-benchmark.json", help="Where to write the results")
+    parser.add_argument("--baseline", help="Results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Fraction a metric may grow by before it is a regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to --baseline instead of comparing")
+
+    arguments = parser.parse_args(argv)
+    addon     = load_addon()
+    results   = { }
+
+    for name in arguments.cases:
+        result = None
+
+        for i in range(max(arguments.repeat, 1)):
+            result = best(result, run_case(addon, name, CASES[name], arguments.workers))
+
+        results[name] = result
+
+        print("[gxport] [benchmark] " + name + ": " + " ".join(stage + " %.3fs" % result["stages"][stage]["seconds"] for stage in STAGES) + ", peak RSS %.1f MB" % (result["peak rss"] / (1 << 20)) + ", %.1f MB written" % (result["bytes written"] / (1 << 20)))
+
+    with open(arguments.output, "w") as f:
+        json.dump(results, f, indent=4)
+
+    if arguments.baseline is None:
+        return 0
+
+    # Record a new baseline
+    if arguments.update_baseline is True:
+        with open(arguments.baseline, "w") as f:
+            json.dump(results, f, indent=4)
+
+        print("[gxport] [benchmark] Wrote baseline " + arguments.baseline)
+
+        return 0
+
+    # Compare against the baseline
+    with open(arguments.baseline, "r") as f:
+        regressions = compare(results, json.load(f), arguments.tolerance)
+
+    for key, before, after in regressions:
+        print("[gxport] [benchmark] Regression " + key + ": " + "%.4g" % before + " -> " + "%.4g" % after + " (%+.1f%%)" % (100.0 * (after - before) / before if before else math.inf))
+
+    print("[gxport] [benchmark] " + str(len(regressions)) + " regressions, tolerance %.0f%%" % (100.0 * arguments.tolerance))
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+
+    # Blender passes everything after "--" to the script
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [ ]
+
+    sys.exit(main(argv))
@@ -0,0 +1,351 @@
+'''
+    gxport command line interface
+
+    Exports many .blend files in parallel, each in its own background Blender
+
+        blender -b --python cli.py -- [options] file.blend [file.blend=output/directory ...]
+
+    Files without an output directory are written to "[output root]/[file name]". Every
+    property of the export operator is also an option, so "--document-encoding COMPACT" and
+    "--no-use-normals" behave like the export dialog. Run with --help for the full list.
+
+    The export's process pool spawns processes that import this script again, without 
+    Blender, so bpy is only imported by the functions that use it.
+'''
+
+import os
+import sys
+import json
+import argparse
+import hashlib
+import importlib
+import subprocess
+import concurrent.futures
+from timeit import default_timer as timer
+
+# Operator properties that only exist for the export dialog
+DIALOG_PROPERTIES: tuple = ( "filter_glob", "filepath", "context_tab", "scene_objects", "progress_path" )
+
+# Operator properties that only make sense in an interactive Blender, and their values in a worker
+WORKER_OVERRIDES : dict  = { "use_modal": False, "use_background": False }
+
+# Options that differ from the export dialog. A batch export always writes whole scenes
+OPTION_DEFAULTS  : dict  = { "append_selected": False }
+
+MANIFEST_NAME    : str   = "gxport-manifest.json"
+LOG_NAME         : str   = "gxport-export.log"
+REPORT_NAME      : str   = "gxport-worker.json"
+
+# Files of the add-on that change what is exported
+EXPORTER_FILES   : tuple = ( "__init__.py", "gxport_geometry.py" )
+
+# Imports the add-on, and registers it if it is not enabled
+def load_addon():
+
+    import bpy
+
+    # The add-on is the directory this script is in
+    package_directory = os.path.dirname(os.path.abspath(__file__))
+
+    if os.path.dirname(package_directory) not in sys.path:
+        sys.path.insert(0, os.path.dirname(package_directory))
+
+    addon = importlib.import_module(os.path.basename(package_directory))
+
+    # Register the operator, unless the add-on is already enabled
+    if getattr(bpy.types, "GXPORT_OT_export", None) is None:
+        addon.register()
+
+    return addon
+
+# Returns the export options of the operator as { name: ( property function, keywords ) }
+def export_properties(addon) -> dict:
+
+    ret: dict = { }
+
+    for name, deferred in addon.gxport.__annotations__.items():
+
+        # Skip properties that only make sense in the dialog
+        if name in DIALOG_PROPERTIES or name in WORKER_OVERRIDES:
+            continue
+
+        # Skip anything that is not a property
+        if not hasattr(deferred, "function") or not hasattr(deferred, "keywords"):
+            continue
+
+        ret[name] = ( deferred.function.__name__, deferred.keywords )
+
+    return ret
+
+# Adds an option to the parser for each export property
+def add_export_options(parser: argparse.ArgumentParser, properties: dict):
+
+    group = parser.add_argument_group("export options")
+
+    for name, ( function, keywords ) in properties.items():
+
+        flag    = "--" + name.replace("_", "-")
+        default = OPTION_DEFAULTS.get(name, keywords.get("default"))
+        text    = keywords.get("description", keywords.get("name", ""))
+
+        if   function == "BoolProperty":
+            group.add_argument(flag, dest=name, action=argparse.BooleanOptionalAction, default=default, help=text)
+        elif function == "IntProperty":
+            group.add_argument(flag, dest=name, type=int, default=default, help=text)
+        elif function == "FloatProperty":
+            group.add_argument(flag, dest=name, type=float, default=default, help=text)
+        elif function == "EnumProperty":
+            group.add_argument(flag, dest=name, choices=sorted(i[0] for i in keywords["items"]), default=default, help=text)
+        elif function == "StringProperty":
+            group.add_argument(flag, dest=name, type=str, default=default, help=text)
+
+    return
+
+# Returns the SHA-256 of a file
+def hash_file(path: str) -> str:
+
+    ret = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                break
+            ret.update(chunk)
+
+    return ret.hexdigest()
+
+# Returns the size and modification time of a file, or None if it is missing
+def file_state(path: str) -> dict:
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return { "size": stat.st_size, "mtime": stat.st_mtime_ns }
+
+# Returns the state of every linked library and external image the open .blend file reads. Runs inside each worker
+def external_files() -> dict:
+
+    import bpy
+
+    paths = { bpy.path.abspath(library.filepath) for library in bpy.data.libraries }
+
+    # Packed images are in the .blend file, and generated ones have no file
+    for image in bpy.data.images:
+        if image.source in ( 'FILE', 'SEQUENCE', 'TILED' ) and image.packed_file is None and image.filepath:
+            paths.add(bpy.path.abspath(image.filepath, library=image.library))
+
+    return { path: file_state(path) for path in sorted(os.path.normpath(p) for p in paths) }
+
+# Reads a manifest, or None if there is not a readable one
+def read_manifest(output: str) -> dict:
+
+    try:
+        with open(os.path.join(output, MANIFEST_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# Exports the open .blend file. Runs inside each worker
+def run_worker(arguments, options: dict):
+
+    import bpy
+
+    start        = timer()
+    status       = "FAILED"
+    dependencies = { }
+
+    try:
+        options.update(WORKER_OVERRIDES)
+
+        # Files outside the .blend file, so the driver can tell when they change
+        dependencies = external_files()
+
+        result = bpy.ops.gxport.export(
+            'EXEC_DEFAULT', 
+            filepath      = arguments.worker_output, 
+            progress_path = arguments.worker_progress or "",
+            **options
+        )
+        status = "FINISHED" if 'FINISHED' in result else "CANCELLED"
+    finally:
+
+        # Tell the driver how it went, even if the export raised
+        with open(arguments.worker_report, "w") as f:
+            json.dump({ "status": status, "seconds": timer() - start, "dependencies": dependencies }, f)
+
+    return
+
+# Exports one .blend file in a background Blender
+def export_file(blender: str, job: dict, options: dict) -> dict:
+
+    os.makedirs(job["output"], exist_ok=True)
+
+    report_path = os.path.join(job["output"], REPORT_NAME)
+    start       = timer()
+
+    # Remove the report of a previous run
+    try   : os.remove(report_path)
+    except: pass
+
+    command = [
+        blender, "-b", job["file"],
+        "--python-exit-code", "1",
+        "--python", os.path.abspath(__file__),
+        "--",
+        "--worker-output", job["output"],
+        "--worker-report", report_path,
+        "--worker-options", json.dumps(options)
+    ]
+
+    # Write everything the worker prints to a log next to the export
+    with open(os.path.join(job["output"], LOG_NAME), "w") as log:
+        process = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT)
+
+    job["seconds"]    = timer() - start
+    job["returncode"] = process.returncode
+
+    try:
+        with open(report_path, "r") as f:
+            report = json.load(f)
+
+        job["status"]         = report["status"] if process.returncode == 0 else "FAILED"
+        job["export seconds"] = report["seconds"]
+        job["dependencies"]   = report.get("dependencies", { })
+
+        os.remove(report_path)
+    except (OSError, ValueError):
+        job["status"]         = "FAILED"
+
+    # Record what was exported, so the next run can skip it
+    if job["status"] == "FINISHED":
+        with open(os.path.join(job["output"], MANIFEST_NAME), "w") as f:
+            json.dump({
+                "blend file"   : job["file"],
+                "blend hash"   : job["blend hash"],
+                "exporter hash": job["exporter hash"],
+                "options"      : options,
+                "dependencies" : job["dependencies"],
+                "seconds"      : job["seconds"]
+            }, f, indent=4)
+
+    return job
+
+# Exports every file on a pool of background Blenders
+def run_driver(arguments, options: dict):
+
+    exporter_hash = hashlib.sha256("".join(hash_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), f)) for f in EXPORTER_FILES).encode()).hexdigest()
+    jobs          = [ ]
+    summary       = [ ]
+    start         = timer()
+
+    # Pair each file with its output directory
+    for f in arguments.files:
+        blend_file, separator, output = f.partition("=")
+        blend_file = os.path.abspath(blend_file)
+
+        if separator == "":
+            output = os.path.join(arguments.output_root, os.path.splitext(os.path.basename(blend_file))[0])
+
+        jobs.append({ "file": blend_file, "output": os.path.abspath(output) })
+
+    # Skip files that have not changed since they were last exported, and whose libraries and images have not either
+    pending = [ ]
+
+    for job in jobs:
+        job["blend hash"]    = hash_file(job["file"])
+        job["exporter hash"] = exporter_hash
+
+        manifest = read_manifest(job["output"])
+
+        unchanged = manifest is not None                                     \
+                    and manifest.get("blend hash")    == job["blend hash"]   \
+                    and manifest.get("exporter hash") == exporter_hash       \
+                    and manifest.get("options")       == options             \
+                    and "dependencies" in manifest                           \
+                    and all(file_state(p) == state for p, state in manifest["dependencies"].items())
+
+        if arguments.force is False and unchanged:
+            job["status"]  = "SKIPPED"
+            job["seconds"] = 0.0
+            summary.append(job)
+        else:
+            pending.append(job)
+
+    # Fan the rest out across the workers
+    with concurrent.futures.ThreadPoolExecutor(max_workers=arguments.jobs) as executor:
+        futures = [ executor.submit(export_file, arguments.blender, job, options) for job in pending ]
+
+        for future in concurrent.futures.as_completed(futures):
+            job = future.result()
+            summary.append(job)
+
+            print("[gxport] [cli] " + job["status"] + " " + job["file"] + " in " + "%.2f" % job["seconds"] + "s")
+
+    summary.sort(key=lambda j: j["file"])
+
+    # Write the summary
+    with open(arguments.summary, "w") as f:
+        json.dump({ "seconds": timer() - start, "jobs": summary }, f, indent=4)
+
+    # Print the summary
+    for job in summary:
+        print("%-9s %8.2fs  %s -> %s" % ( job["status"], job["seconds"], job["file"], job["output"] ))
+
+    failed = sum(1 for j in summary if j["status"] not in ( "FINISHED", "SKIPPED" ))
+
+    print("[gxport] [cli] " + str(len(summary) - failed) + " of " + str(len(summary)) + " files exported in " + "%.2f" % (timer() - start) + "s")
+
+    return failed
+
+def main(argv: list):
+
+    import bpy
+
+    addon      = load_addon()
+    properties = export_properties(addon)
+
+    parser     = argparse.ArgumentParser(
+        prog        = "blender -b --python cli.py --",
+        description = "Export .blend files to G10 scenes, in parallel"
+    )
+
+    parser.add_argument("files", nargs="*", help="A .blend file, or file.blend=output/directory")
+    parser.add_argument("--output-root", default=os.getcwd(), help="Directory for files given without an output directory")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Number of Blender processes to run at once")
+    parser.add_argument("--blender", default=bpy.app.binary_path, help="Blender executable for the workers")
+    parser.add_argument("--summary", default="gxport-summary.json", help="Where to write the timing and status summary")
+    parser.add_argument("--force", action="store_true", help="Export files even if their manifest says nothing changed")
+
+    # Used by the driver to start workers
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-report", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-options", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-progress", help=argparse.SUPPRESS)
+
+    add_export_options(parser, properties)
+
+    arguments = parser.parse_args(argv)
+
+    # Worker
+    if arguments.worker_output is not None:
+        run_worker(arguments, json.loads(arguments.worker_options))
+        return 0
+
+    # Driver
+    options = { name: getattr(arguments, name) for name in properties }
+
+    if not arguments.files:
+        parser.error("no .blend files to export")
+
+    return run_driver(arguments, options)
+
+if __name__ == "__main__":
+
+    # Blender passes everything after "--" to the script
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [ ]
+
+    if main(argv) != 0:
+        sys.exit(1)
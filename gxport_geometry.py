@@ -0,0 +1,702 @@
+'''
+    gxport geometry
+
+    Geometry processing that runs on the export session's process pool. Nothing here may 
+    import Blender, since spawned processes import this module on its own, as a top level 
+    module from the add-on directory. Arguments and results are plain lists, tuples and 
+    numpy arrays, so they can be pickled.
+'''
+
+import math
+import heapq
+import numpy
+from struct import pack, Struct
+from collections import deque
+
+# Attributes of gxport.Part that decide how its vertices are encoded
+VERTEX_LAYOUT: tuple = (
+    "use_geometry", "use_uv_coords", "use_normals", "use_tangents", "use_bitangents", "use_colors", "use_bone_groups", "use_bone_weights",
+    "position_encoding", "uv_encoding", "normal_encoding", "weight_encoding"
+)
+
+class VertexCache:
+
+    '''
+        gxport.VertexCache
+    '''
+
+    # Entries in the simulated post transform cache. 16 is a safe guess for most GPUs
+    CACHE_SIZE: int = 16
+
+    # Returns the average cache miss ratio of an index list
+    @staticmethod
+    def acmr(indices: list, cache_size: int = 16) -> float:
+
+        '''
+            Returns the number of vertices transformed per triangle, with a FIFO cache of 
+            cache_size vertices. 0.5 is ideal for big regular meshes, and 3 is the worst
+        '''
+
+        if not indices:
+            return 0.0
+
+        cache  = deque()
+        cached = set()
+        misses = 0
+
+        for v in indices:
+            if v in cached:
+                continue
+
+            misses = misses + 1
+
+            cache.append(v)
+            cached.add(v)
+
+            if len(cache) > cache_size:
+                cached.discard(cache.popleft())
+
+        return misses / (len(indices) // 3)
+
+    # Orders triangles for the post transform cache
+    @staticmethod
+    def tipsify(indices: list, vertex_count: int, cache_size: int = 16) -> tuple:
+
+        '''
+            Returns ( triangle order, cluster starts ), using Tipsify, from "Fast Triangle 
+            Reordering for Vertex Locality and Reduced Overdraw" by Sander, Nehab and Barczak.
+            Fans triangles around a vertex, then moves to the neighbour most likely to still be
+            in the cache. A cluster starts wherever the fan had to jump, which is where triangles
+            can be reordered for overdraw without costing many cache misses
+        '''
+
+        triangle_count = len(indices) // 3
+        adjacency      = [ [ ] for v in range(vertex_count) ]
+
+        for t in range(triangle_count):
+            for v in indices[3 * t:3 * t + 3]:
+                adjacency[v].append(t)
+
+        live     = [ len(a) for a in adjacency ]
+        stamps   = [ 0 ] * vertex_count
+        emitted  = [ False ] * triangle_count
+        dead_end = [ ]
+        order    = [ ]
+        clusters = [ ]
+        clock    = cache_size + 1
+        cursor   = 0
+        fan      = 0
+        jumped   = True
+
+        while True:
+
+            # Jump to a vertex with triangles left
+            if jumped is True:
+                fan = -1
+
+                while dead_end:
+                    v = dead_end.pop()
+
+                    if live[v] > 0:
+                        fan = v
+                        break
+
+                while fan < 0 and cursor < vertex_count:
+                    if live[cursor] > 0:
+                        fan = cursor
+
+                    cursor = cursor + 1
+
+                if fan < 0:
+                    break
+
+                clusters.append(len(order))
+
+            # Emit every triangle around the fanning vertex
+            candidates = [ ]
+
+            for t in adjacency[fan]:
+                if emitted[t] is True:
+                    continue
+
+                for v in indices[3 * t:3 * t + 3]:
+                    dead_end.append(v)
+                    candidates.append(v)
+                    live[v] = live[v] - 1
+
+                    # Not in the cache, so it is transformed again
+                    if clock - stamps[v] > cache_size:
+                        stamps[v] = clock
+                        clock     = clock + 1
+
+                emitted[t] = True
+                order.append(t)
+
+            # Fan around the candidate that will still be in the cache, and is oldest
+            best     = -1
+            priority = -1
+
+            for v in candidates:
+                if live[v] <= 0:
+                    continue
+
+                p = 0
+
+                if clock - stamps[v] + 2 * live[v] <= cache_size:
+                    p = clock - stamps[v]
+
+                if p > priority:
+                    priority = p
+                    best     = v
+
+            jumped = best < 0
+            fan    = best
+
+        return ( order, clusters )
+
+    # Sorts clusters of triangles to reduce overdraw
+    @staticmethod
+    def sort_clusters(indices: list, order: list, clusters: list, positions: list) -> list:
+
+        '''
+            Returns order, with clusters facing away from the center of the mesh first. On a
+            mostly convex mesh those occlude the rest, so fewer pixels are shaded twice
+        '''
+
+        def area_weighted(triangles):
+
+            centroid = [ 0.0, 0.0, 0.0 ]
+            normal   = [ 0.0, 0.0, 0.0 ]
+            area     = 0.0
+
+            for t in triangles:
+                a, b, c = ( positions[v] for v in indices[3 * t:3 * t + 3] )
+
+                e1 = [ b[i] - a[i] for i in range(3) ]
+                e2 = [ c[i] - a[i] for i in range(3) ]
+                n  = [ e1[1] * e2[2] - e1[2] * e2[1], e1[2] * e2[0] - e1[0] * e2[2], e1[0] * e2[1] - e1[1] * e2[0] ]
+                w  = math.sqrt(n[0] ** 2 + n[1] ** 2 + n[2] ** 2)
+
+                for i in range(3):
+                    centroid[i] = centroid[i] + w * (a[i] + b[i] + c[i]) / 3
+                    normal[i]   = normal[i] + n[i]
+
+                area = area + w
+
+            if area > 0.0:
+                centroid = [ c / area for c in centroid ]
+
+            return centroid, normal
+
+        center, _ = area_weighted(order)
+        spans     = [ order[start:end] for start, end in zip(clusters, clusters[1:] + [ len(order) ]) ]
+        keys      = [ ]
+
+        for span in spans:
+            centroid, normal = area_weighted(span)
+            keys.append(sum((centroid[i] - center[i]) * normal[i] for i in range(3)))
+
+        ret = [ ]
+
+        for i in sorted(range(len(spans)), key=lambda i: -keys[i]):
+            ret.extend(spans[i])
+
+        return ret
+
+    # Renumbers vertices in the order they are first used
+    @staticmethod
+    def fetch_order(indices: list, vertex_count: int) -> tuple:
+
+        '''
+            Returns ( indices, remap ), where remap[old index] is the new index. Vertices that 
+            are never used go last
+        '''
+
+        remap = [ -1 ] * vertex_count
+        count = 0
+
+        for v in indices:
+            if remap[v] < 0:
+                remap[v] = count
+                count    = count + 1
+
+        for v in range(vertex_count):
+            if remap[v] < 0:
+                remap[v] = count
+                count    = count + 1
+
+        return ( [ remap[v] for v in indices ], remap )
+
+# Returns the PLY properties, a struct and an encoder for vertices
+def vertex_format(layout: dict, encoding: dict) -> tuple:
+
+    '''
+        layout has a value for each name in VERTEX_LAYOUT, read from a part. encoding is 
+        the vertex encoding of its document, with the ranges values are quantized to
+    '''
+
+    properties = [ ]
+    formats    = [ ]
+    encoders   = [ ]
+
+    # Quantizes values of a vertex to 16 bits, between a min and a max
+    def unorm16(first: int, bounds: dict):
+        lo    = bounds["min"]
+        scale = [ 65535 / (h - l) if h > l else 0.0 for l, h in zip(lo, bounds["max"]) ]
+        last  = first + len(lo)
+
+        return lambda v: tuple(min(max(round((x - l) * s), 0), 65535) for x, l, s in zip(v[first:last], lo, scale))
+
+    # Encodes a direction of a vertex on an octahedron
+    def direction(first: int):
+        return lambda v: octahedral(v[first], v[first + 1], v[first + 2])
+
+    # Reads values of a vertex as they are
+    def raw(first: int, last: int):
+        return lambda v: v[first:last]
+
+    # Declares properties of a type
+    def declare(type: bytes, names: tuple) -> list:
+        return [ b"property " + type + b" " + n + b"\n" for n in names ]
+
+    # < x, y, z >
+    if layout["use_geometry"] is True:
+        if layout["position_encoding"] == "UNORM16":
+            properties += [ b"comment x y z unorm16 in the part bounds\n" ] + declare(b"ushort", ( b"x", b"y", b"z" ))
+            formats    += [ "3H" ]
+            encoders   += [ unorm16(0, encoding["position"]) ]
+        else:
+            properties += declare(b"float", ( b"x", b"y", b"z" ))
+            formats    += [ "3f" ]
+            encoders   += [ raw(0, 3) ]
+
+    # < s, t >
+    if layout["use_uv_coords"] is True:
+        if layout["uv_encoding"] == "UNORM16":
+            properties += [ b"comment s t unorm16 in the part uv bounds\n" ] + declare(b"ushort", ( b"s", b"t" ))
+            formats    += [ "2H" ]
+            encoders   += [ unorm16(3, encoding["uv"]) ]
+        elif layout["uv_encoding"] == "HALF":
+            properties += [ b"comment s t half\n" ] + declare(b"ushort", ( b"s", b"t" ))
+            formats    += [ "2e" ]
+            encoders   += [ raw(3, 5) ]
+        else:
+            properties += declare(b"float", ( b"s", b"t" ))
+            formats    += [ "2f" ]
+            encoders   += [ raw(3, 5) ]
+
+    # < nx, ny, nz >, < tx, ty, tz > and < bx, by, bz >
+    for use, first, p in ( ( layout["use_normals"], 5, b"n" ), ( layout["use_tangents"], 8, b"t" ), ( layout["use_bitangents"], 11, b"b" ) ):
+        if use is not True:
+            continue
+
+        if layout["normal_encoding"] == "OCTAHEDRAL":
+            properties += [ b"comment " + p + b"u " + p + b"v octahedral snorm16\n" ] + declare(b"short", ( p + b"u", p + b"v" ))
+            formats    += [ "2h" ]
+            encoders   += [ direction(first) ]
+        else:
+            properties += declare(b"float", ( p + b"x", p + b"y", p + b"z" ))
+            formats    += [ "3f" ]
+            encoders   += [ raw(first, first + 3) ]
+
+    # < r, g, b, a >
+    if layout["use_colors"] is True:
+        properties += declare(b"uchar", ( b"red", b"green", b"blue", b"alpha" ))
+        formats    += [ "4B" ]
+        encoders   += [ lambda v: tuple(min(max(round(c * 255), 0), 255) for c in v[14:18]) ]
+
+    # < g0, g1, g2, g3 >. Unused groups are -1
+    if layout["use_bone_groups"] is True:
+        properties += declare(b"int", ( b"b0", b"b1", b"b2", b"b3" ))
+        formats    += [ "4i" ]
+        encoders   += [ raw(18, 22) ]
+
+    # < w0, w1, w2, w3 >
+    if layout["use_bone_weights"] is True:
+        if layout["weight_encoding"] == "UNORM8":
+            properties += [ b"comment w0 w1 w2 w3 unorm8 adding up to 255\n" ] + declare(b"uchar", ( b"w0", b"w1", b"w2", b"w3" ))
+            formats    += [ "4B" ]
+            encoders   += [ lambda v: unorm8_weights(v[22:26]) ]
+        else:
+            properties += declare(b"float", ( b"w0", b"w1", b"w2", b"w3" ))
+            formats    += [ "4f" ]
+            encoders   += [ raw(22, 26) ]
+
+    encode = lambda v: tuple(x for e in encoders for x in e(v))
+
+    return ( b"".join(properties), Struct("<" + "".join(formats)), encode )
+
+# Encodes a direction as two 16 bit signed normalized values, on an octahedron
+def octahedral(x: float, y: float, z: float) -> tuple:
+
+    l = abs(x) + abs(y) + abs(z)
+
+    if l == 0:
+        return ( 0, 0 )
+
+    u, v = x / l, y / l
+
+    # Fold the lower half over the upper half
+    if z < 0:
+        u, v = (1 - abs(v)) * math.copysign(1, u), (1 - abs(u)) * math.copysign(1, v)
+
+    return ( round(u * 32767), round(v * 32767) )
+
+# Quantizes bone weights to 8 bits, normalized so they add up to 255
+def unorm8_weights(weights) -> tuple:
+
+    total = sum(weights)
+
+    if total <= 0:
+        return ( 0, 0, 0, 0 )
+
+    ret = [ round(w / total * 255) for w in weights ]
+
+    # Give the rounding error to the biggest weight
+    ret[ret.index(max(ret))] += 255 - sum(ret)
+
+    return tuple(ret)
+
+# Returns the vertex rows and the index block of a mesh, encoded as they are written to a PLY
+def encode_mesh(vertices: list, faces: list, layout: dict, encoding: dict, index_format: str) -> tuple:
+
+    '''
+        Returns ( vertex bytes, index bytes ). With an index_format of "H" or "I", the faces 
+        are one block of 16 or 32 bit indices. Without one, each face is a PLY list of a 
+        count and three 32 bit indices
+    '''
+
+    properties, row, encode = vertex_format(layout, encoding)
+
+    vertex_data = b"".join(row.pack(*encode(v)) for v in vertices)
+
+    if index_format is not None:
+        index_data = pack("<%d%s" % (3 * len(faces), index_format), *( i for f in faces for i in f[0:3] ))
+    else:
+        index_data = b"".join(pack("<B3I", 3, f[0], f[1], f[2]) for f in faces)
+
+    return ( vertex_data, index_data )
+
+# Orders triangles for the post transform vertex cache, and vertices in the order they are fetched
+def reorder(indices: list, vertex_count: int, submeshes: list, cache_size: int, positions: list = None, tipsify: bool = True) -> tuple:
+
+    '''
+        submeshes are ( first triangle, triangle count ), and triangles stay in their 
+        submesh. If positions is set, clusters of triangles are also sorted to reduce 
+        overdraw. If tipsify is False, only the vertices are renumbered. Returns ( indices, 
+        remap, acmr before, acmr after ), where remap maps each old vertex to its new one
+    '''
+
+    acmr = VertexCache.acmr(indices, cache_size)
+
+    if tipsify is True:
+        order = [ ]
+
+        for first, count in submeshes:
+            submesh                 = indices[3 * first:3 * (first + count)]
+            submesh_order, clusters = VertexCache.tipsify(submesh, vertex_count, cache_size)
+
+            if positions is not None:
+                submesh_order = VertexCache.sort_clusters(submesh, submesh_order, clusters, positions)
+
+            order += [ first + t for t in submesh_order ]
+
+        indices = [ v for t in order for v in indices[3 * t:3 * t + 3] ]
+
+    indices, remap = VertexCache.fetch_order(indices, vertex_count)
+
+    return ( indices, remap, acmr, VertexCache.acmr(indices, cache_size) )
+
+class Simplifier:
+
+    '''
+        gxport.Simplifier
+    '''
+
+    # Simplifies a triangle list into a chain of levels of detail
+    @staticmethod
+    def simplify(positions: list, indices: list, ratios: tuple) -> list:
+
+        '''
+            Returns [ ( indices, error ) ] for each ratio of the triangle count, using quadric 
+            edge collapse from "Surface Simplification Using Quadric Error Metrics" by Garland 
+            and Heckbert. Each level continues from the one before it.
+
+            Edges collapse onto one of their vertices, so no attributes are interpolated. 
+            Vertices on an edge with other than two triangles never move. The vertex array is
+            split wherever UVs or normals are, so this keeps seams and open borders in place.
+            Collapses that would flip a triangle, or that break the link condition of "Topology
+            Preserving Edge Contraction" by Dey et al., are skipped, so a closed mesh stays a 
+            closed manifold and never folds into a pair of back to back triangles. Levels stop 
+            once the mesh cannot be reduced any further, so fewer levels than ratios may be 
+            returned. error is the square root of the largest quadric error collapsed, which is
+            a conservative distance
+        '''
+
+        triangle_count = len(indices) // 3
+        triangles      = [ list(indices[3 * t:3 * t + 3]) for t in range(triangle_count) ]
+        alive          = [ True ] * triangle_count
+        around         = [ set() for p in positions ]
+        quadrics       = [ [ 0.0 ] * 10 for p in positions ]
+        removed        = [ False ] * len(positions)
+        locked         = [ False ] * len(positions)
+        edges          = { }
+
+        for t, triangle in enumerate(triangles):
+
+            # The quadric of the plane of the triangle
+            normal = Simplifier.normal(*( positions[v] for v in triangle ))
+            length = math.sqrt(normal[0] ** 2 + normal[1] ** 2 + normal[2] ** 2)
+
+            if length > 0.0:
+                a, b, c = ( n / length for n in normal )
+                d       = -(a * positions[triangle[0]][0] + b * positions[triangle[0]][1] + c * positions[triangle[0]][2])
+                plane   = ( a * a, a * b, a * c, a * d, b * b, b * c, b * d, c * c, c * d, d * d )
+
+                for v in triangle:
+                    quadrics[v] = [ q + p for q, p in zip(quadrics[v], plane) ]
+
+            for i in range(3):
+                around[triangle[i]].add(t)
+
+                edge        = tuple(sorted(( triangle[i], triangle[(i + 1) % 3] )))
+                edges[edge] = edges.get(edge, 0) + 1
+
+        # Lock seams and borders
+        for ( a, b ), count in edges.items():
+            if count != 2:
+                locked[a] = True
+                locked[b] = True
+
+        heap = [ ]
+
+        def cost(u: int, v: int) -> float:
+
+            q       = [ a + b for a, b in zip(quadrics[u], quadrics[v]) ]
+            x, y, z = positions[v]
+
+            return q[0] * x * x + 2 * q[1] * x * y + 2 * q[2] * x * z + 2 * q[3] * x \
+                 + q[4] * y * y + 2 * q[5] * y * z + 2 * q[6] * y                     \
+                 + q[7] * z * z + 2 * q[8] * z                                         \
+                 + q[9]
+
+        # Collapse u onto v
+        def push(u: int, v: int):
+
+            if locked[u] is False:
+                heapq.heappush(heap, ( cost(u, v), u, v ))
+
+            return
+
+        # Vertices that share a triangle with u
+        def neighbours(u: int) -> set:
+
+            return { w for t in around[u] for w in triangles[t] } - { u }
+
+        for a, b in edges:
+            push(a, b)
+            push(b, a)
+
+        ret       = [ ]
+        remaining = triangle_count
+        error     = 0.0
+
+        for ratio in ratios:
+            target = int(triangle_count * ratio)
+            start  = remaining
+
+            while remaining > target and heap:
+                c, u, v = heapq.heappop(heap)
+
+                # Stale entries
+                if removed[u] is True or removed[v] is True or not (around[u] & around[v]):
+                    continue
+
+                current = cost(u, v)
+
+                if current > c + 1e-12 * (1.0 + abs(c)):
+                    heapq.heappush(heap, ( current, u, v ))
+                    continue
+
+                # Skip collapses that flip or squash a triangle
+                flipped = False
+
+                for t in around[u]:
+                    triangle = triangles[t]
+
+                    if v in triangle:
+                        continue
+
+                    before = Simplifier.normal(*( positions[w] for w in triangle ))
+                    after  = Simplifier.normal(*( positions[v if w == u else w] for w in triangle ))
+
+                    if before[0] * after[0] + before[1] * after[1] + before[2] * after[2] <= 0.0:
+                        flipped = True
+                        break
+
+                if flipped is True:
+                    continue
+
+                # Skip collapses where u and v share a neighbour other than the vertices opposite
+                # their edge, or where those two vertices close a tetrahedron around the edge
+                shared   = around[u] & around[v]
+                opposite = { w for t in shared for w in triangles[t] } - { u, v }
+
+                if neighbours(u) & neighbours(v) != opposite:
+                    continue
+
+                if len(opposite) == 2:
+                    a, b = opposite
+
+                    if around[u] & around[a] & around[b] and around[v] & around[a] & around[b]:
+                        continue
+
+                # Collapse
+                for t in list(around[u]):
+                    triangle = triangles[t]
+
+                    if v in triangle:
+                        alive[t]  = False
+                        remaining = remaining - 1
+
+                        for w in triangle:
+                            around[w].discard(t)
+                    else:
+                        triangle[triangle.index(u)] = v
+                        around[v].add(t)
+
+                around[u].clear()
+
+                removed[u]  = True
+                quadrics[v] = [ a + b for a, b in zip(quadrics[v], quadrics[u]) ]
+                error       = max(error, current)
+
+                # The edges around v cost more now
+                for w in { w for t in around[v] for w in triangles[t] if w != v }:
+                    push(w, v)
+                    push(v, w)
+
+            # Nothing left to collapse
+            if remaining == start and remaining > target:
+                break
+
+            ret.append(( [ v for t in range(triangle_count) if alive[t] for v in triangles[t] ], math.sqrt(max(error, 0.0)) ))
+
+        return ret
+
+    # Returns the unnormalized normal of a triangle
+    @staticmethod
+    def normal(a, b, c) -> tuple:
+
+        e1 = ( b[0] - a[0], b[1] - a[1], b[2] - a[2] )
+        e2 = ( c[0] - a[0], c[1] - a[1], c[2] - a[2] )
+
+        return ( e1[1] * e2[2] - e1[2] * e2[1], e1[2] * e2[0] - e1[0] * e2[2], e1[0] * e2[1] - e1[1] * e2[0] )
+
+# Returns the convex hull of points
+def quickhull(points: numpy.ndarray, limit: int) -> tuple:
+
+    '''
+        Returns ( vertices, triangles ), with triangles wound counterclockwise seen from 
+        outside, or None if the points are flat. Only the point furthest along each of limit 
+        directions spread over a sphere is kept, so the hull has at most limit vertices. 
+        Every pass adds the point furthest outside any face, and replaces the faces it can 
+        see with a fan from their horizon
+    '''
+
+    points = numpy.unique(numpy.asarray(points, dtype=numpy.float64), axis=0)
+
+    # Keep the point furthest along each direction of a Fibonacci sphere
+    if len(points) > limit:
+        i          = numpy.arange(limit) + 0.5
+        z          = 1 - 2 * i / limit
+        theta      = math.pi * (1 + 5 ** 0.5) * i
+        ring       = numpy.sqrt(1 - z * z)
+        directions = numpy.stack(( ring * numpy.cos(theta), ring * numpy.sin(theta), z ), axis=1)
+        points     = points[numpy.unique(numpy.argmax(points @ directions.T, axis=0))]
+
+    if len(points) < 4:
+        return None
+
+    eps      = 1e-7 * float((points.max(axis=0) - points.min(axis=0)).max())
+
+    # Start with the two extreme points furthest apart
+    extremes = numpy.concatenate(( points.argmin(axis=0), points.argmax(axis=0) ))
+    apart    = numpy.linalg.norm(points[extremes][:, None] - points[extremes][None], axis=2)
+    i, j     = numpy.unravel_index(numpy.argmax(apart), apart.shape)
+    a, b     = int(extremes[i]), int(extremes[j])
+
+    # Then the point furthest from their line
+    edge     = points[b] - points[a]
+    line     = numpy.linalg.norm(numpy.cross(points - points[a], edge), axis=1) / max(numpy.linalg.norm(edge), eps)
+    c        = int(numpy.argmax(line))
+
+    if line[c] <= eps:
+        return None
+
+    # Then the point furthest from their plane
+    normal   = numpy.cross(edge, points[c] - points[a])
+    plane    = (points - points[a]) @ (normal / numpy.linalg.norm(normal))
+    d        = int(numpy.argmax(numpy.abs(plane)))
+
+    if abs(plane[d]) <= eps:
+        return None
+
+    # Wind the faces of the tetrahedron away from its middle
+    middle   = points[[ a, b, c, d ]].mean(axis=0)
+    faces    = [ ]
+
+    for f in ( ( a, b, c ), ( a, b, d ), ( a, c, d ), ( b, c, d ) ):
+        n = numpy.cross(points[f[1]] - points[f[0]], points[f[2]] - points[f[0]])
+        faces.append(f if n @ (middle - points[f[0]]) < 0 else ( f[0], f[2], f[1] ))
+
+    # Each pass adds a point to the hull
+    for _ in range(len(points)):
+
+        f         = numpy.array(faces)
+        origins   = points[f[:, 0]]
+        normals   = numpy.cross(points[f[:, 1]] - origins, points[f[:, 2]] - origins)
+        lengths   = numpy.linalg.norm(normals, axis=1, keepdims=True)
+        normals  /= numpy.where(lengths == 0, 1.0, lengths)
+
+        # Distance of every point outside every face
+        distances = points @ normals.T - numpy.einsum("ij,ij->i", normals, origins)
+        furthest  = distances.max(axis=1)
+        eye       = int(numpy.argmax(furthest))
+
+        if furthest[eye] <= eps:
+            break
+
+        # Edges of the faces the point can see that are not shared with another one it can see
+        visible   = distances[eye] > eps
+        edges     = { ( int(u), int(v) ) for face in f[visible] for u, v in ( ( face[0], face[1] ), ( face[1], face[2] ), ( face[2], face[0] ) ) }
+        faces     = [ tuple(face) for face in f[~visible].tolist() ] + [ ( u, v, eye ) for u, v in edges if ( v, u ) not in edges ]
+
+    # Drop the points inside
+    used, triangles = numpy.unique(numpy.array(faces), return_inverse=True)
+
+    return ( points[used], triangles.reshape(-1, 3).astype(numpy.uint32) )
+
+# Returns the center of mass of a closed mesh, and its covariance per unit mass about it
+def polyhedron(vertices: numpy.ndarray, triangles: numpy.ndarray) -> tuple:
+
+    '''
+        Sums the tetrahedra between each triangle and the middle of the vertices. Returns 
+        None if the mesh has no volume
+    '''
+
+    middle  = vertices.mean(axis=0)
+    a, b, c = ( vertices[triangles[:, i]] - middle for i in range(3) )
+
+    # Six times the signed volume of each tetrahedron
+    det     = numpy.einsum("ij,ij->i", a, numpy.cross(b, c))
+    volume  = det.sum() / 6
+
+    if volume <= 0:
+        return None
+
+    s       = a + b + c
+    center  = (det[:, None] * s).sum(axis=0) / (24 * volume)
+    second  = sum(numpy.einsum("i,ij,ik->jk", det, v, v) for v in ( a, b, c, s )) / 120
+
+    return ( center + middle, second / volume - numpy.outer(center, center) )
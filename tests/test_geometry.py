@@ -0,0 +1,260 @@
+'''
+    Tests for gxport_geometry, which runs without Blender
+
+    Run from the add-on directory with python -m pytest tests, or python -m unittest discover tests
+'''
+
+import os
+import sys
+import math
+import struct
+import unittest
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gxport_geometry
+
+# A tetrahedron, wound counterclockwise seen from outside
+TETRAHEDRON = (
+    [ ( 0.0, 0.0, 0.0 ), ( 1.0, 0.0, 0.0 ), ( 0.0, 1.0, 0.0 ), ( 0.0, 0.0, 1.0 ) ],
+    [ 0, 2, 1, 0, 1, 3, 0, 3, 2, 1, 2, 3 ]
+)
+
+# Returns a closed uv sphere of radius 1
+def uv_sphere(rings: int = 8, segments: int = 12) -> tuple:
+
+    positions = [ ( 0.0, 0.0, 1.0 ), ( 0.0, 0.0, -1.0 ) ]
+
+    for i in range(1, rings):
+        for j in range(segments):
+            theta, phi = math.pi * i / rings, 2 * math.pi * j / segments
+            positions.append(( math.sin(theta) * math.cos(phi), math.sin(theta) * math.sin(phi), math.cos(theta) ))
+
+    ring    = lambda i, j: 2 + (i - 1) * segments + j % segments
+    indices = [ ]
+
+    for j in range(segments):
+        indices += [ 0, ring(1, j), ring(1, j + 1) ]
+        indices += [ 1, ring(rings - 1, j + 1), ring(rings - 1, j) ]
+
+    for i in range(1, rings - 1):
+        for j in range(segments):
+            indices += [ ring(i, j), ring(i + 1, j), ring(i + 1, j + 1), ring(i, j), ring(i + 1, j + 1), ring(i, j + 1) ]
+
+    return ( positions, indices )
+
+# Returns a flat grid of size by size quads
+def grid(size: int) -> tuple:
+
+    positions = [ ( float(x), float(y), 0.0 ) for y in range(size + 1) for x in range(size + 1) ]
+    indices   = [ ]
+
+    for y in range(size):
+        for x in range(size):
+            a = y * (size + 1) + x
+            indices += [ a, a + 1, a + size + 2, a, a + size + 2, a + size + 1 ]
+
+    return ( positions, indices )
+
+# Returns how many triangles use each edge, in either direction
+def edge_counts(indices: list) -> dict:
+
+    ret = { }
+
+    for t in range(len(indices) // 3):
+        triangle = indices[3 * t:3 * t + 3]
+
+        for i in range(3):
+            edge      = tuple(sorted(( triangle[i], triangle[(i + 1) % 3] )))
+            ret[edge] = ret.get(edge, 0) + 1
+
+    return ret
+
+class TestQuickhull(unittest.TestCase):
+
+    # The hull of a cube with points inside is its 8 corners, wound outwards
+    def test_cube(self):
+
+        rng     = numpy.random.default_rng(0)
+        corners = numpy.array([ ( x, y, z ) for x in ( 0, 1 ) for y in ( 0, 1 ) for z in ( 0, 1 ) ], dtype=numpy.float64)
+        points  = numpy.concatenate(( corners, rng.uniform(0.1, 0.9, size=(200, 3)) ))
+
+        vertices, triangles = gxport_geometry.quickhull(points, 64)
+
+        self.assertEqual(len(vertices), 8)
+        self.assertEqual(len(triangles), 12)
+        self.assertEqual(sorted(map(tuple, vertices.tolist())), sorted(map(tuple, corners.tolist())))
+
+        # Every edge is shared by two faces, and every face points away from the middle
+        self.assertTrue(all(count == 2 for count in edge_counts(triangles.flatten().tolist()).values()))
+
+        middle = vertices.mean(axis=0)
+
+        for a, b, c in vertices[triangles]:
+            self.assertGreater(numpy.cross(b - a, c - a) @ (a - middle), 0.0)
+
+    # At most limit vertices are kept
+    def test_limit(self):
+
+        points              = numpy.random.default_rng(1).normal(size=(2000, 3))
+        vertices, triangles = gxport_geometry.quickhull(points, 32)
+
+        self.assertLessEqual(len(vertices), 32)
+        self.assertEqual(len(triangles), 2 * len(vertices) - 4)
+
+    # Flat and tiny point sets have no hull
+    def test_flat(self):
+
+        self.assertIsNone(gxport_geometry.quickhull(numpy.array([ ( x, y, 0.0 ) for x in range(4) for y in range(4) ]), 64))
+        self.assertIsNone(gxport_geometry.quickhull(numpy.array(TETRAHEDRON[0][:3]), 64))
+
+    # The hull of a cube has its center of mass in the middle
+    def test_polyhedron(self):
+
+        points              = numpy.array([ ( x, y, z ) for x in ( 0, 2 ) for y in ( 0, 2 ) for z in ( 0, 2 ) ], dtype=numpy.float64)
+        vertices, triangles = gxport_geometry.quickhull(points, 64)
+        center, covariance  = gxport_geometry.polyhedron(vertices, triangles)
+
+        numpy.testing.assert_allclose(center, ( 1.0, 1.0, 1.0 ), atol=1e-9)
+        numpy.testing.assert_allclose(covariance, numpy.eye(3) / 3, atol=1e-9)
+
+class TestSimplify(unittest.TestCase):
+
+    # A tetrahedron is the smallest closed mesh, so it has no levels
+    def test_tetrahedron(self):
+
+        positions, indices = TETRAHEDRON
+
+        self.assertEqual(gxport_geometry.Simplifier.simplify(positions, indices, ( 0.5, 0.25 )), [ ])
+
+    # A closed mesh stays closed, and stops at a tetrahedron
+    def test_closed(self):
+
+        positions, indices = uv_sphere()
+        levels             = gxport_geometry.Simplifier.simplify(positions, indices, ( 0.5, 0.25, 0.1, 0.01, 0.001 ))
+        counts             = [ len(level) // 3 for level, error in levels ]
+
+        self.assertEqual(counts[:2], [ len(indices) // 6, len(indices) // 12 ])
+        self.assertEqual(counts[-1], 4)
+        self.assertLess(len(levels), 5)
+
+        for level, error in levels:
+            triangles = [ tuple(sorted(level[3 * t:3 * t + 3])) for t in range(len(level) // 3) ]
+
+            self.assertTrue(all(count == 2 for count in edge_counts(level).values()))
+            self.assertEqual(len(triangles), len(set(triangles)))
+            self.assertTrue(all(len(set(triangle)) == 3 for triangle in triangles))
+
+        errors = [ error for level, error in levels ]
+
+        self.assertEqual(errors, sorted(errors))
+
+    # Open borders never move
+    def test_border(self):
+
+        positions, indices = grid(6)
+        border             = { v for v, ( x, y, z ) in enumerate(positions) if x in ( 0, 6 ) or y in ( 0, 6 ) }
+        levels             = gxport_geometry.Simplifier.simplify(positions, indices, ( 0.5, 0.1 ))
+
+        self.assertTrue(levels)
+
+        for level, error in levels:
+            self.assertTrue(border <= set(level))
+            self.assertAlmostEqual(error, 0.0)
+
+class TestReorder(unittest.TestCase):
+
+    # Triangles are kept, in their submesh, and vertices are renumbered in the order they are used
+    def test_reorder(self):
+
+        positions, indices = grid(16)
+        half               = len(indices) // 6
+        submeshes          = [ ( 0, half ), ( half, half ) ]
+
+        # Shuffle the triangles of each submesh
+        rng     = numpy.random.default_rng(2)
+        order   = [ first + int(t) for first, count in submeshes for t in rng.permutation(count) ]
+        indices = [ v for t in order for v in indices[3 * t:3 * t + 3] ]
+
+        ret, remap, acmr, acmr_after = gxport_geometry.reorder(indices, len(positions), submeshes, gxport_geometry.VertexCache.CACHE_SIZE, positions)
+
+        self.assertEqual(sorted(remap), list(range(len(positions))))
+        self.assertLess(acmr_after, acmr)
+
+        inverse = { new: old for old, new in enumerate(remap) }
+
+        for first, count in submeshes:
+            before = sorted(tuple(sorted(indices[3 * t:3 * t + 3])) for t in range(first, first + count))
+            after  = sorted(tuple(sorted(inverse[v] for v in ret[3 * t:3 * t + 3])) for t in range(first, first + count))
+
+            self.assertEqual(before, after)
+
+        # The first use of each vertex comes in order
+        seen = [ ]
+
+        for v in ret:
+            if v not in seen:
+                seen.append(v)
+
+        self.assertEqual(seen, list(range(len(seen))))
+
+    # Without tipsify only the vertices are renumbered
+    def test_fetch_order_only(self):
+
+        ret, remap, acmr, acmr_after = gxport_geometry.reorder([ 3, 1, 2, 2, 1, 0 ], 5, [ ( 0, 2 ) ], 16, None, False)
+
+        self.assertEqual(ret, [ 0, 1, 2, 2, 1, 3 ])
+        self.assertEqual(remap, [ 3, 1, 2, 0, 4 ])
+        self.assertEqual(acmr, acmr_after)
+
+class TestEncodeMesh(unittest.TestCase):
+
+    # A vertex key, as gxport.Part builds them
+    VERTEX: tuple = ( 1.0, 2.0, 3.0, 0.25, 0.75, 0.0, 0.0, -1.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 1.0, 0.5, 0.0, 1.0, 0, 1, -1, -1, 0.75, 0.25, 0.0, 0.0 )
+
+    # Returns a layout with every attribute
+    @staticmethod
+    def layout(**encodings) -> dict:
+
+        ret = { name: True for name in gxport_geometry.VERTEX_LAYOUT if name.startswith("use_") }
+
+        ret.update({ "position_encoding": "FLOAT", "uv_encoding": "FLOAT", "normal_encoding": "FLOAT", "weight_encoding": "FLOAT" })
+        ret.update(encodings)
+
+        return ret
+
+    # Full precision rows are the values as they are
+    def test_float(self):
+
+        vertex_data, index_data = gxport_geometry.encode_mesh([ self.VERTEX ], [ ( 0, 0, 0 ) ], self.layout(), { }, None)
+
+        self.assertEqual(vertex_data, struct.pack("<3f2f3f3f3f4B4i4f", *self.VERTEX[0:14], 255, 128, 0, 255, *self.VERTEX[18:26]))
+        self.assertEqual(index_data, struct.pack("<B3I", 3, 0, 0, 0))
+
+    # Compact rows quantize to the part bounds, and fold normals onto an octahedron
+    def test_compact(self):
+
+        layout   = self.layout(position_encoding="UNORM16", uv_encoding="UNORM16", normal_encoding="OCTAHEDRAL", weight_encoding="UNORM8", use_tangents=False, use_bitangents=False)
+        encoding = { "position": { "min": [ 1.0, 0.0, 3.0 ], "max": [ 2.0, 4.0, 5.0 ] }, "uv": { "min": [ 0.0, 0.0 ], "max": [ 1.0, 1.0 ] } }
+
+        vertex_data, index_data = gxport_geometry.encode_mesh([ self.VERTEX ], [ ], layout, encoding, "H")
+        values                  = struct.unpack("<3H2H2h4B4i4B", vertex_data)
+
+        self.assertEqual(values[0:3], ( 0, 32768, 0 ))
+        self.assertEqual(values[3:5], ( 16384, 49151 ))
+        self.assertEqual(values[5:7], ( 32767, 32767 ))
+        self.assertEqual(values[15:19], ( 191, 64, 0, 0 ))
+        self.assertEqual(index_data, b"")
+
+    # Triangle lists are one block of 16 or 32 bit indices
+    def test_index_formats(self):
+
+        layout = self.layout(use_uv_coords=False, use_normals=False, use_tangents=False, use_bitangents=False, use_colors=False, use_bone_groups=False, use_bone_weights=False)
+        faces  = [ ( 0, 1, 2 ), ( 2, 1, 65535 ) ]
+
+        self.assertEqual(gxport_geometry.encode_mesh([ ], faces, layout, { }, "H")[1], struct.pack("<6H", 0, 1, 2, 2, 1, 65535))
+        self.assertEqual(gxport_geometry.encode_mesh([ ], faces, layout, { }, "I")[1], struct.pack("<6I", 0, 1, 2, 2, 1, 65535))
+
+if __name__ == "__main__":
+    unittest.main()